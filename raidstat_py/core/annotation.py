@@ -0,0 +1,187 @@
+import os
+import json
+import queue
+import logging
+import threading
+from PIL import ImageDraw, ImageFont
+from .roi_archive import is_roi_manifest, open_image, screenshot_base_name
+
+# Режимы записи аннотированных скриншотов
+ANNOTATION_MODES = ("full", "region", "deferred")
+# Форматы результата ("auto" — как у исходного файла)
+ANNOTATION_FORMATS = ("auto", "jpg", "png", "webp")
+
+SIDECAR_EXT = ".json"
+
+_font_cache = {}
+_font_lock = threading.Lock()
+
+
+def get_font(size):
+    """Шрифт для подписей; загружается один раз на каждый размер."""
+    with _font_lock:
+        font = _font_cache.get(size)
+        if font is None:
+            try:
+                font = ImageFont.truetype("arial.ttf", size)
+            except Exception:
+                font = ImageFont.load_default()
+            _font_cache[size] = font
+        return font
+
+
+def _output_ext(source_path, fmt):
+    if fmt == "auto" and is_roi_manifest(source_path):
+        return ".png"
+    if fmt == "auto":
+        return os.path.splitext(source_path)[1]
+    return "." + fmt
+
+
+def render_annotations(source_path, output_path, labels, font_size, region=None, quality=90):
+    """
+    Рисует подписи на изображении и сохраняет результат.
+
+    Args:
+        source_path: Исходный скриншот.
+        output_path: Путь результата (формат определяется расширением).
+        labels: Список (текст, x, y, цвет) в координатах исходного изображения.
+        font_size: Размер шрифта.
+        region: (left, top, right, bottom) — сохранить только эту область (рейд-фрейм) или None.
+        quality: Качество для JPEG/WebP.
+    """
+    img = open_image(source_path)
+
+    offset_x, offset_y = 0, 0
+    if region:
+        left, top, right, bottom = region
+        left, top = max(0, left), max(0, top)
+        right, bottom = min(img.width, right), min(img.height, bottom)
+        img = img.crop((left, top, right, bottom))
+        offset_x, offset_y = left, top
+
+    draw = ImageDraw.Draw(img)
+    font = get_font(font_size)
+    for text, x, y, color in labels:
+        draw.text((x - offset_x, y - offset_y), text, font=font, fill=tuple(color))
+
+    ext = os.path.splitext(output_path)[1].lower()
+    if ext in (".jpg", ".jpeg", ".webp"):
+        img.save(output_path, quality=quality)
+    else:
+        img.save(output_path)
+    return output_path
+
+
+def render_sidecar(sidecar_path):
+    """Отрисовывает отложенный результат по файлу-описанию. Возвращает путь изображения."""
+    with open(sidecar_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    source_path = data["source"]
+    if not os.path.isabs(source_path):
+        source_path = os.path.join(os.path.dirname(sidecar_path), source_path)
+
+    output_path = os.path.splitext(sidecar_path)[0] + _output_ext(source_path, data.get("format", "auto"))
+    if not os.path.exists(output_path):
+        render_annotations(source_path, output_path, data["labels"], data["font_size"],
+                           region=data.get("region"), quality=data.get("quality", 90))
+    return output_path
+
+
+def open_result(path):
+    """Открывает результат; для отложенного режима сначала отрисовывает его."""
+    if path.lower().endswith(SIDECAR_EXT):
+        path = render_sidecar(path)
+    os.startfile(path)
+    return path
+
+
+class AnnotationWriter:
+    """
+    Фоновая запись аннотированных скриншотов посещаемости.
+
+    Отрисовка и кодирование полноразмерного изображения выполняются в отдельном потоке,
+    чтобы потоки распознавания не ждали их. Задания обрабатываются по очереди;
+    drain() дожидается записи всех поставленных заданий.
+    """
+    def __init__(self, history, mode="full", fmt="auto", quality=90):
+        self.history = history
+        self.mode = mode if mode in ANNOTATION_MODES else "full"
+        self.fmt = fmt if fmt in ANNOTATION_FORMATS else "auto"
+        self.quality = quality
+        self.logger = logging.getLogger(__name__)
+        self.queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def configure(self, mode, fmt, quality):
+        self.mode = mode if mode in ANNOTATION_MODES else "full"
+        self.fmt = fmt if fmt in ANNOTATION_FORMATS else "auto"
+        self.quality = quality
+
+    def submit(self, source_path, labels, font_size, region=None, on_done=None):
+        """
+        Ставит в очередь запись результата для скриншота.
+        Результат сохраняется рядом с source_path как "<имя>_res.<формат>"
+        (в отложенном режиме — "<имя>_res.json" с описанием подписей).
+        on_done(путь) вызывается в потоке записи после сохранения.
+        """
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self.queue.put((source_path, labels, font_size, region, on_done))
+
+    def drain(self):
+        """Ждет, пока все поставленные задания будут записаны."""
+        self.queue.join()
+
+    def discard(self):
+        """Отменяет задания, которые еще не начали записываться (при остановке)."""
+        while True:
+            try:
+                self.queue.get_nowait()
+            except queue.Empty:
+                break
+            self.queue.task_done()
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            try:
+                self._write(*job)
+            except Exception as e:
+                self.logger.error(f"Ошибка при сохранении результатов: {e}")
+            finally:
+                self.queue.task_done()
+
+    def _write(self, source_path, labels, font_size, region, on_done):
+        name_part = screenshot_base_name(source_path)
+        base_path = os.path.join(os.path.dirname(source_path), f"{name_part}_res")
+        # Для архива областей вне рейд-фрейма изображения нет — всегда только область
+        if self.mode != "region" and not is_roi_manifest(source_path):
+            region = None
+
+        if self.mode == "deferred":
+            output_path = base_path + SIDECAR_EXT
+            data = {
+                "source": os.path.basename(source_path),
+                "labels": labels,
+                "font_size": font_size,
+                "region": region,
+                "format": self.fmt,
+                "quality": self.quality
+            }
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            self.history.add_created(output_path)
+            # Изображение, отрисованное позже при открытии, тоже удаляется при откате
+            self.history.add_created(base_path + _output_ext(source_path, self.fmt))
+        else:
+            output_path = base_path + _output_ext(source_path, self.fmt)
+            render_annotations(source_path, output_path, labels, font_size, region=region, quality=self.quality)
+            self.history.add_created(output_path)
+
+        if on_done:
+            on_done(output_path)
@@ -1,17 +1,20 @@
 import os
 import re
-from PIL import Image, ImageDraw, ImageFont
 import logging
 from datetime import datetime
 from .ocr import OCRHandler
 from .matcher import Matcher
 from ..utils.config import Config
 import concurrent.futures
-import shutil
-from .history import HistoryManager
-import cv2
-import cv2
 import numpy as np
+from .history import HistoryManager
+from .journal import RunJournal
+from .scanner import scan_directory, file_hash, FileRecord
+from .timestamps import resolve_timestamps, sort_key
+from .annotation import AnnotationWriter, open_result
+from .debug_sink import DebugSink
+from .roi_archive import store_processed, screenshot_base_name
+from .frame import Frame
 
 ATTENDANCE_PREPROCESS = {
     "use_otsu": True,
@@ -32,9 +35,25 @@ class AttendanceProcessor:
         self.scale = self.config.interface_scale
         self.grid_params = self._get_grid_params(self.scale)
         self.history = HistoryManager("attendance")
+        self.journal = RunJournal("attendance")
+        self.annotation_writer = AnnotationWriter(
+            self.history,
+            mode=self.config.annotation_mode,
+            fmt=self.config.annotation_format,
+            quality=self.config.annotation_quality
+        )
+        self.debug_sink = DebugSink(self.history)
+        # Выгрузка фактов для аналитики (ColumnarExporter), задается процессором по настройке facts_export
+        self.facts = None
 
     def revert_history(self):
         self.history.revert()
+        # После отката незавершенный запуск продолжать уже нечего
+        self.journal.finish()
+
+    def has_pending_run(self, folder_path):
+        folder = self.journal.pending_folder()
+        return bool(folder) and os.path.abspath(folder) == os.path.abspath(folder_path)
 
     def _get_grid_params(self, scale):
         params = {}
@@ -132,79 +151,71 @@ class AttendanceProcessor:
             params['name_w'] = 52
             params['name_h'] = 15
             params['font_size'] = 11
+
+        # Область рейд-фрейма (для режима записи только этой области): все ячейки обоих блоков с подписями
+        params['region'] = (
+            params['cols_x'][0] - 4,
+            params['rows_y'][0] - 4,
+            params['cols_x'][-1] + params['name_w'] + 4,
+            params['rows_y'][-1] + params['shift_y'] + params['shift_text_y'] + params['font_size'] + 8
+        )
             
         return params
 
-    def process_folder(self, folder_path, recursive=False, stop_event=None):
-        self.history.clear()
-        
-        # 1. Сбор файлов, сгруппированных по директориям
-        # Структура: { путь_к_директории: [пути_к_файлам] }
-        grouped_files = {}
-        
-        for root, dirs, files in os.walk(folder_path):
-            if stop_event and stop_event.is_set():
-                self.logger.info("Обработка посещаемости прервана (фаза сканирования).")
-                return 0
-
-            # Пропускаем папку errors
-            if 'errors' in dirs:
-                dirs.remove('errors')
+    def process_folder(self, folder_path, recursive=False, stop_event=None, resume=False):
+        state = self.journal.load() if resume else None
+        if state and os.path.abspath(state.get("folder") or "") != os.path.abspath(folder_path):
+            state = None
 
-            # Вычисляем глубину относительно folder_path
-            rel_path = os.path.relpath(root, folder_path)
-            if rel_path == '.':
-                depth = 0
-            else:
-                depth = rel_path.count(os.sep) + 1
-            
-            # Логика:
-            # Если recursive=False: только глубина 0 (корень)
-            # Если recursive=True: глубина 0 и 1 (корень + подпапки первого уровня)
-            if not recursive and depth > 0:
-                continue
-            if recursive and depth > 1:
-                # Пропускаем подпапки более низких уровней
-                continue
-                
-            current_files = []
-            for file in files:
-                if file.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')):
-                    current_files.append(os.path.join(root, file))
-            
-            if current_files:
-                # Сортируем по времени создания внутри группы
-                current_files.sort(key=os.path.getmtime)
-                grouped_files[root] = current_files
-                
-            # Изменяем dirs для обрезки os.walk
-            if not recursive:
-                dirs.clear() # Перестаем спускаться вниз
-            elif depth >= 1:
-                dirs.clear() # Перестаем спускаться глубже уровня 1
+        if state:
+            # Возобновление: план групп берем из журнала, историю дополняем
+            self.history.load()
+            self.journal.resume()
+            sorted_groups = [
+                (group["key"], [FileRecord(path, None, mtime, 0) for path, mtime in zip(group["paths"], group["mtimes"])])
+                for group in state["groups"]
+            ]
+            self.logger.info(f"Возобновление обработки посещаемости: обработано ранее {len(state['images'])} изображений")
+        else:
+            self.history.clear()
+            grouped_files = self._collect_files(folder_path, recursive, stop_event)
+            if grouped_files is None:
+                return 0
+            if not grouped_files:
+                return 0
 
-        if not grouped_files:
-            return 0
+            # Сортируем группы по времени изменения первого файла
+            sorted_groups = sorted(grouped_files.items(), key=lambda item: item[1][0].mtime if item[1] else 0)
+            self.journal.start(folder_path, [
+                {"key": group_path, "paths": [r.path for r in records], "mtimes": [r.mtime for r in records]}
+                for group_path, records in sorted_groups
+            ])
 
         total_unique = 0
         num_threads = 8
-        self.logger.info(f"Обработка посещаемости в {num_threads} потоков, найдено групп: {len(grouped_files)}")
+        self.logger.info(f"Обработка посещаемости в {num_threads} потоков, найдено групп: {len(sorted_groups)}")
+        # Колонки всех групп пишутся в книгу одним сохранением в конце запуска
+        session = self.storage.open_session("attendance")
+        if self.facts:
+            session = self.facts.wrap(session, "attendance")
 
         try:
-            # Сортируем группы по времени изменения первого файла
-            sorted_groups = sorted(grouped_files.items(), key=lambda item: os.path.getmtime(item[1][0]) if item[1] else 0)
-
-            for group_path, image_files in sorted_groups:
+            for group_path, image_records in sorted_groups:
                 if stop_event and stop_event.is_set():
                     break
+
+                group_state = state["group_states"].get(group_path) if state else None
+                if group_state and group_state["state"] == "done":
+                    total_unique += (group_state.get("data") or {}).get("count", 0)
+                    continue
                     
                 group_attendees = set()
                 
                 # Определяем название колонки
                 if os.path.abspath(group_path) == os.path.abspath(folder_path):
                     # Корневая папка — используем временную метку первого файла
-                    if image_files:
-                         ts = os.path.getmtime(image_files[0])
+                    if image_records:
+                         ts = image_records[0].mtime
                          column_name = datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M")
                     else:
                         column_name = datetime.now().strftime("%Y-%m-%d %H:%M")
@@ -212,48 +223,115 @@ class AttendanceProcessor:
                     # Подпапка — используем имя папки
                     column_name = os.path.basename(group_path)
                 
-                self.logger.info(f"Обработка группы: {column_name} ({len(image_files)} изображений)")
+                self.logger.info(f"Обработка группы: {column_name} ({len(image_records)} изображений)")
 
-                def safe_process_image(path):
+                def safe_process_image(record):
+                    path = record.path
                     if stop_event and stop_event.is_set():
                         return []
+                    # Результат из журнала прерванного запуска — повторно не распознаем
+                    if state and path in state["images"]:
+                        return state["images"][path] or []
+                    if not os.path.exists(path):
+                        self.logger.warning(f"Файл не найден: {path}")
+                        return []
                     try:
-                        return self.process_image(path, stop_event=stop_event)
+                        # Результат попадает в журнал до перемещения оригинала: иначе после сбоя
+                        # перемещенный, но не записанный скриншот при возобновлении не найти
+                        return self.process_image(
+                            path, stop_event=stop_event, mtime=record.mtime,
+                            on_recognized=lambda attendees: self.journal.record_image(group_path, path, attendees)
+                        )
                     except Exception as e:
                         self.logger.error(f"Не удалось обработать {path}: {e}")
                         return []
 
                 results = []
                 if num_threads > 1:
-                     with concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) as executor:
-                        futures = [executor.submit(safe_process_image, path) for path in image_files]
+                     executor = concurrent.futures.ThreadPoolExecutor(max_workers=num_threads)
+                     try:
+                        futures = [executor.submit(safe_process_image, record) for record in image_records]
                         for future in concurrent.futures.as_completed(futures):
                             if stop_event and stop_event.is_set():
-                                for f in futures: f.cancel()
                                 break
                             results.append(future.result())
+                     finally:
+                        executor.shutdown(wait=not (stop_event and stop_event.is_set()), cancel_futures=True)
                 else:
-                    for path in image_files:
+                    for record in image_records:
                         if stop_event and stop_event.is_set():
                             break
-                        results.append(safe_process_image(path))
+                        results.append(safe_process_image(record))
+
+                if stop_event and stop_event.is_set():
+                    break
 
                 for attendees in results:
                     if attendees:
                         group_attendees.update(attendees)
 
-                if group_attendees:
-                    self.storage.save_attendance(list(group_attendees), column_name)
-                    total_unique += len(group_attendees)
+                if group_attendees and not (group_state and group_state["state"] == "saved"):
+                    session.save_attendance(list(group_attendees), column_name)
+                    self.journal.record_group(group_path, "saved")
+                total_unique += len(group_attendees)
+                # Группа завершена, когда записаны и ее аннотированные скриншоты
+                self.annotation_writer.drain()
+                self.debug_sink.drain()
+                self.journal.record_group(group_path, "done", {"count": len(group_attendees)})
+                self.history.save()
             
             if stop_event and stop_event.is_set():
                  return 0
-                 
+
+            self.journal.finish()
             return total_unique
         finally:
+            if stop_event and stop_event.is_set():
+                # Оригиналы уже перемещены; недописанные аннотации не ждем
+                self.annotation_writer.discard()
+            self.annotation_writer.drain()
+            self.debug_sink.drain()
+            session.commit()
+            self.journal.close()
             self.history.save()
 
-    def _process_single_cell(self, img_bgr, block_idx, row_idx, col_idx, x, curr_y, w, h, debug_dir):
+    def _archive_regions(self):
+        """Области, которые читает распознавание: оба блока рейд-фрейма (x, y, w, h)."""
+        params = self.grid_params
+        left = params['cols_x'][0]
+        width = params['cols_x'][-1] + params['name_w'] - left
+        regions = []
+        for shift in [0, params['shift_y']]:
+            top = params['rows_y'][0] + shift
+            regions.append((left, top, width, params['rows_y'][-1] + shift + params['name_h'] - top))
+        return regions
+
+    def _collect_files(self, folder_path, recursive, stop_event):
+        """
+        Сбор файлов, сгруппированных по директориям.
+        Структура: { путь_к_директории: [FileRecord] }. None — если сканирование прервано.
+        """
+        # Если recursive=False: только глубина 0 (корень)
+        # Если recursive=True: глубина 0 и 1 (корень + подпапки первого уровня)
+        exclude_hashes = self.history.processed_hashes() if self.config.skip_processed else None
+        records = scan_directory(folder_path, max_depth=1 if recursive else 0, stop_event=stop_event, exclude_hashes=exclude_hashes)
+        if records is None:
+            self.logger.info("Обработка посещаемости прервана (фаза сканирования).")
+            return None
+
+        records = resolve_timestamps(records, self.config.timestamp_source)
+
+        grouped_files = {}
+        for record in records:
+            grouped_files.setdefault(os.path.dirname(record.path), []).append(record)
+
+        # Сортируем по времени внутри группы (при равном времени — по номеру скриншота)
+        for group_records in grouped_files.values():
+            group_records.sort(key=sort_key)
+
+        return grouped_files
+
+    def _process_single_cell(self, img_bgr, block_idx, row_idx, col_idx, x, curr_y, w, h, debug_crops, stop_event=None):
         # Унифицированный вызов распознавания
         rect = (x, curr_y, w, h)
         
@@ -270,55 +348,39 @@ class AttendanceProcessor:
             preprocess_params=ATTENDANCE_PREPROCESS,
             online_crop_no_otsu=True,
             retry_with_shifts=True,
-            item_id=f"b{block_idx}_r{row_idx}_c{col_idx}"
+            item_id=f"b{block_idx}_r{row_idx}_c{col_idx}",
+            cancel_token=stop_event
         )
 
-        # 5. Сохранение отладочного изображения сопоставления
-        if debug_dir and crop_processed is not None:
+        # 5. Отладочное изображение сопоставления (записывается в спрайт скриншота после всех ячеек)
+        if debug_crops is not None and isinstance(crop_processed, np.ndarray):
             safe_name = name if name else "UNKNOWN"
-            # Очистка имени для использования в качестве названия файла
-            safe_name = "".join(c for c in safe_name if c.isalnum() or c in (' ', '-', '_')).strip()
-            debug_img_name = f"b{block_idx}_r{row_idx}_c{col_idx}_{safe_name}.jpg"
-            debug_img_path = os.path.join(debug_dir, debug_img_name)
-            try:
-                Image.fromarray(crop_processed).save(debug_img_path)
-            except Exception as e:
-                self.logger.warning(f"Не удалось сохранить отладочное изображение {debug_img_path}: {e}")
+            debug_crops[f"b{block_idx}_r{row_idx}_c{col_idx}_{safe_name}"] = crop_processed
                 
         return name, score, type_code, x, curr_y
 
-    def process_image(self, image_path, stop_event=None):
+    def process_image(self, image_path, stop_event=None, mtime=None, on_recognized=None):
         """
         Обрабатывает одно изображение, используя многопоточность для отдельных ячеек.
+        mtime: время скриншота из сканирования папки (см. resolve_timestamps; чтобы не запрашивать его повторно).
+        on_recognized(имена) вызывается после распознавания, до перемещения оригинала.
         Возвращает список найденных имен.
         """
         if stop_event and stop_event.is_set():
             return []
 
-        img = Image.open(image_path)
-        draw = ImageDraw.Draw(img)
-        # Пытаемся загрузить шрифт, иначе используем стандартный
-        try:
-            font = ImageFont.truetype("arial.ttf", self.grid_params['font_size'])
-        except:
-            font = ImageFont.load_default()
-
         found_names = []
+        labels = [] # Подписи для аннотированного изображения: (текст, x, y, цвет)
         filename = os.path.basename(image_path)
-        file_base_name = os.path.splitext(filename)[0]
+        file_base_name = screenshot_base_name(filename)
         
-        # Подготовка директории отладки, если требуется
-        debug_dir = None
-        if self.config.debug_screens:
-            debug_dir = os.path.join(os.path.dirname(image_path), file_base_name)
-            if os.path.exists(debug_dir):
-                shutil.rmtree(debug_dir)
-            os.makedirs(debug_dir, exist_ok=True)
-            self.history.add_created(debug_dir)
+        # Отладочные кропы ячеек: {поле: кроп}, сохраняются одним спрайтом рядом с перемещенным оригиналом
+        debug_crops = {} if self.config.debug_screens else None
             
-        img_np = np.array(img)
-        # Конвертация RGB в BGR для cv2
-        img_bgr = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
+        # Одно декодирование сразу в оттенки серого; ячейки получают пиксели только для чтения
+        frame = Frame.load(image_path)
+        if frame is None:
+            return []
         
         # У нас есть 2 блока: верхний и нижний (со смещением)
         shifts = [0, self.grid_params['shift_y']]
@@ -333,32 +395,38 @@ class AttendanceProcessor:
                     h = self.grid_params['name_h']
                     
                     # Проверка границ
-                    if curr_y + h > img_np.shape[0] or x + w > img_np.shape[1]:
+                    if curr_y + h > frame.height or x + w > frame.width:
                          continue
                          
                     # Передаем полное изображение и координаты
-                    # Примечание: img_bgr здесь не копируется, но OCR рассматривает его как доступный только для чтения
-                    tasks_args.append((img_bgr, block_idx, row_idx, col_idx, x, curr_y, w, h, debug_dir))
+                    # Примечание: пиксели не копируются, массив кадра доступен только для чтения
+                    tasks_args.append((frame.pixels, block_idx, row_idx, col_idx, x, curr_y, w, h, debug_crops, stop_event))
 
         # Выполнение задач параллельно
         # Используем настроенное количество потоков или 8 по умолчанию
         num_threads = 8
         results = []
         
-        if tasks_args:
-             with concurrent.futures.ThreadPoolExecutor(max_workers=int(num_threads)) as executor:
-                futures = [executor.submit(self._process_single_cell, *args) for args in tasks_args]
-                for future in concurrent.futures.as_completed(futures):
-                    if stop_event and stop_event.is_set():
-                        # Отменяем ожидающие задачи и выходим
-                        for f in futures:
-                            f.cancel()
-                        return []  # Возвращаем пустой список при остановке
-                    try:
-                        res = future.result()
-                        results.append(res)
-                    except Exception as e:
-                        self.logger.error(f"Ошибка при обработке ячейки: {e}")
+        try:
+            if tasks_args:
+                executor = concurrent.futures.ThreadPoolExecutor(max_workers=int(num_threads))
+                try:
+                    futures = [executor.submit(self._process_single_cell, *args) for args in tasks_args]
+                    for future in concurrent.futures.as_completed(futures):
+                        if stop_event and stop_event.is_set():
+                            return []  # Возвращаем пустой список при остановке
+                        try:
+                            res = future.result()
+                            results.append(res)
+                        except Exception as e:
+                            self.logger.error(f"Ошибка при обработке ячейки: {e}")
+                finally:
+                    # При остановке не ждем выполняющиеся ячейки: их процессы Tesseract уже прерваны токеном
+                    executor.shutdown(wait=not (stop_event and stop_event.is_set()), cancel_futures=True)
+        finally:
+            # Пиксели больше не нужны: аннотация рисуется по файлу в потоке записи
+            tasks_args = None
+            frame.release()
         
         # Обработка результатов
         for name, score, type_code, x, curr_y in results:
@@ -384,45 +452,50 @@ class AttendanceProcessor:
             elif type_code == 4: # Заменено
                 color = (0, 0, 0) # Черный
 
-            draw.text((text_x, text_y), name, font=font, fill=color)
+            labels.append((name, text_x, text_y, color))
 
         # Проверяем остановку перед сохранением
         if stop_event and stop_event.is_set():
             return found_names  # Возвращаем что успели собрать, но не сохраняем
 
-        # Сохранение аннотированного изображения
-        # Логика: сохранение в подпапку с датой
+        if on_recognized:
+            on_recognized(found_names)
+
+        # Сохранение результатов
+        # Логика: оригинал перемещается в подпапку с датой, аннотированная копия
+        # рисуется и сохраняется рядом с ним в фоновом потоке записи
         try:
-            date_folder = datetime.fromtimestamp(os.path.getmtime(image_path)).strftime("%Y-%m-%d")
+            if mtime is None:
+                mtime = os.path.getmtime(image_path)
+            date_folder = datetime.fromtimestamp(mtime).strftime("%Y-%m-%d")
             output_dir = os.path.join(os.path.dirname(image_path), date_folder)
             os.makedirs(output_dir, exist_ok=True)
             self.history.add_created(output_dir)
             
-            base_name = os.path.basename(image_path)
-            name_part, ext = os.path.splitext(base_name)
-            output_path = os.path.join(output_dir, f"{name_part}_res{ext}")
+            # Перемещение оригинала (в режиме roi — только блоков рейд-фрейма)
+            regions = self._archive_regions() if self.config.archive_mode == "roi" else None
+            # Хеш оригинала — до перемещения (в режиме roi сохраняется уже другой файл)
+            content_hash = file_hash(image_path) if self.config.skip_processed else None
+            dest_path, moves = store_processed(image_path, output_dir, regions)
+            for src, dest, kind in moves:
+                self.history.add_move(src, dest, kind, content_hash if src == image_path else None)
+            self.journal.record_move(image_path, dest_path)
             
-            img.save(output_path)
-            self.history.add_created(output_path)
-            
-            # Перемещение оригинала
-            dest_path = os.path.join(output_dir, base_name)
-            if os.path.exists(dest_path):
-                os.remove(dest_path)
-            shutil.move(image_path, dest_path)
-            self.history.add_move(image_path, dest_path)
-            
-            # Перемещение папки отладки
-            if debug_dir and os.path.exists(debug_dir):
-                debug_dest_path = os.path.join(output_dir, os.path.basename(debug_dir))
-                if os.path.exists(debug_dest_path):
-                    shutil.rmtree(debug_dest_path)
-                shutil.move(debug_dir, debug_dest_path)
-                self.history.add_move(debug_dir, debug_dest_path)
+            # Отладочные кропы пишутся сразу в итоговую папку — перемещать нечего
+            if debug_crops:
+                self.debug_sink.write(os.path.join(output_dir, file_base_name), debug_crops)
 
             # Не открываем файл, если остановлено
-            if self.config.show_afterscreen and not (stop_event and stop_event.is_set()):
-                 os.startfile(output_path)
+            on_done = None
+            if self.config.show_afterscreen:
+                def on_done(output_path):
+                    if not (stop_event and stop_event.is_set()):
+                        open_result(output_path)
+
+            self.annotation_writer.submit(
+                dest_path, labels, self.grid_params['font_size'],
+                region=self.grid_params['region'], on_done=on_done
+            )
 
         except Exception as e:
              self.logger.error(f"Ошибка при сохранении результатов: {e}")
@@ -0,0 +1,65 @@
+import json
+import os
+import logging
+import threading
+
+class BaselineStore:
+    """
+    Последнее известное состояние каждого игрока (для статистики).
+
+    После каждой завершенной группы сохраняются конечные значения игроков (хонор, фраги, ГС, класс,
+    время и отладочные скриншоты). Новый запуск может использовать их как "до" для первой группы,
+    если они не старше заданного окна, — тогда отдельный проход скриншотов "до" не нужен.
+    """
+    def __init__(self, filename="baseline_statistics.json"):
+        self.filename = filename
+        self.logger = logging.getLogger(__name__)
+        self.lock = threading.Lock()
+
+    def load(self):
+        if not os.path.exists(self.filename):
+            return {}
+        try:
+            with open(self.filename, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            self.logger.error(f"Не удалось загрузить базовую статистику: {e}")
+            return {}
+
+    def update(self, group_stats, timestamp):
+        """Запоминает конечные значения игроков группы (только с распознанными хонором и фрагами)."""
+        with self.lock:
+            players = self.load()
+            for name, data in group_stats.items():
+                if data.get('honor_end') is None or data.get('kills_end') is None:
+                    continue
+                players[name] = {
+                    'honor_end': data['honor_end'],
+                    'kills_end': data['kills_end'],
+                    'gear': data.get('gear'),
+                    'class': data.get('class'),
+                    'timestamp': timestamp,
+                    'debug_images_end': data.get('debug_images_end')
+                }
+            try:
+                with open(self.filename, 'w', encoding='utf-8') as f:
+                    json.dump(players, f, ensure_ascii=False, indent=2)
+            except Exception as e:
+                self.logger.error(f"Не удалось сохранить базовую статистику: {e}")
+
+    def get_prev_stats(self, names, before_time, max_age_minutes):
+        """
+        Возвращает prev_stats для update_stats_between_groups: игроки из names,
+        чье последнее состояние записано раньше before_time, но не раньше чем за max_age_minutes до него.
+        """
+        if max_age_minutes <= 0:
+            return {}
+
+        prev_stats = {}
+        for name, data in self.load().items():
+            if name not in names:
+                continue
+            age = before_time - data.get('timestamp', 0)
+            if 0 < age <= max_age_minutes * 60:
+                prev_stats[name] = data
+        return prev_stats
@@ -0,0 +1,72 @@
+import threading
+import time
+import logging
+
+class CancelToken(threading.Event):
+    """
+    Событие остановки с возможностью прервать уже выполняющиеся операции.
+
+    Совместимо с threading.Event (is_set/set/clear/wait), поэтому передается везде вместо stop_event.
+    Долгие операции (процессы Tesseract, HTTP-запросы) регистрируют функцию прерывания через register();
+    при set() все зарегистрированные функции вызываются сразу, не дожидаясь следующей проверки is_set().
+    """
+    def __init__(self):
+        super().__init__()
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._callbacks = {}
+        self._next_handle = 0
+        self.cancelled_at = None # time.monotonic() момента остановки
+
+    def set(self):
+        # Флаг ставится под той же блокировкой, что и в register(): иначе функция, зарегистрированная
+        # между снятием списка и set(), не была бы вызвана
+        with self._lock:
+            if self.cancelled_at is None:
+                self.cancelled_at = time.monotonic()
+            super().set()
+            callbacks = list(self._callbacks.values())
+            self._callbacks.clear()
+
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                self.logger.debug(f"Ошибка при прерывании операции: {e}")
+
+    def clear(self):
+        with self._lock:
+            self.cancelled_at = None
+            self._callbacks.clear()
+            super().clear()
+
+    def register(self, callback):
+        """
+        Регистрирует функцию прерывания операции.
+        Если остановка уже запрошена — функция вызывается сразу.
+        Возвращает идентификатор для unregister() или None.
+        """
+        with self._lock:
+            if not self.is_set():
+                handle = self._next_handle
+                self._next_handle += 1
+                self._callbacks[handle] = callback
+                return handle
+        callback()
+        return None
+
+    def unregister(self, handle):
+        if handle is None:
+            return
+        with self._lock:
+            self._callbacks.pop(handle, None)
+
+    def latency(self):
+        """Время (в секундах) с момента запроса остановки."""
+        if self.cancelled_at is None:
+            return None
+        return time.monotonic() - self.cancelled_at
+
+
+def is_cancelled(cancel_token):
+    return cancel_token is not None and cancel_token.is_set()
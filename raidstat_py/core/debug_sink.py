@@ -0,0 +1,146 @@
+import os
+import json
+import queue
+import hashlib
+import logging
+import tempfile
+import threading
+import cv2
+import numpy as np
+from PIL import Image
+
+# Все отладочные кропы скриншота хранятся в одном спрайте и индексе прямоугольников
+SPRITE_NAME = "sprite.png"
+INDEX_NAME = "sprite.json"
+# Ссылка на кроп: "<папка отладки>/sprite.png#<поле>"
+REF_SEPARATOR = "#"
+
+SPRITE_GAP = 2
+
+logger = logging.getLogger(__name__)
+
+
+class DebugSink:
+    """
+    Фоновая запись отладочных кропов.
+
+    Кропы одного скриншота складываются в один спрайт (SPRITE_NAME) с индексом прямоугольников
+    (INDEX_NAME) вместо десятков мелких файлов. Запись выполняется в отдельном потоке,
+    потоки распознавания только ставят кропы в очередь; drain() дожидается записи.
+    """
+    def __init__(self, history):
+        self.history = history
+        self.logger = logging.getLogger(__name__)
+        self.queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def write(self, debug_dir, crops):
+        """
+        Ставит в очередь запись кропов {поле: изображение} в спрайт папки debug_dir.
+        Возвращает ссылки {поле: "<debug_dir>/sprite.png#поле"} (действительны после записи).
+        """
+        crops = {field: crop for field, crop in crops.items() if crop is not None}
+        if not crops:
+            return {}
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        self.queue.put((debug_dir, crops))
+        sprite_path = os.path.join(debug_dir, SPRITE_NAME)
+        return {field: f"{sprite_path}{REF_SEPARATOR}{field}" for field in crops}
+
+    def drain(self):
+        """Ждет, пока все поставленные спрайты будут записаны."""
+        self.queue.join()
+
+    def _run(self):
+        while True:
+            job = self.queue.get()
+            try:
+                self._write(*job)
+            except Exception as e:
+                self.logger.error(f"Не удалось сохранить отладочные изображения: {e}")
+            finally:
+                self.queue.task_done()
+
+    def _write(self, debug_dir, crops):
+        if not os.path.exists(debug_dir):
+            os.makedirs(debug_dir, exist_ok=True)
+            self.history.add_created(debug_dir)
+
+        grays = {field: _to_gray(crop) for field, crop in crops.items()}
+        width = max(g.shape[1] for g in grays.values())
+        height = sum(g.shape[0] for g in grays.values()) + SPRITE_GAP * (len(grays) - 1)
+
+        sprite = np.full((height, width), 255, dtype=np.uint8)
+        index = {}
+        y = 0
+        for field, gray in grays.items():
+            h, w = gray.shape
+            sprite[y:y + h, 0:w] = gray
+            index[field] = [0, y, w, h]
+            y += h + SPRITE_GAP
+
+        Image.fromarray(sprite).save(os.path.join(debug_dir, SPRITE_NAME))
+        with open(os.path.join(debug_dir, INDEX_NAME), 'w', encoding='utf-8') as f:
+            json.dump(index, f, ensure_ascii=False)
+
+
+def _to_gray(crop):
+    crop = np.asarray(crop)
+    if crop.ndim == 3:
+        return cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    return crop
+
+
+def _split_ref(ref):
+    sprite_path, _, field = ref.rpartition(REF_SEPARATOR)
+    return sprite_path, field
+
+
+def is_sprite_ref(ref):
+    return bool(ref) and os.path.basename(_split_ref(ref)[0]) == SPRITE_NAME
+
+
+def debug_image_exists(ref):
+    """Существует ли отладочное изображение (обычный путь или ссылка на спрайт)."""
+    if not ref:
+        return False
+    if is_sprite_ref(ref):
+        return os.path.exists(_split_ref(ref)[0])
+    return os.path.exists(ref)
+
+
+def debug_image_path(ref):
+    """
+    Путь к файлу отладочного изображения для вставки в комментарий.
+    Кроп из спрайта извлекается только при первом обращении — во временную папку.
+    Возвращает None, если изображения нет.
+    """
+    if not debug_image_exists(ref):
+        return None
+    if not is_sprite_ref(ref):
+        return ref
+
+    sprite_path, field = _split_ref(ref)
+    key = f"{os.path.abspath(sprite_path)}|{os.path.getmtime(sprite_path)}|{field}"
+    cache_dir = os.path.join(tempfile.gettempdir(), "raidstat_debug")
+    out_path = os.path.join(cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + ".png")
+    if os.path.exists(out_path):
+        return out_path
+
+    try:
+        with open(os.path.join(os.path.dirname(sprite_path), INDEX_NAME), 'r', encoding='utf-8') as f:
+            rect = json.load(f).get(field)
+        if not rect:
+            return None
+        x, y, w, h = rect
+        os.makedirs(cache_dir, exist_ok=True)
+        with Image.open(sprite_path) as sprite:
+            sprite.crop((x, y, x + w, y + h)).save(out_path)
+    except Exception as e:
+        logger.warning(f"Не удалось извлечь отладочное изображение {ref}: {e}")
+        return None
+    return out_path
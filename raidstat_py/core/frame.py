@@ -0,0 +1,100 @@
+import threading
+import logging
+import cv2
+import numpy as np
+from .roi_archive import is_roi_manifest, load_pixels
+
+
+class Frame:
+    """
+    Декодированный скриншот, общий для всех этапов обработки.
+
+    Файл декодируется один раз сразу в нужный OCR формат (по умолчанию оттенки серого —
+    цвет при распознавании не используется). Области выдаются как numpy-представления
+    только для чтения, без копирования. Пиксели освобождаются, когда последний этап
+    вызывает release() (счетчик ссылок: load() — 1, retain() — +1, release() — -1).
+    """
+    def __init__(self, pixels, path=None):
+        pixels.flags.writeable = False
+        self._pixels = pixels
+        self.path = path
+        self.shape = pixels.shape
+        self._refs = 1
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path, grayscale=True):
+        """
+        Декодирует файл изображения.
+        np.fromfile + cv2.imdecode вместо cv2.imread — чтобы читались пути с кириллицей на Windows.
+        Архив областей (манифест .roi.json) восстанавливается в изображение исходного размера.
+        Возвращает Frame или None, если файл не удалось прочитать.
+        """
+        if is_roi_manifest(path):
+            try:
+                pixels = load_pixels(path, grayscale)
+            except (OSError, ValueError, KeyError) as e:
+                logging.getLogger(__name__).error(f"Не удалось прочитать архив {path}: {e}")
+                return None
+            if pixels is None:
+                logging.getLogger(__name__).error(f"Не удалось декодировать архив {path}")
+                return None
+            return cls(pixels, path)
+
+        try:
+            data = np.fromfile(path, dtype=np.uint8)
+        except OSError as e:
+            logging.getLogger(__name__).error(f"Не удалось прочитать {path}: {e}")
+            return None
+
+        flags = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+        pixels = cv2.imdecode(data, flags)
+        if pixels is None:
+            logging.getLogger(__name__).error(f"Не удалось декодировать изображение {path}")
+            return None
+        return cls(pixels, path)
+
+    @property
+    def height(self): return self.shape[0]
+
+    @property
+    def width(self): return self.shape[1]
+
+    @property
+    def pixels(self):
+        """Все изображение (только для чтения)."""
+        pixels = self._pixels
+        if pixels is None:
+            raise ValueError(f"Изображение уже освобождено: {self.path}")
+        return pixels
+
+    def region(self, x, y, w, h):
+        """Область (x, y, w, h), обрезанная по границам изображения, — представление без копирования."""
+        x = max(0, min(x, self.width))
+        y = max(0, min(y, self.height))
+        w = max(1, min(w, self.width - x))
+        h = max(1, min(h, self.height - y))
+        return self.pixels[y:y+h, x:x+w]
+
+    def retain(self):
+        """Еще один этап будет использовать кадр."""
+        with self._lock:
+            self._refs += 1
+        return self
+
+    def release(self):
+        """Этап закончил работу с кадром; после последнего освобождения пиксели удаляются."""
+        with self._lock:
+            self._refs -= 1
+            if self._refs <= 0:
+                self._pixels = None
+
+    @property
+    def released(self):
+        return self._pixels is None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
@@ -3,6 +3,7 @@ import os
 import shutil
 import logging
 import threading
+from .roi_archive import restore_archive
 
 class HistoryManager:
     def __init__(self, mode):
@@ -10,6 +11,10 @@ class HistoryManager:
         self.filename = f"history_{mode}.json"
         self.moves = []
         self.created = []
+        # Хеши содержимого скриншотов, обработанных во всех запусках (см. scan_directory(exclude_hashes=...));
+        # откат запуска убирает его хеши, чтобы возвращенные скриншоты обработались снова
+        self.processed_filename = f"processed_{mode}.json"
+        self.processed = None
         self.logger = logging.getLogger(__name__)
         self.lock = threading.Lock()
 
@@ -19,25 +24,56 @@ class HistoryManager:
             self.created = []
         self.save()
 
-    def add_move(self, src, dest):
+    def add_move(self, src, dest, kind=None, content_hash=None):
+        """
+        kind "roi" — оригинал заархивирован (dest — манифест областей), откат восстанавливает изображение.
+        content_hash — хеш содержимого перемещенного скриншота (file_hash), запоминается как обработанный.
+        """
+        if content_hash:
+            self.processed_hashes()
         with self.lock:
-            self.moves.append({"src": src, "dest": dest})
+            move = {"src": src, "dest": dest}
+            if kind:
+                move["kind"] = kind
+            if content_hash:
+                move["hash"] = content_hash
+                self.processed.add(content_hash)
+            self.moves.append(move)
 
     def add_created(self, path):
         with self.lock:
             self.created.append(path)
 
     def save(self):
-        data = {
-            "moves": self.moves,
-            "created": self.created
-        }
+        # Копируем под блокировкой: записи могут добавляться из других потоков во время сохранения
+        with self.lock:
+            data = {
+                "moves": list(self.moves),
+                "created": list(self.created)
+            }
+            processed = sorted(self.processed) if self.processed is not None else None
         try:
             with open(self.filename, 'w', encoding='utf-8') as f:
                 json.dump(data, f, ensure_ascii=False, indent=2)
+            if processed is not None:
+                with open(self.processed_filename, 'w', encoding='utf-8') as f:
+                    json.dump(processed, f)
         except Exception as e:
             self.logger.error(f"Не удалось сохранить историю: {e}")
 
+    def processed_hashes(self):
+        """Хеши уже обработанных скриншотов (загружаются из файла при первом обращении)."""
+        with self.lock:
+            if self.processed is None:
+                self.processed = set()
+                if os.path.exists(self.processed_filename):
+                    try:
+                        with open(self.processed_filename, 'r', encoding='utf-8') as f:
+                            self.processed = set(json.load(f))
+                    except Exception as e:
+                        self.logger.error(f"Не удалось загрузить список обработанных скриншотов: {e}")
+            return set(self.processed)
+
     def load(self):
         if os.path.exists(self.filename):
             try:
@@ -58,7 +94,14 @@ class HistoryManager:
 
         self.logger.info(f"Откат {len(self.moves)} перемещений и {len(self.created)} созданных файлов...")
 
+        reverted_hashes = [move['hash'] for move in self.moves if move.get('hash')]
+        if reverted_hashes:
+            self.processed_hashes()
+            with self.lock:
+                self.processed.difference_update(reverted_hashes)
+
         # Откат перемещений
+        roi_restored = 0
         for move in reversed(self.moves):
             src = move['src']
             dest = move['dest']
@@ -68,13 +111,24 @@ class HistoryManager:
                     os.makedirs(os.path.dirname(src), exist_ok=True)
                     if os.path.exists(src):
                         os.remove(src)
-                    shutil.move(dest, src)
-                    self.logger.info(f"Восстановлено: {os.path.basename(dest)} -> {os.path.dirname(src)}")
+                    if move.get('kind') == 'roi':
+                        restored = restore_archive(dest, src)
+                        roi_restored += 1
+                        self.logger.info(f"Восстановлены области: {os.path.basename(dest)} -> {restored}")
+                    else:
+                        shutil.move(dest, src)
+                        self.logger.info(f"Восстановлено: {os.path.basename(dest)} -> {os.path.dirname(src)}")
                 except Exception as e:
                     self.logger.error(f"Не удалось восстановить {dest} -> {src}: {e}")
             else:
                 self.logger.warning(f"Файл не найден для отката: {dest}")
 
+        if roi_restored:
+            self.logger.warning(
+                f"{roi_restored} скриншотов хранились только областями: оригиналы не восстанавливаются, "
+                f"вместо них записаны PNG с сохраненными областями (остальное изображение черное)"
+            )
+
         # Удаление созданных файлов/директорий
         for path in self.created:
             if os.path.exists(path):
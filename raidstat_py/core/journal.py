@@ -0,0 +1,149 @@
+import json
+import os
+import logging
+import threading
+import time
+
+class RunJournal:
+    """
+    Журнал текущего запуска для возобновления после сбоя или остановки.
+
+    Формат — JSON Lines: каждая запись дописывается в конец файла и сразу сбрасывается на диск,
+    поэтому при аварийном завершении теряется максимум последняя (недописанная) строка.
+    Записи:
+    - run: папка и план групп (пути файлов в порядке обработки)
+    - image: результат распознавания одного изображения
+    - move: перемещение файла (src -> dest)
+    - group: состояние группы ("saved" — записана в хранилище, "done" — полностью завершена)
+    """
+    def __init__(self, mode):
+        self.mode = mode
+        self.filename = f"journal_{mode}.jsonl"
+        self.logger = logging.getLogger(__name__)
+        self.lock = threading.Lock()
+        self._file = None
+
+    def start(self, folder_path, groups):
+        """
+        Начинает новый журнал.
+        groups: список словарей {"key": str, "paths": [пути]}.
+        """
+        with self.lock:
+            self._close_file()
+            try:
+                self._file = open(self.filename, 'w', encoding='utf-8')
+            except Exception as e:
+                self.logger.error(f"Не удалось создать журнал запуска: {e}")
+                self._file = None
+                return
+        self._write({
+            "type": "run",
+            "folder": os.path.abspath(folder_path),
+            "groups": groups,
+            "started": time.time()
+        })
+
+    def resume(self):
+        """Открывает существующий журнал для дозаписи."""
+        with self.lock:
+            self._close_file()
+            try:
+                self._file = open(self.filename, 'a', encoding='utf-8')
+            except Exception as e:
+                self.logger.error(f"Не удалось открыть журнал запуска: {e}")
+                self._file = None
+
+    def record_image(self, group_key, path, result):
+        self._write({"type": "image", "group": group_key, "path": path, "result": result})
+
+    def record_move(self, src, dest):
+        self._write({"type": "move", "src": src, "dest": dest})
+
+    def record_group(self, group_key, state, data=None):
+        self._write({"type": "group", "group": group_key, "state": state, "data": data})
+
+    def _write(self, record):
+        with self.lock:
+            if not self._file:
+                return
+            try:
+                self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+                self._file.flush()
+                os.fsync(self._file.fileno())
+            except Exception as e:
+                self.logger.error(f"Не удалось записать в журнал запуска: {e}")
+
+    def _close_file(self):
+        if self._file:
+            try:
+                self._file.close()
+            except Exception:
+                pass
+            self._file = None
+
+    def close(self):
+        """Закрывает журнал, оставляя его на диске (прерванный запуск можно будет возобновить)."""
+        with self.lock:
+            self._close_file()
+
+    def finish(self):
+        """Запуск завершен полностью — журнал больше не нужен."""
+        with self.lock:
+            self._close_file()
+            if os.path.exists(self.filename):
+                try:
+                    os.remove(self.filename)
+                except Exception as e:
+                    self.logger.error(f"Не удалось удалить журнал запуска: {e}")
+
+    def load(self):
+        """
+        Читает журнал.
+        Возвращает None, если журнала нет, или словарь:
+        {"folder", "groups", "images": {путь: результат}, "moves": {src: dest}, "group_states": {ключ: {"state", "data"}}}
+        """
+        if not os.path.exists(self.filename):
+            return None
+
+        state = None
+        try:
+            with open(self.filename, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Недописанная строка при аварийном завершении
+                        continue
+
+                    kind = record.get("type")
+                    if kind == "run":
+                        state = {
+                            "folder": record.get("folder"),
+                            "groups": record.get("groups", []),
+                            "images": {},
+                            "moves": {},
+                            "group_states": {}
+                        }
+                    elif state is None:
+                        continue
+                    elif kind == "image":
+                        state["images"][record["path"]] = record.get("result")
+                    elif kind == "move":
+                        state["moves"][record["src"]] = record["dest"]
+                    elif kind == "group":
+                        state["group_states"][record["group"]] = {
+                            "state": record.get("state"),
+                            "data": record.get("data")
+                        }
+        except Exception as e:
+            self.logger.error(f"Не удалось прочитать журнал запуска: {e}")
+            return None
+
+        return state
+
+    def pending_folder(self):
+        """Папка незавершенного запуска или None."""
+        state = self.load()
+        if not state:
+            return None
+        return state.get("folder")
@@ -13,6 +13,12 @@ class Matcher:
     def set_known_names(self, names):
         self.known_names = names
 
+    def with_known_names(self, names):
+        """Матчер с другим ростером и общими заменами — для запуска режима параллельно с другим."""
+        matcher = Matcher(known_names=names)
+        matcher.replacements = self.replacements
+        return matcher
+
     def load_replacements(self, file_path="Замены.txt"):
         """Загрузка замен из файла."""
         try:
@@ -8,6 +8,12 @@ from PIL import Image
 import sys
 import requests
 import io
+import shlex
+import subprocess
+import threading
+import bisect
+from .cancel import is_cancelled
+from .frame import Frame
 
 class OCRHandler:
     def __init__(self, config=None, lang='ru'):
@@ -56,7 +62,7 @@ class OCRHandler:
             self.logger.error(f"Не удалось инициализировать Tesseract: {e}")
             raise
 
-    def recognize_text(self, image_path_or_array, crop_area=None, det=True, lang=None, config=None):
+    def recognize_text(self, image_path_or_array, crop_area=None, det=True, lang=None, config=None, cancel_token=None):
         """
         Распознает текст на изображении или в конкретной области кропа.
         
@@ -66,23 +72,29 @@ class OCRHandler:
             det: Использовать ли детектирование текста (установите False, если изображение уже является кропом текста).
             lang: Переопределить язык (например, 'eng', 'rus', 'eng+rus').
             config: Дополнительная строка конфигурации Tesseract.
+            cancel_token: CancelToken; при остановке процесс Tesseract завершается принудительно.
             
         Returns:
             Список кортежей: [(текст, уверенность), ...]
         """
+        if is_cancelled(cancel_token):
+            return []
+
         img = self._load_image(image_path_or_array)
         if img is None: return []
 
         if crop_area:
             img = self._crop_image(img, crop_area)
 
-        return self._recognize_tesseract(img, det, lang, config)
+        return self._recognize_tesseract(img, det, lang, config, cancel_token=cancel_token)
 
     def _load_image(self, image_path_or_array):
         if isinstance(image_path_or_array, str):
             return cv2.imread(image_path_or_array)
         elif isinstance(image_path_or_array, np.ndarray):
             return image_path_or_array
+        elif isinstance(image_path_or_array, Frame):
+            return image_path_or_array.pixels
         else:
             self.logger.error("Некорректный ввод изображения. Должен быть путь или массив numpy.")
             return None
@@ -185,7 +197,7 @@ class OCRHandler:
         
         return final
 
-    def _recognize_tesseract(self, img, det, lang=None, extra_config=None):
+    def _recognize_tesseract(self, img, det, lang=None, extra_config=None, cancel_token=None):
         try:
             # Конвертируем в RGB для Pillow
             if len(img.shape) == 3:
@@ -213,7 +225,9 @@ class OCRHandler:
                 full_config += " " + extra_config
             full_config += " " + '--oem 1'
             
-            data = pytesseract.image_to_data(pil_img, lang=tess_lang, config=full_config, output_type=pytesseract.Output.DICT)
+            data = self._run_tesseract_data(pil_img, tess_lang, full_config, cancel_token)
+            if data is None:
+                return [] # Прервано остановкой
             # if 'text' in data:
             #     for i in range(len(data['text'])):
             #         # Вывод соответствия текста и уверенности для отладки
@@ -237,6 +251,43 @@ class OCRHandler:
             self.logger.error(f"Ошибка распознавания Tesseract: {e}")
             return []
 
+    def _run_tesseract_data(self, pil_img, lang, config, cancel_token=None):
+        """
+        Аналог pytesseract.image_to_data(output_type=DICT), но с управляемым процессом:
+        процесс регистрируется в cancel_token и принудительно завершается при остановке.
+        Возвращает словарь как у pytesseract или None, если распознавание прервано.
+        Использует внутренние функции pytesseract (save, subprocess_args, get_errors, file_to_dict),
+        поэтому версия pytesseract закреплена в requirements.txt.
+        """
+        tess = pytesseract.pytesseract
+        config = f'-c tessedit_create_tsv=1 {config.strip()}'
+
+        with tess.save(pil_img) as (temp_name, input_filename):
+            cmd_args = [tess.tesseract_cmd, input_filename, temp_name, '-l', lang]
+            cmd_args += shlex.split(config, posix=not sys.platform.startswith('win'))
+
+            try:
+                proc = subprocess.Popen(cmd_args, **tess.subprocess_args())
+            except FileNotFoundError:
+                raise pytesseract.TesseractNotFoundError()
+
+            handle = cancel_token.register(proc.kill) if cancel_token is not None else None
+            try:
+                _, error_string = proc.communicate()
+            finally:
+                if cancel_token is not None:
+                    cancel_token.unregister(handle)
+
+            if is_cancelled(cancel_token):
+                return None
+            if proc.returncode:
+                raise pytesseract.TesseractError(proc.returncode, tess.get_errors(error_string))
+
+            with open(f"{temp_name}.tsv", 'rb') as f:
+                tsv = f.read().decode('utf-8')
+
+        return tess.file_to_dict(tsv, '\t', -1)
+
     def recognize_batch(self, image_list, det=True):
         """
         Распознает текст в списке изображений.
@@ -268,13 +319,13 @@ class OCRHandler:
                 
         return final_results
 
-    def recognize_single_line(self, image_path_or_array, crop_area=None, lang=None, config=None):
+    def recognize_single_line(self, image_path_or_array, crop_area=None, lang=None, config=None, cancel_token=None):
         """
         Помощник для получения одной строки из области (например, имя, число).
         Объединяет несколько обнаруженных блоков, если это необходимо.
         """
         # Для одной строки мы определенно хотим det=False (обычно PSM 7)
-        results = self.recognize_text(image_path_or_array, crop_area, det=False, lang=lang, config=config)
+        results = self.recognize_text(image_path_or_array, crop_area, det=False, lang=lang, config=config, cancel_token=cancel_token)
         if not results:
             return None, 0.0
         
@@ -283,7 +334,55 @@ class OCRHandler:
         
         return full_text.strip(), avg_conf
 
-    def recognize_online_ocr_space(self, image_path_or_array, api_key=None, language='auto'):
+    def recognize_lines_batch(self, crops, lang='eng+rus', line_gap=20, cancel_token=None):
+        """
+        Распознает несколько однострочных кропов одним вызовом Tesseract.
+
+        Предобработанные кропы (темный текст на белом) складываются в вертикальную полосу
+        с промежутками line_gap, полоса распознается с --psm 6, а слова возвращаются
+        к своим кропам по вертикальному положению bbox.
+
+        Returns:
+            Список текстов в порядке crops ('' — в строке ничего не найдено) или None при остановке/ошибке.
+        """
+        if not crops:
+            return []
+
+        grays = [c if len(c.shape) == 2 else cv2.cvtColor(c, cv2.COLOR_BGR2GRAY) for c in crops]
+        width = max(g.shape[1] for g in grays) + 2 * line_gap
+        starts = []
+        y = line_gap
+        for g in grays:
+            starts.append(y)
+            y += g.shape[0] + line_gap
+
+        strip = np.full((y, width), 255, dtype=np.uint8)
+        for g, top in zip(grays, starts):
+            strip[top:top + g.shape[0], line_gap:line_gap + g.shape[1]] = g
+
+        try:
+            data = self._run_tesseract_data(Image.fromarray(strip), lang, '--psm 6 --oem 1', cancel_token)
+        except Exception as e:
+            self.logger.error(f"Ошибка пакетного распознавания Tesseract: {e}")
+            return None
+        if data is None:
+            return None # Прервано остановкой
+
+        # Граница строки — середина промежутка перед ней
+        bounds = [top - line_gap / 2 for top in starts]
+        words = [[] for _ in crops]
+        for i in range(len(data.get('text', []))):
+            text = str(data['text'][i]).strip()
+            if not text or float(data['conf'][i]) < 0:
+                continue
+            center = int(data['top'][i]) + int(data['height'][i]) / 2
+            index = bisect.bisect_right(bounds, center) - 1
+            if 0 <= index < len(crops) and center < starts[index] + grays[index].shape[0] + line_gap / 2:
+                words[index].append((int(data['left'][i]), text))
+
+        return [" ".join(text for _, text in sorted(line)) for line in words]
+
+    def recognize_online_ocr_space(self, image_path_or_array, api_key=None, language='auto', cancel_token=None):
         """
         Распознает текст с помощью OCR.space API.
         
@@ -291,6 +390,7 @@ class OCRHandler:
             image_path_or_array: Путь к изображению или массив numpy (изображение cv2).
             api_key: API ключ OCR.space. Если None, делается попытка взять из конфига.
             language: Код языка.
+            cancel_token: CancelToken; при остановке ожидание ответа прерывается.
             
         Returns:
             Текст (строка) или None в случае ошибки.
@@ -328,10 +428,13 @@ class OCRHandler:
             }
             
             # self.logger.debug("Отправка запроса к OCR.space API...")
-            response = requests.post('https://api.ocr.space/parse/image',
-                                     files=files,
-                                     data=payload,
-                                     timeout=10) # тайм-аут 10 секунд
+            response = self._post_cancellable('https://api.ocr.space/parse/image',
+                                              files=files,
+                                              data=payload,
+                                              timeout=10, # тайм-аут 10 секунд
+                                              cancel_token=cancel_token)
+            if response is None:
+                return None # Прервано остановкой
             
             if response.status_code != 200:
                 self.logger.error(f"OCR.space API HTTP Error: {response.status_code} - {response.text}")
@@ -368,6 +471,40 @@ class OCRHandler:
         except Exception as e:
             self.logger.error(f"Ошибка запроса онлайн OCR: {e}")
             return None
+    def _post_cancellable(self, url, files, data, timeout, cancel_token=None):
+        """
+        requests.post, который можно прервать через cancel_token.
+        Запрос выполняется в отдельном потоке; при остановке сессия закрывается,
+        а вызывающий поток сразу возвращает None, не дожидаясь тайм-аута.
+        """
+        if cancel_token is None:
+            return requests.post(url, files=files, data=data, timeout=timeout)
+
+        session = requests.Session()
+        outcome = {}
+
+        def send():
+            try:
+                outcome['response'] = session.post(url, files=files, data=data, timeout=timeout)
+            except Exception as e:
+                outcome['error'] = e
+
+        worker = threading.Thread(target=send, daemon=True)
+        worker.start()
+        handle = cancel_token.register(session.close)
+        try:
+            while worker.is_alive():
+                worker.join(0.05)
+                if cancel_token.is_set():
+                    return None
+        finally:
+            cancel_token.unregister(handle)
+
+        if 'error' in outcome:
+            raise outcome['error']
+        session.close()
+        return outcome.get('response')
+
     @staticmethod
     def _get_longest_word(text):
         if not text:
@@ -377,8 +514,56 @@ class OCRHandler:
             return None
         return max(words, key=len)
 
+    def preprocess_name(self, crop_bgr, preprocess_params=None):
+        """Основная предобработка кропа имени (шаг 1 process_name_recognition)."""
+        preprocess_params = preprocess_params or {}
+        otsu_offset = preprocess_params.get("otsu_offset", 0)
+
+        # Логика: если otsu_offset != 0, сначала пробуем ФИКСИРОВАННЫЙ порог (что помогает для «битых» ячеек).
+        # Мы пробуем 75 как хорошую базовую линию для битых ячеек.
+        current_fixed_threshold = 75 if (otsu_offset != 0) else None
+        current_use_otsu = preprocess_params.get("use_otsu", True) if (otsu_offset == 0) else False # Если смещение задано, мы не используем Otsu на шаге 1, а используем фиксированный порог.
+
+        return self.preprocess_for_ocr(
+            crop_bgr,
+            scale_factor=2, 
+            padding=preprocess_params.get("padding", 0), 
+            use_otsu=current_use_otsu,
+            max_threshold=preprocess_params.get("max_threshold", None),
+            otsu_offset=0, # Не используется здесь, если задан фиксированный порог
+            fixed_threshold=current_fixed_threshold,
+            invert=True
+        )
+
+    def process_name_batch(self, crops, matcher, preprocess_params=None, item_ids=None, cancel_token=None):
+        """
+        Пакетный первый проход распознавания имен: все кропы — одним вызовом Tesseract (recognize_lines_batch).
+
+        Принимаются только уверенные совпадения (типы 0, 1, 4); для остальных кропов нужна
+        полная лестница повторов process_name_recognition.
+
+        Returns:
+            Список того же размера, что crops: (name, score, type_code, crop_processed) или None.
+        """
+        processed = [self.preprocess_name(crop, preprocess_params) for crop in crops]
+        texts = self.recognize_lines_batch(processed, cancel_token=cancel_token)
+        if texts is None:
+            return [None] * len(crops)
+
+        results = []
+        for i, (text, crop_processed) in enumerate(zip(texts, processed)):
+            name, score, type_code = matcher.smart_match(self._get_longest_word(text))
+            if name and type_code in [0, 1, 4]:
+                item_id = item_ids[i] if item_ids else str(i)
+                self.logger.info(f"[{item_id}] -> '{name}' (пакет)")
+                results.append((name, score, type_code, crop_processed))
+            else:
+                results.append(None)
+        return results
+
     def process_name_recognition(self, full_img_bgr, rect, matcher, ocr_mode='offline', 
-                                preprocess_params=None, online_crop_no_otsu=False, retry_with_shifts=True, item_id=""):
+                                preprocess_params=None, online_crop_no_otsu=False, retry_with_shifts=True, item_id="",
+                                cancel_token=None):
         """
         Унифицированный метод для распознавания имен с повторными попытками.
         
@@ -391,12 +576,12 @@ class OCRHandler:
             online_crop_no_otsu: Если True, использует кроп без Otsu для онлайн-повтора.
             retry_with_shifts: Если True, пробует сдвиги y-1 и y+1, если результат не оптимален.
             item_id: Строковый ID для отладочных логов (например, координаты ячейки или имя файла).
+            cancel_token: CancelToken; при остановке оставшиеся шаги не выполняются.
             
         Returns:
             (name, score, type_code, crop_processed)
         """
         preprocess_params = preprocess_params or {}
-        use_otsu = preprocess_params.get("use_otsu", True)
         max_threshold = preprocess_params.get("max_threshold", None)
         otsu_offset = preprocess_params.get("otsu_offset", 0) 
         padding = preprocess_params.get("padding", 0)
@@ -412,24 +597,10 @@ class OCRHandler:
         crop_bgr = full_img_bgr[y:y+h, x:x+w].copy()
         
         # 1. Основная стратегия предобработки
-        # Логика: если otsu_offset != 0, сначала пробуем ФИКСИРОВАННЫЙ порог (что помогает для «битых» ячеек).
-        # Мы пробуем 75 как хорошую базовую линию для битых ячеек.
-        current_fixed_threshold = 75 if (otsu_offset != 0) else None
-        current_use_otsu = use_otsu if (otsu_offset == 0) else False # Если смещение задано, мы не используем Otsu на шаге 1, а используем фиксированный порог.
-        
-        crop_processed = self.preprocess_for_ocr(
-            crop_bgr,
-            scale_factor=2, 
-            padding=padding, 
-            use_otsu=current_use_otsu,
-            max_threshold=max_threshold,
-            otsu_offset=0, # Не используется здесь, если задан фиксированный порог
-            fixed_threshold=current_fixed_threshold,
-            invert=True
-        )
+        crop_processed = self.preprocess_name(crop_bgr, preprocess_params)
         
         # 1.1 Сопоставление
-        raw_text, conf = self.recognize_single_line(crop_processed, lang='eng+rus')
+        raw_text, conf = self.recognize_single_line(crop_processed, lang='eng+rus', cancel_token=cancel_token)
         longest_word = self._get_longest_word(raw_text)
         name, score, type_code = matcher.smart_match(longest_word)
         
@@ -448,7 +619,7 @@ class OCRHandler:
                 fixed_threshold=None,
                 invert=True
             )
-            raw_text, conf = self.recognize_single_line(crop_retry_otsu, lang='eng+rus')
+            raw_text, conf = self.recognize_single_line(crop_retry_otsu, lang='eng+rus', cancel_token=cancel_token)
             longest_word = self._get_longest_word(raw_text)
             name_retry, score_retry, type_code_retry = matcher.smart_match(longest_word)
             
@@ -471,7 +642,7 @@ class OCRHandler:
                 otsu_offset=0,
                 invert=True
              )
-             raw_text, conf = self.recognize_single_line(crop_no_otsu, lang='eng+rus')
+             raw_text, conf = self.recognize_single_line(crop_no_otsu, lang='eng+rus', cancel_token=cancel_token)
              longest_word = self._get_longest_word(raw_text)
              name_retry, score_retry, type_code_retry = matcher.smart_match(longest_word)
              
@@ -489,7 +660,7 @@ class OCRHandler:
             has_cyrillic = bool(re.search('[а-яА-ЯёЁ]', name))
             target_lang = 'eng' if has_cyrillic else 'rus'
             
-            raw_text_retry, conf_retry = self.recognize_single_line(crop_processed, lang=target_lang)
+            raw_text_retry, conf_retry = self.recognize_single_line(crop_processed, lang=target_lang, cancel_token=cancel_token)
             longest_word_retry = self._get_longest_word(raw_text_retry)
             name_retry, score_retry, type_code_retry = matcher.smart_match(longest_word_retry)
             
@@ -500,6 +671,9 @@ class OCRHandler:
                  score = score_retry
                  type_code = type_code_retry
 
+        if is_cancelled(cancel_token):
+            return name, score, type_code, crop_processed
+
         # 4. Смешанный режим (Online)
         if ocr_mode == 'mixed' and (not name or type_code in [2, 3]):
             try:
@@ -516,7 +690,7 @@ class OCRHandler:
                 else:
                     crop_online = crop_processed
                     
-                online_text = self.recognize_online_ocr_space(crop_online)
+                online_text = self.recognize_online_ocr_space(crop_online, cancel_token=cancel_token)
                 debug_info.append(f"[Step 4 Online]: Text='{online_text}'")
                 
                 if online_text:
@@ -533,7 +707,7 @@ class OCRHandler:
                 debug_info.append(f"[Step 4 Online]: Error {e}")
 
         # 5. Повтор со сдвигом области (новое)
-        if retry_with_shifts and (not name or type_code in [2, 3]):
+        if retry_with_shifts and (not name or type_code in [2, 3]) and not is_cancelled(cancel_token):
             # Помощник для сдвига
             def try_shift(shift_pix):
                 new_y = y + shift_pix
@@ -542,7 +716,8 @@ class OCRHandler:
                 # Рекурсия
                 res = self.process_name_recognition(
                     full_img_bgr, (x, new_y, w, h), matcher, 'offline', 
-                    preprocess_params, online_crop_no_otsu, retry_with_shifts=False, item_id=item_id + "_shift"
+                    preprocess_params, online_crop_no_otsu, retry_with_shifts=False, item_id=item_id + "_shift",
+                    cancel_token=cancel_token
                 )
                 return res
  
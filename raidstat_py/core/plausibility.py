@@ -0,0 +1,80 @@
+import cv2
+import numpy as np
+
+
+class PlausibilityCheck:
+    """
+    Проверка правдоподобия распознанных чисел статистики.
+
+    - Длина: число цифр не может превышать то, что помещается в область поля при данном масштабе,
+      и то, сколько цифр видно в самой области (по ширине светлого текста).
+    - Хонор и фраги только растут, и за одно событие — не больше max_delta.
+    - ГС меняется медленно: отличие от предыдущего значения не больше max_delta['gear'].
+
+    Предыдущие значения (prior) — {'kills', 'honor', 'gear'} игрока из прошлой группы или сохраненной статистики.
+    Проверки по prior пропускаются, если значение неизвестно или лимит равен 0.
+    """
+    # Ширина цифры вместе с интервалом в пикселях при масштабе интерфейса 100%.
+    # Откалибровано по скриншотам tests/fixtures (масштаб 120%): 5 цифр занимают 45-49 px, 6 — 55-59, 7 — 63-68
+    DIGIT_WIDTHS = {'kills': 8.0, 'honor': 8.0, 'gear': 8.0}
+    # Минимальный перепад яркости области, при котором в ней есть текст
+    MIN_CONTRAST = 40
+
+    def __init__(self, field_widths, scale, max_delta):
+        self.max_delta = max_delta
+        self.digit_widths = {field: width * scale / 100 for field, width in self.DIGIT_WIDTHS.items()}
+        self.max_digits = {
+            field: max(1, int(width // self.digit_widths[field]))
+            for field, width in field_widths.items() if field in self.digit_widths
+        }
+
+    def digits_shown(self, field, crop):
+        """
+        Сколько цифр видно в области поля (кроп скриншота в оттенках серого): ширина светлого текста
+        на темном фоне, деленная на ширину цифры. None — если текста в области нет или поле неизвестно.
+        """
+        digit_width = self.digit_widths.get(field)
+        if digit_width is None or crop is None or crop.size == 0:
+            return None
+        if len(crop.shape) == 3:
+            crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        if int(crop.max()) - int(crop.min()) < self.MIN_CONTRAST:
+            return None
+        threshold, _ = cv2.threshold(crop, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        columns = np.where((crop > threshold).any(axis=0))[0]
+        if not len(columns):
+            return None
+        # +1 — интервал после последней цифры
+        return max(1, round((columns[-1] - columns[0] + 2) / digit_width))
+
+    def check(self, field, value, prior=None, crop=None):
+        """
+        Возвращает причину, по которой значение неправдоподобно, или None.
+        crop — исходная область поля: лишняя цифра распознается и без предыдущих значений.
+        """
+        if value is None:
+            return None
+
+        max_digits = self.max_digits.get(field)
+        if max_digits and len(str(value)) > max_digits:
+            return f"больше {max_digits} цифр"
+
+        shown = self.digits_shown(field, crop) if crop is not None else None
+        if shown and len(str(value)) > shown:
+            return f"цифр больше, чем видно в области ({shown})"
+
+        prev = (prior or {}).get(field)
+        if prev is None:
+            return None
+
+        limit = self.max_delta.get(field, 0)
+        if field == 'gear':
+            if limit and abs(value - prev) > limit:
+                return f"ГС изменился больше чем на {limit} (было {prev})"
+            return None
+
+        if value < prev:
+            return f"меньше предыдущего {prev}"
+        if limit and value - prev > limit:
+            return f"рост больше {limit} (было {prev})"
+        return None
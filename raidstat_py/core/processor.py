@@ -1,11 +1,13 @@
 import logging
-import threading
 from ..utils.config import Config
 from .ocr import OCRHandler
 from .matcher import Matcher
 from ..storage.excel_impl import ExcelStorage
+from ..storage.sqlite_impl import SqliteStorage
+from ..storage.columnar_export import ColumnarExporter, FACTS_FORMATS
 from .attendance import AttendanceProcessor
 from .statistics import StatisticsProcessor
+from .cancel import CancelToken
 
 class RaidStatProcessor:
     def __init__(self):
@@ -14,7 +16,7 @@ class RaidStatProcessor:
         # Инициализация компонентов
         self.config = Config()
         self.ocr = OCRHandler(config=self.config)
-        self.storage = ExcelStorage()
+        self.storage = self._create_storage()
         
         # Загрузка ростера для матчера
         roster = self.storage.get_roster()
@@ -34,9 +36,36 @@ class RaidStatProcessor:
         # Процессоры
         self.attendance_processor = AttendanceProcessor(self.config, self.ocr, self.matcher, self.storage)
         self.statistics_processor = StatisticsProcessor(self.config, self.ocr, self.matcher, self.storage, debug_screens=self.config.get("debug_screens"))
+        self._configure_facts()
         
-        # Контроль
-        self.stop_event = threading.Event()
+        # Контроль: токены остановки прерывают и текущие процессы Tesseract / онлайн-запросы.
+        # У каждого режима свой токен — режимы можно запускать и останавливать независимо
+        self.stop_events = {"attendance": CancelToken(), "statistics": CancelToken()}
+
+    def _create_storage(self):
+        if self.config.storage_backend == "sqlite":
+            return SqliteStorage()
+        return ExcelStorage(use_com=self.config.excel_com, partition=self.config.excel_partition)
+
+    def _configure_facts(self):
+        fmt = self.config.facts_export
+        facts = ColumnarExporter(fmt=fmt) if fmt in FACTS_FORMATS else None
+        self.attendance_processor.facts = facts
+        self.statistics_processor.facts = facts
+
+    def export_excel(self):
+        """Выгружает базу SQLite в книгу Excel. Возвращает путь или None."""
+        if not isinstance(self.storage, SqliteStorage):
+            self.logger.info("Данные уже хранятся в Raidstat.xlsx — выгрузка не нужна")
+            return None
+        return self.storage.export_excel()
+
+    def rebuild_attendance_summary(self):
+        """Полный пересчет листа "Сводка" (для SQLite сводка строится при выгрузке)."""
+        if not isinstance(self.storage, ExcelStorage):
+            self.logger.info("Сводка посещаемости строится при выгрузке в Excel")
+            return False
+        return self.storage.rebuild_attendance_summary()
 
     def revert_attendance(self):
         self.attendance_processor.revert_history()
@@ -44,25 +73,55 @@ class RaidStatProcessor:
     def revert_statistics(self):
         self.statistics_processor.revert_history()
 
-    def stop_processing(self):
+    def stop_processing(self, mode=None):
+        """Останавливает обработку режима mode ("attendance" / "statistics") или обоих."""
         self.logger.info("Остановка обработки...")
-        self.stop_event.set()
+        for name, token in self.stop_events.items():
+            if mode in (None, name):
+                token.set()
 
-    def process_attendance(self, folder_path, recursive=False):
-        self.stop_event.clear()
-        # Перезагружаем ростер, чтобы использовать актуальные имена из Excel
-        self.matcher.set_known_names(self.storage.get_roster(source="attendance"))
+    def is_stopped(self, mode):
+        return self.stop_events[mode].is_set()
+
+    def has_pending_run(self, mode, folder_path):
+        """Есть ли для папки незавершенный (прерванный) запуск, который можно возобновить."""
+        if mode == "attendance":
+            return self.attendance_processor.has_pending_run(folder_path)
+        return self.statistics_processor.has_pending_run(folder_path)
+
+    def process_attendance(self, folder_path, recursive=False, resume=False):
+        stop_event = self.stop_events["attendance"]
+        stop_event.clear()
+        # Перезагружаем ростер, чтобы использовать актуальные имена из Excel.
+        # Свой матчер на запуск: сбор статистики может идти параллельно со своим ростером
+        self.attendance_processor.matcher = self.matcher.with_known_names(self.storage.get_roster(source="attendance"))
         
         self.logger.info(f"Начало обработки посещаемости в {folder_path}")
-        return self.attendance_processor.process_folder(folder_path, recursive, self.stop_event)
+        try:
+            result = self.attendance_processor.process_folder(folder_path, recursive, stop_event, resume=resume)
+        finally:
+            self.attendance_processor.matcher = self.matcher
+        self._log_stop_latency(stop_event)
+        return result
 
-    def process_statistics(self, folder_path, recursive=False):
-        self.stop_event.clear()
+    def process_statistics(self, folder_path, recursive=False, resume=False):
+        stop_event = self.stop_events["statistics"]
+        stop_event.clear()
         # Перезагружаем ростер здесь тоже
-        self.matcher.set_known_names(self.storage.get_roster(source="statistics"))
+        self.statistics_processor.matcher = self.matcher.with_known_names(self.storage.get_roster(source="statistics"))
         
         self.logger.info(f"Начало сбора статистики в {folder_path}")
-        return self.statistics_processor.process_folder(folder_path, recursive, self.stop_event)
+        try:
+            result = self.statistics_processor.process_folder(folder_path, recursive, stop_event, resume=resume)
+        finally:
+            self.statistics_processor.matcher = self.matcher
+        self._log_stop_latency(stop_event)
+        return result
+
+    def _log_stop_latency(self, stop_event):
+        latency = stop_event.latency()
+        if latency is not None:
+            self.logger.info(f"Остановка заняла {latency:.2f} с")
 
     def reload_config(self):
         self.config.load()
@@ -71,3 +130,16 @@ class RaidStatProcessor:
         self.attendance_processor.grid_params = self.attendance_processor._get_grid_params(self.config.interface_scale)
         self.statistics_processor.offsets = self.statistics_processor._get_offsets(self.config.interface_scale)
         self.statistics_processor.debug_screens = self.config.get("debug_screens")
+        # Смена хранилища применяется к следующему запуску обработки
+        backend = "sqlite" if isinstance(self.storage, SqliteStorage) else "excel"
+        if backend != self.config.storage_backend:
+            self.storage = self._create_storage()
+            self.attendance_processor.storage = self.storage
+            self.statistics_processor.storage = self.storage
+        if isinstance(self.storage, ExcelStorage):
+            self.storage.use_com = self.config.excel_com
+            self.storage.partition = self.config.excel_partition
+        self._configure_facts()
+        self.attendance_processor.annotation_writer.configure(
+            self.config.annotation_mode, self.config.annotation_format, self.config.annotation_quality
+        )
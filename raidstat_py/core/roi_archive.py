@@ -0,0 +1,188 @@
+import os
+import json
+import shutil
+import logging
+import cv2
+import numpy as np
+from PIL import Image
+
+# Режимы хранения обработанных скриншотов:
+# full — оригинал перемещается целиком; roi — сохраняются только читаемые области (полоса PNG + манифест)
+ARCHIVE_MODES = ("full", "roi")
+
+ROI_MANIFEST_EXT = ".roi.json"
+ROI_STRIP_EXT = ".roi.png"
+
+# Запас вокруг областей (для повторов со сдвигом при повторной обработке)
+ROI_MARGIN = 4
+
+# Форматы без потерь: откат архива в JPEG исказил бы и сохраненные области
+LOSSLESS_EXTS = (".png", ".bmp")
+
+logger = logging.getLogger(__name__)
+
+
+def is_roi_manifest(path):
+    return path.lower().endswith(ROI_MANIFEST_EXT)
+
+
+def is_roi_strip(path):
+    return path.lower().endswith(ROI_STRIP_EXT)
+
+
+def strip_path(manifest_path):
+    """Путь полосы областей для манифеста."""
+    return manifest_path[:-len(ROI_MANIFEST_EXT)] + ROI_STRIP_EXT
+
+
+def screenshot_base_name(path):
+    """Имя скриншота без расширения (для архива — без .roi.json)."""
+    name = os.path.basename(path)
+    if is_roi_manifest(name):
+        return name[:-len(ROI_MANIFEST_EXT)]
+    return os.path.splitext(name)[0]
+
+
+def _imread(path, grayscale):
+    # np.fromfile + cv2.imdecode вместо cv2.imread — чтобы читались пути с кириллицей на Windows
+    flags = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+    return cv2.imdecode(np.fromfile(path, dtype=np.uint8), flags)
+
+
+def _imwrite(path, pixels):
+    ok, encoded = cv2.imencode(os.path.splitext(path)[1], pixels)
+    if not ok:
+        raise ValueError(f"Не удалось закодировать изображение {path}")
+    encoded.tofile(path)
+
+
+def load_pixels(path, grayscale=True):
+    """
+    Декодирует скриншот или архив областей (манифест .roi.json).
+    Архив восстанавливается в изображение исходного размера: области на своих местах, остальное — черное.
+    Возвращает numpy-массив или None.
+    """
+    if not is_roi_manifest(path):
+        return _imread(path, grayscale)
+
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    strip = _imread(os.path.join(os.path.dirname(path), manifest["strip"]), grayscale)
+    if strip is None:
+        return None
+
+    shape = (manifest["height"], manifest["width"]) if grayscale else (manifest["height"], manifest["width"], 3)
+    pixels = np.zeros(shape, dtype=np.uint8)
+    for x, y, w, h, offset in manifest["regions"]:
+        pixels[y:y + h, x:x + w] = strip[offset:offset + h, 0:w]
+    return pixels
+
+
+def open_image(path):
+    """PIL-изображение (RGB) скриншота или архива областей."""
+    if not is_roi_manifest(path):
+        with Image.open(path) as src:
+            return src.convert("RGB")
+    return Image.fromarray(cv2.cvtColor(load_pixels(path, grayscale=False), cv2.COLOR_BGR2RGB))
+
+
+def write_archive(source_path, target_folder, regions):
+    """
+    Сохраняет только области regions [(x, y, w, h)] скриншота: полоса PNG без потерь и манифест.
+    Время изменения архива — как у оригинала (для группировки при повторной обработке).
+    Возвращает путь манифеста.
+    """
+    pixels = load_pixels(source_path, grayscale=False)
+    if pixels is None:
+        raise ValueError(f"Не удалось декодировать изображение {source_path}")
+    height, width = pixels.shape[:2]
+
+    rects = []
+    for x, y, w, h in regions:
+        left, top = max(0, x - ROI_MARGIN), max(0, y - ROI_MARGIN)
+        right, bottom = min(width, x + w + ROI_MARGIN), min(height, y + h + ROI_MARGIN)
+        if right > left and bottom > top:
+            rects.append((left, top, right - left, bottom - top))
+    if not rects:
+        raise ValueError(f"Области не попадают в изображение {source_path}")
+
+    strip = np.zeros((sum(h for _, _, _, h in rects), max(w for _, _, w, _ in rects), 3), dtype=np.uint8)
+    manifest_regions = []
+    offset = 0
+    for x, y, w, h in rects:
+        strip[offset:offset + h, 0:w] = pixels[y:y + h, x:x + w]
+        manifest_regions.append([x, y, w, h, offset])
+        offset += h
+
+    manifest_path = os.path.join(target_folder, screenshot_base_name(source_path) + ROI_MANIFEST_EXT)
+    _imwrite(strip_path(manifest_path), strip)
+    with open(manifest_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "source": os.path.basename(source_path),
+            "width": width,
+            "height": height,
+            "strip": os.path.basename(strip_path(manifest_path)),
+            "regions": manifest_regions
+        }, f, ensure_ascii=False)
+
+    mtime = os.path.getmtime(source_path)
+    for path in (manifest_path, strip_path(manifest_path)):
+        os.utime(path, (mtime, mtime))
+    return manifest_path
+
+
+def restore_path(dest_path):
+    """Путь восстановленного из архива изображения: исходное имя, формат без потерь."""
+    base, ext = os.path.splitext(dest_path)
+    return dest_path if ext.lower() in LOSSLESS_EXTS else base + ".png"
+
+
+def restore_archive(manifest_path, dest_path):
+    """
+    Откат архивирования: восстанавливает изображение исходного размера (вне областей — черное)
+    с исходным временем изменения и удаляет архив. Оригинал при архивировании удален и не восстанавливается;
+    изображение пишется без потерь (PNG вместо JPEG, см. restore_path), чтобы области остались точными.
+
+    Returns:
+        Путь восстановленного изображения.
+    """
+    restored = restore_path(dest_path)
+    mtime = os.path.getmtime(manifest_path)
+    _imwrite(restored, load_pixels(manifest_path, grayscale=False))
+    os.utime(restored, (mtime, mtime))
+    os.remove(strip_path(manifest_path))
+    os.remove(manifest_path)
+    return restored
+
+
+def store_processed(source_path, target_folder, regions=None):
+    """
+    Переносит обработанный скриншот в target_folder.
+    regions — сохранить только эти области (режим roi), иначе файл перемещается целиком.
+    Уже заархивированный скриншот (манифест) перемещается вместе с полосой.
+
+    Returns:
+        (путь результата, [(src, dest, kind)]) — перемещения для истории; kind "roi" — архивирование.
+    """
+    if is_roi_manifest(source_path):
+        moves = []
+        for src in (source_path, strip_path(source_path)):
+            dest = os.path.join(target_folder, os.path.basename(src))
+            _replace(src, dest)
+            moves.append((src, dest, None))
+        return moves[0][1], moves
+
+    if regions:
+        manifest_path = write_archive(source_path, target_folder, regions)
+        os.remove(source_path)
+        return manifest_path, [(source_path, manifest_path, "roi")]
+
+    dest = os.path.join(target_folder, os.path.basename(source_path))
+    _replace(source_path, dest)
+    return dest, [(source_path, dest, None)]
+
+
+def _replace(src, dest):
+    if os.path.exists(dest):
+        os.remove(dest)
+    shutil.move(src, dest)
@@ -0,0 +1,86 @@
+import os
+import hashlib
+import logging
+from collections import namedtuple
+from .roi_archive import is_roi_manifest, is_roi_strip
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+# Неизменяемая запись о файле: один stat на файл при сканировании.
+# depth — глубина вложенности относительно сканируемой папки (0 — сама папка).
+# mtime может быть заменено временем из другого источника (см. timestamps.resolve_timestamps),
+# source — этот источник (None — время изменения файла).
+FileRecord = namedtuple('FileRecord', ['path', 'size', 'mtime', 'depth', 'source'], defaults=(None,))
+
+logger = logging.getLogger(__name__)
+
+
+def scan_directory(folder_path, max_depth=0, skip_dirs=('errors',), stop_event=None, exclude_hashes=None):
+    """
+    Сканирует папку через os.scandir и возвращает список FileRecord для изображений.
+
+    Args:
+        folder_path: Папка для сканирования.
+        max_depth: Максимальная глубина вложенности (0 — только сама папка, None — без ограничений).
+        skip_dirs: Имена подпапок, которые пропускаются на любом уровне.
+        stop_event: Событие остановки; при срабатывании возвращается None.
+        exclude_hashes: Множество хешей содержимого (file_hash) уже обработанных файлов, которые нужно пропустить.
+
+    Returns:
+        Список FileRecord в порядке обхода (папка, затем ее подпапки) или None, если сканирование прервано.
+    """
+    records = []
+    pending = [(folder_path, 0)]
+
+    while pending:
+        current_dir, depth = pending.pop(0)
+        if stop_event and stop_event.is_set():
+            return None
+
+        subdirs = []
+        try:
+            with os.scandir(current_dir) as it:
+                entries = list(it)
+        except OSError as e:
+            logger.warning(f"Не удалось прочитать папку {current_dir}: {e}")
+            continue
+
+        for entry in entries:
+            try:
+                if entry.is_dir():
+                    if entry.name not in skip_dirs and (max_depth is None or depth < max_depth):
+                        subdirs.append((entry.path, depth + 1))
+                    continue
+
+                # Архивы областей (манифесты) обрабатываются как скриншоты, их полосы — нет
+                if is_roi_strip(entry.name):
+                    continue
+                if not (entry.name.lower().endswith(IMAGE_EXTENSIONS) or is_roi_manifest(entry.name)):
+                    continue
+
+                # На Windows результат stat берется из данных scandir без отдельного системного вызова
+                st = entry.stat()
+                records.append(FileRecord(entry.path, st.st_size, st.st_mtime, depth))
+            except OSError as e:
+                logger.warning(f"Не удалось получить сведения о файле {entry.path}: {e}")
+
+        # Подпапки обходим после файлов текущей папки (как os.walk сверху вниз)
+        pending[0:0] = subdirs
+
+    if exclude_hashes:
+        records = [r for r in records if file_hash(r.path) not in exclude_hashes]
+
+    return records
+
+
+def file_hash(path, chunk_size=1024 * 1024):
+    """Хеш содержимого файла (для распознавания уже обработанных скриншотов после копирования/переименования)."""
+    digest = hashlib.sha1()
+    try:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+    except OSError as e:
+        logger.warning(f"Не удалось прочитать файл {path}: {e}")
+        return None
+    return digest.hexdigest()
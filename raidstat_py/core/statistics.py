@@ -1,15 +1,20 @@
 import os
 import logging
 from datetime import datetime
-import numpy as np
-import cv2
-from PIL import Image
 from .ocr import OCRHandler
 from .matcher import Matcher
 from ..utils.config import Config
 import concurrent.futures
 import shutil
 from .history import HistoryManager
+from .journal import RunJournal
+from .scanner import scan_directory, file_hash, FileRecord
+from .timestamps import resolve_timestamps, sort_key, split_groups
+from .frame import Frame
+from .baseline import BaselineStore
+from .plausibility import PlausibilityCheck
+from .debug_sink import DebugSink
+from .roi_archive import store_processed, screenshot_base_name
 
 class StatisticsProcessor:
     def __init__(self, config: Config, ocr: OCRHandler, matcher: Matcher, storage, debug_screens=False):
@@ -23,9 +28,21 @@ class StatisticsProcessor:
         self.scale = self.config.interface_scale
         self.offsets = self._get_offsets(self.scale)
         self.history = HistoryManager("statistics")
+        self.debug_sink = DebugSink(self.history)
+        self.journal = RunJournal("statistics")
+        self.baseline = BaselineStore()
+        self.plausibility = self._make_plausibility()
+        self.session = None
+        self.facts = None
 
     def revert_history(self):
         self.history.revert()
+        # После отката незавершенный запуск продолжать уже нечего
+        self.journal.finish()
+
+    def has_pending_run(self, folder_path):
+        folder = self.journal.pending_folder()
+        return bool(folder) and os.path.abspath(folder) == os.path.abspath(folder_path)
 
     def _get_offsets(self, scale):
         # Перенесено из RaidStat.java
@@ -62,222 +79,387 @@ class StatisticsProcessor:
             
         return offsets
 
-    def process_folder(self, folder_path, recursive=False, stop_event=None):
-        self.history.clear()
-        image_files = []
-        for root, dirs, files in os.walk(folder_path):
-            if stop_event and stop_event.is_set():
-                self.logger.info("Обработка статистики прервана (этап сканирования).")
-                return 0
+    def _make_plausibility(self):
+        return PlausibilityCheck(
+            {field: self.offsets[field][2] for field in ['kills', 'honor', 'gear']},
+            self.config.interface_scale,
+            {'kills': self.config.max_kills_delta, 'honor': self.config.max_honor_delta, 'gear': self.config.max_gear_delta}
+        )
 
-            # Пропускаем папку errors
-            if 'errors' in dirs:
-                dirs.remove('errors')
+    def process_folder(self, folder_path, recursive=False, stop_event=None, resume=False):
+        state = self.journal.load() if resume else None
+        if state and os.path.abspath(state.get("folder") or "") != os.path.abspath(folder_path):
+            state = None
 
-            for file in files:
-                if file.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp')):
-                    image_files.append(os.path.join(root, file))
-            if not recursive:
-                break
-        
-        if not image_files:
-            return 0
-            
-        # Сортировка по времени модификации
-        image_files.sort(key=os.path.getmtime)
-        
-        # Группировка по времени
-        groups = []
-        if not image_files:
-            return 0
-            
-        current_group = [image_files[0]]
-        group_start_time = os.path.getmtime(image_files[0])
-        max_diff = self.config.max_diff_time * 60 # секунды
-        
-        for img_path in image_files[1:]:
-            curr_time = os.path.getmtime(img_path)
-            if curr_time - group_start_time > max_diff:
-                # Сохраняем текущую группу и начинаем новую
-                groups.append(current_group)
-                current_group = [img_path]
-                group_start_time = curr_time
-            else:
-                current_group.append(img_path)
-        if current_group:
-            groups.append(current_group)
+        if state:
+            # Возобновление: план групп берем из журнала, историю дополняем
+            self.history.load()
+            self.journal.resume()
+            group_keys = [group["key"] for group in state["groups"]]
+            groups = [
+                [FileRecord(path, None, mtime, 0) for path, mtime in zip(group["paths"], group["mtimes"])]
+                for group in state["groups"]
+            ]
+            self.logger.info(f"Возобновление сбора статистики: распознано ранее {len(state['images'])} изображений")
+        else:
+            self.history.clear()
+            groups = self._collect_groups(folder_path, recursive, stop_event)
+            if not groups:
+                return 0
+            group_keys = [f"g{i}" for i in range(len(groups))]
+            self.journal.start(folder_path, [
+                {"key": key, "paths": [r.path for r in group], "mtimes": [r.mtime for r in group]}
+                for key, group in zip(group_keys, groups)
+            ])
             
+        # Известные значения игроков для проверки правдоподобия: сохраненная статистика до начала запуска,
+        # затем результаты каждой обработанной группы
+        self.plausibility = self._make_plausibility()
+        known = {}
+        self._remember_values(known, {
+            name: data for name, data in self.baseline.load().items()
+            if data.get('timestamp', 0) < groups[0][0].mtime
+        })
+
         # Обработка каждой группы
-        total_processed = 0
-        first_group = True
-        prev_group_stats = None
+        # Распознавание следующей группы идет в этом потоке, пока сохранение и перемещение файлов
+        # предыдущей выполняются в отдельном потоке записи (строго по порядку групп).
+        # События всех групп пишутся в книгу одним сохранением в конце запуска
+        self.session = self.storage.open_session("statistics")
+        if self.facts:
+            self.session = self.facts.wrap(self.session, "statistics")
+        chain = {"prev_group_stats": None, "first_group": True, "processed": 0}
+        persist_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        pending = None
+
+        def submit_persist(*args):
+            nonlocal pending
+            # Ждем запись предыдущей группы (и пробрасываем ее ошибку)
+            if pending:
+                pending.result()
+            pending = persist_executor.submit(self._persist_group, *args)
         
         try:
-            for group in groups:
+            for group_key, group_records in zip(group_keys, groups):
+                group = [r.path for r in group_records]
                 if stop_event and stop_event.is_set():
                     self.logger.info("Обработка статистики прервана.")
-                    return total_processed
+                    break
+
+                group_state = state["group_states"].get(group_key) if state else None
+                if group_state and group_state["state"] == "done":
+                    # Группа полностью завершена в прерванном запуске
+                    self._remember_values(known, (group_state.get("data") or {}).get("stats") or {})
+                    submit_persist(folder_path, group_key, group_records, None, None, group_state, chain, stop_event)
+                    continue
 
                 self.logger.info(f"Обработка группы с {len(group)} изображениями")
-                
-                # Получаем дату/время первого файла в группе для создания подпапки
-                first_file_time = os.path.getmtime(group[0])
-                date_str = datetime.fromtimestamp(first_file_time).strftime("%Y-%m-%d")
-                time_str = datetime.fromtimestamp(first_file_time).strftime("%H-%M")
-                
-                # Создаем подпапку для группы
-                group_folder = os.path.join(folder_path, date_str, time_str)
-                if not os.path.exists(group_folder):
-                    os.makedirs(group_folder)
-                    self.history.add_created(group_folder)
+
+                if group_state and group_state["state"] == "saved":
+                    # Статистика уже записана — осталось доделать перемещение файлов
+                    data = group_state.get("data") or {}
+                    group_stats = data.get("stats") or {}
+                    failed_paths = data.get("failed") or []
                 else:
-                    os.makedirs(group_folder, exist_ok=True)
-                
-                group_stats, failed_paths = self.process_group(group, stop_event=stop_event)
+                    cached_results = None
+                    if state:
+                        cached_results = {path: state["images"][path] for path in group if path in state["images"]}
+                    group_stats, failed_paths = self.process_group(group, stop_event=stop_event, group_key=group_key, cached_results=cached_results, known=known)
 
-                # Если отменили внутри групповой обработки
-                if stop_event and stop_event.is_set():
-                    self.logger.info("Обработка статистики прервана во время обработки группы.")
-                    return total_processed
-                
-                # Логика как в Java: пропускаем сохранение первой группы
-                # ВАЖНО: сохраняем статистику ДО перемещения файлов, пока debug_images доступны
-                if not first_group and prev_group_stats:
-                    # Обновляем текущую статистику на основе предыдущей группы
-                    self.update_stats_between_groups(group_stats, prev_group_stats)
-                    
-                    # Сохраняем статистику (добавляем новое событие)
-                    self.storage.save_statistics(group_stats, f"{date_str} {time_str.replace('-', ':')}", debug_screens=self.debug_screens)
-                    total_processed += len(group) - len(failed_paths)
+                    # Если отменили внутри групповой обработки
+                    if stop_event and stop_event.is_set():
+                        self.logger.info("Обработка статистики прервана во время обработки группы.")
+                        break
+
+                self._remember_values(known, group_stats)
+                submit_persist(folder_path, group_key, group_records, group_stats, failed_paths, group_state, chain, stop_event)
+
+            if pending:
+                pending.result()
+
+            if not (stop_event and stop_event.is_set()):
+                self.journal.finish()
+        finally:
+            # Текущую запись в Excel не прерываем, еще не начатые — отменяем
+            persist_executor.shutdown(wait=True, cancel_futures=True)
+            self.debug_sink.drain()
+            self.session.commit()
+            self.journal.close()
+            self.history.save()
+            
+        return chain["processed"]
+
+    @staticmethod
+    def _remember_values(known, group_stats):
+        """Запоминает последние распознанные хонор, фраги и ГС игроков (пропуская неизвестные)."""
+        for name, data in group_stats.items():
+            values = known.setdefault(name, {})
+            for field, key in [('honor', 'honor_end'), ('kills', 'kills_end'), ('gear', 'gear')]:
+                if data.get(key) is not None:
+                    values[field] = data[key]
+
+    def _persist_group(self, folder_path, group_key, group_records, group_stats, failed_paths, group_state, chain, stop_event=None):
+        """
+        Запись группы: пересчет относительно предыдущей группы, сохранение в хранилище и перемещение файлов.
+        Выполняется в потоке записи строго по порядку групп; chain — состояние между группами
+        (prev_group_stats, first_group, processed).
+        """
+        group = [r.path for r in group_records]
+
+        if group_state and group_state["state"] == "done":
+            data = group_state.get("data") or {}
+            chain["processed"] += data.get("processed", 0)
+            chain["prev_group_stats"] = data.get("stats")
+            chain["first_group"] = False
+            return
+
+        # Получаем дату/время первого файла в группе для создания подпапки
+        first_file_time = group_records[0].mtime
+        date_str = datetime.fromtimestamp(first_file_time).strftime("%Y-%m-%d")
+        time_str = datetime.fromtimestamp(first_file_time).strftime("%H-%M")
+        
+        # Создаем подпапку для группы
+        group_folder = os.path.join(folder_path, date_str, time_str)
+        if not os.path.exists(group_folder):
+            os.makedirs(group_folder)
+            self.history.add_created(group_folder)
+        else:
+            os.makedirs(group_folder, exist_ok=True)
+
+        errors_folder = os.path.join(folder_path, "errors")
+        failed_set = set(failed_paths)
+        # {старая папка отладки: новая}: пути debug_images заменяются до записи статистики,
+        # чтобы журнал и сессия записи сразу получили пути после перемещения
+        relocated = {}
+        if self.debug_screens:
+            for img_path in group:
+                debug_dir_name = screenshot_base_name(os.path.basename(img_path))
+                target_folder = errors_folder if img_path in failed_set else group_folder
+                relocated[os.path.join(os.path.dirname(img_path), debug_dir_name)] = os.path.join(target_folder, debug_dir_name)
+            self._relocate_debug_paths(group_stats, relocated)
+
+        processed = 0
+        if group_state and group_state["state"] == "saved":
+            processed = (group_state.get("data") or {}).get("processed", 0)
+        else:
+            # Логика как в Java: пропускаем сохранение первой группы,
+            # если для ее игроков нет свежего сохраненного состояния с прошлых запусков
+            # ВАЖНО: сохраняем статистику ДО перемещения файлов, пока debug_images доступны
+            prev_group_stats = chain["prev_group_stats"]
+            if chain["first_group"]:
+                prev_group_stats = self.baseline.get_prev_stats(set(group_stats), first_file_time, self.config.baseline_max_age)
+                if prev_group_stats:
+                    self.logger.info(f"Первая группа: используется сохраненная статистика {len(prev_group_stats)} игроков")
+            if prev_group_stats:
+                # Обновляем текущую статистику на основе предыдущей группы
+                self.update_stats_between_groups(group_stats, prev_group_stats)
                 
-                # Создаем папку для ошибок если есть неудачные файлы
-                errors_folder = os.path.join(folder_path, "errors")
-                if failed_paths:
-                    if not os.path.exists(errors_folder):
-                        os.makedirs(errors_folder)
-                        self.history.add_created(errors_folder)
-                    else:
-                        os.makedirs(errors_folder, exist_ok=True)
+                # Сохраняем статистику (добавляем новое событие)
+                self.session.save_statistics(group_stats, f"{date_str} {time_str.replace('-', ':')}", debug_screens=self.debug_screens)
+                processed = len(group) - len(failed_paths)
+                self.journal.record_group(group_key, "saved", {"stats": group_stats, "failed": failed_paths, "processed": processed})
+        chain["processed"] += processed
+        
+        # Создаем папку для ошибок если есть неудачные файлы
+        if failed_paths:
+            if not os.path.exists(errors_folder):
+                os.makedirs(errors_folder)
+                self.history.add_created(errors_folder)
+            else:
+                os.makedirs(errors_folder, exist_ok=True)
 
-                # Перемещаем обработанные файлы
-                for img_path in group:
-                    if stop_event and stop_event.is_set():
-                        break # Не перемещаем, если прервано прямо здесь
-                    try:
-                        filename = os.path.basename(img_path)
-                        
-                        if img_path in failed_paths:
-                            dest_path = os.path.join(errors_folder, filename)
-                            self.logger.warning(f"Moving failed file {filename} to errors folder")
-                        else:
-                            dest_path = os.path.join(group_folder, filename)
-                        
-                        if os.path.exists(dest_path):
-                            os.remove(dest_path)
-                        shutil.move(img_path, dest_path)
-                        self.history.add_move(img_path, dest_path)
-                        
-                        # Перемещаем папку отладки, если она существует
-                        if self.debug_screens:
-                            debug_dir_name = os.path.splitext(filename)[0]
-                            src_debug_dir = os.path.join(folder_path, debug_dir_name)
-                            if os.path.exists(src_debug_dir):
-                                # Если неудача, возможно, тоже стоит оставить в ошибках?
-                                if img_path in failed_paths:
-                                    dest_debug_dir = os.path.join(errors_folder, debug_dir_name)
-                                else:
-                                    dest_debug_dir = os.path.join(group_folder, debug_dir_name)
-                                    
-                                if os.path.exists(dest_debug_dir):
-                                    shutil.rmtree(dest_debug_dir)
-                                shutil.move(src_debug_dir, dest_debug_dir)
-                                self.history.add_created(dest_debug_dir) # Отслеживаем как созданное/перемещенное, чтобы можно было откатить
-                                self.history.add_move(src_debug_dir, dest_debug_dir)
- 
-                    except Exception as e:
-                        self.logger.error(f"Ошибка при перемещении файла {img_path}: {e}")
+        # Перемещаем обработанные файлы (спрайты отладки должны быть дописаны до перемещения папок)
+        if self.debug_screens:
+            self.debug_sink.drain()
+        # В режиме roi от обработанных скриншотов остаются только поля окна статистики (ошибочные — целиком)
+        archive_regions = self._archive_regions() if self.config.archive_mode == "roi" else None
+        for img_path in group:
+            if stop_event and stop_event.is_set():
+                break # Не перемещаем, если прервано прямо здесь
+            filename = os.path.basename(img_path)
+            is_failed = img_path in failed_set
+            target_folder = errors_folder if is_failed else group_folder
+
+            if self.debug_screens:
+                # Папка отладки создается рядом со скриншотом и переезжает вместе с ним
+                src_debug_dir = os.path.join(os.path.dirname(img_path), screenshot_base_name(filename))
+                dest_debug_dir = relocated[src_debug_dir]
+
+            if not os.path.exists(img_path):
+                continue # Уже перемещен в прерванном запуске
+            try:
+                if is_failed:
+                    self.logger.warning(f"Moving failed file {filename} to errors folder")
                 
-                # Обновляем пути к debug_images после перемещения файлов
-                # Это важно для того, чтобы скриншоты "до" были доступны при обработке следующей группы
-                if self.debug_screens:
-                    self._update_debug_paths_after_move(group_stats, folder_path, group_folder, errors_folder, failed_paths)
+                # Хеш оригинала — до перемещения; скриншоты с ошибками обработанными не считаются
+                content_hash = file_hash(img_path) if self.config.skip_processed and not is_failed else None
+                dest_path, moves = store_processed(img_path, target_folder, None if is_failed else archive_regions)
+                for src, dest, kind in moves:
+                    self.history.add_move(src, dest, kind, content_hash if src == img_path else None)
+                self.journal.record_move(img_path, dest_path)
                 
-                # Сохраняем текущую группу для следующей итерации
-                prev_group_stats = group_stats
-                first_group = False
-        finally:
-            self.history.save()
+                # Перемещаем папку отладки, если она существует
+                if self.debug_screens and os.path.exists(src_debug_dir):
+                    if os.path.exists(dest_debug_dir):
+                        shutil.rmtree(dest_debug_dir)
+                    shutil.move(src_debug_dir, dest_debug_dir)
+                    self.history.add_created(dest_debug_dir) # Отслеживаем как созданное/перемещенное, чтобы можно было откатить
+                    self.history.add_move(src_debug_dir, dest_debug_dir)
+
+            except Exception as e:
+                self.logger.error(f"Ошибка при перемещении файла {img_path}: {e}")
+
+        if stop_event and stop_event.is_set():
+            self.logger.info("Обработка статистики прервана во время перемещения файлов.")
+            return
+        
+        self.journal.record_group(group_key, "done", {"stats": group_stats, "processed": processed})
+        self.history.save()
+        self.baseline.update(group_stats, group_records[-1].mtime)
+        
+        # Сохраняем текущую группу для следующей итерации
+        chain["prev_group_stats"] = group_stats
+        chain["first_group"] = False
+
+    def _archive_regions(self):
+        """Области, которые читает распознавание: имя, класс, хонор, фраги, ГС (x, y, w, h)."""
+        start_x = self.config.personal_frame_coords['x']
+        start_y = self.config.personal_frame_coords['y']
+        return [(start_x + ox, start_y + oy, w, h) for ox, oy, w, h in self.offsets.values()]
+
+    def _collect_groups(self, folder_path, recursive, stop_event):
+        """Сканирует папку и группирует скриншоты (FileRecord) по времени (max_diff_time)."""
+        exclude_hashes = self.history.processed_hashes() if self.config.skip_processed else None
+        records = scan_directory(folder_path, max_depth=None if recursive else 0, stop_event=stop_event, exclude_hashes=exclude_hashes)
+        if records is None:
+            self.logger.info("Обработка статистики прервана (этап сканирования).")
+            return []
+        if not records:
+            return []
             
-        return total_processed
+        # Время скриншотов (mtime, манифест, EXIF или имя файла) и сортировка; при равном времени — по номеру
+        records = resolve_timestamps(records, self.config.timestamp_source)
+        records.sort(key=sort_key)
+        
+        # Группировка по времени (max_diff_time — минуты), для времени по номерам — и по пропускам в номерах
+        return split_groups(records, self.config.max_diff_time * 60, self.config.sequence_gap)
 
-    def process_group(self, image_paths, stop_event=None):
+    def process_group(self, image_paths, stop_event=None, group_key=None, cached_results=None, known=None):
         """
         Обработка группы изображений, представляющих одно событие.
         Логика:
-        - Идентификация уникальных лиц.
-        - Для каждого лица поиск начальных характеристик (первое появление) и конечных характеристик (последнее появление).
+        - Этап 1: распознавание только имен на всех скриншотах (идентификация уникальных лиц):
+          пакетно, полосами кропов, и с повторами — только для нераспознанных.
+        - Этап 2: класс и числа — только для одного скриншота на игрока (самого позднего);
+          если фраги/хонор не распознаны или неправдоподобны, пробуется следующий по времени скриншот, остальные — дубли.
         - Вычисление Дельты = Конец - Начало.
+
+        cached_results: {путь: результат} из журнала прерванного запуска — эти файлы повторно не распознаются.
+        known: {имя: {'kills', 'honor', 'gear'}} — предыдущие значения игроков для проверки правдоподобия.
         """
         person_data = {} # {name: {start: {}, end: {}}}
         
         num_threads = 8
         
         self.logger.debug(f"Обработка группы в {num_threads} потоков")
-        
-        # Потокобезопасный set для отслеживания дубликатов (как namesPerDate в Java)
-        import threading
-        names_lock = threading.Lock()
-        names_per_group = {}
-        
-        def safe_process_image(path):
+        cached_results = cached_results or {}
+        known = known or {}
+
+        # Этап 1: только имена (для файлов, которых нет в журнале)
+        pending_paths = [path for path in image_paths if path not in cached_results]
+
+        def safe_load(path):
             if stop_event and stop_event.is_set():
                 return None
             try:
-                return self.process_image(path, names_per_group, names_lock, stop_event=stop_event)
+                return self.load_crops(path, stop_event=stop_event)
             except Exception as e:
                 self.logger.error(f"Не удалось обработать {path}: {e}")
                 return None
 
-        results = []
-        if num_threads > 1:
-            with concurrent.futures.ThreadPoolExecutor(max_workers=num_threads) as executor:
-                futures = [executor.submit(safe_process_image, path) for path in image_paths]
-                # Важно: итерируемся по futures в исходном порядке, а не через as_completed,
-                # чтобы результаты соответствовали порядку файлов в image_paths.
-                for future in futures:
-                    if stop_event and stop_event.is_set():
-                         # cancel rest
-                         for f in futures:
-                             f.cancel()
-                         self.logger.info("Обработка группы статистики прервана.")
-                         break
-                    results.append(future.result())
-        else:
-            for path in image_paths:
+        loaded = dict(zip(pending_paths, self._map_parallel(safe_load, pending_paths, num_threads, stop_event)))
+        try:
+            name_infos = self.recognize_names(loaded, num_threads, stop_event=stop_event)
+        except Exception as e:
+            self.logger.error(f"Не удалось распознать имена группы: {e}")
+            name_infos = {}
+        if stop_event and stop_event.is_set():
+            self.logger.info("Обработка группы статистики прервана.")
+            return {}, []
+        for path in pending_paths:
+            if not name_infos.get(path):
+                self.journal.record_image(group_key, path, None)
+
+        # Кандидаты на каждого игрока: сначала самый поздний скриншот (важен для значений "конец")
+        results = {} # {путь: результат} — как раньше возвращал process_image
+        candidates = {} # {имя: [пути, от поздних к ранним]}
+        attempted = {} # {имя: [(путь, результат)]} — уже распознанные в прерванном запуске
+        for path in reversed(image_paths):
+            if path in cached_results:
+                stats = cached_results[path]
+                results[path] = stats
+                if stats and stats.get('name') and not stats.get('duplicate'):
+                    attempted.setdefault(stats['name'], []).append((path, stats))
+            elif name_infos.get(path):
+                candidates.setdefault(name_infos[path]['name'], []).append(path)
+            else:
+                results[path] = None
+        for name in attempted:
+            candidates.setdefault(name, [])
+
+        # Этап 2: класс и числа — по одному скриншоту на игрока, следующий кандидат только при неполных данных
+        def resolve_player(name):
+            tried = list(attempted.get(name, []))
+            chosen = next((stats for _, stats in tried if self._has_valid_stats(stats)), None)
+            remaining = list(candidates[name])
+
+            while remaining and chosen is None:
                 if stop_event and stop_event.is_set():
-                    break
-                results.append(safe_process_image(path))
+                    return None
+                path = remaining.pop(0)
+                if tried:
+                    # Предыдущий скриншот дал неполные данные — пробуем следующий
+                    self.logger.info(f"{os.path.basename(path)} {name} (повтор для уточнения данных)")
+                try:
+                    stats = self.recognize_fields(path, name_infos[path], stop_event=stop_event, prior=known.get(name))
+                except Exception as e:
+                    self.logger.error(f"Не удалось обработать {path}: {e}")
+                    stats = None
+                if stop_event and stop_event.is_set():
+                    return None
+                self.journal.record_image(group_key, path, stats)
+                results[path] = stats
+                if stats is None:
+                    continue
+                tried.append((path, stats))
+                if self._has_valid_stats(stats):
+                    chosen = stats
+
+            # Остальные скриншоты игрока — дубли
+            for path in remaining:
+                self.logger.info(f"{os.path.basename(path)} {name} (дубль)")
+                duplicate = {'duplicate': True, 'name': name}
+                self.journal.record_image(group_key, path, duplicate)
+                results[path] = duplicate
+
+            # Валидных данных нет — берем самый поздний из распознанных
+            if chosen is None and tried:
+                chosen = tried[0][1]
+            return chosen
+
+        names = list(candidates)
+        chosen_stats = dict(zip(names, self._map_parallel(resolve_player, names, num_threads, stop_event)))
         
         if stop_event and stop_event.is_set():
+            self.logger.info("Обработка группы статистики прервана.")
             return {}, []
         
-        failed_paths = []
-        
-        for path, stats in zip(image_paths, results):
-            # Дубликат — пропускаем (но не добавляем в failed_paths!)
-            if stats and stats.get('duplicate'):
-                continue
-            # None или нет имени — это ошибка
-            if not stats or not stats.get('name'):
-                failed_paths.append(path)
-                continue
-                
-            name = stats['name']
-            
-            # При новой логике повторов (для исправления плохих данных), мы должны перезаписывать и 'start',
-            # так как предыдущий 'start' был "плохим".
-            # Если дубликаты отключены или это "исправляющий" дубликат, мы обновляем запись целиком.
-            person_data[name] = {'start': stats, 'end': stats}
+        # None или нет имени — это ошибка (дубликаты в failed_paths не попадают)
+        failed_paths = [path for path in image_paths if not results.get(path)]
+
+        for name, stats in chosen_stats.items():
+            if stats:
+                person_data[name] = {'start': stats, 'end': stats}
                 
         # Подготовка финальных данных
         final_stats = {}
@@ -317,6 +499,37 @@ class StatisticsProcessor:
             
         return final_stats, failed_paths
     
+    @staticmethod
+    def _has_valid_stats(stats):
+        """Статы валидны только если распознаны и фраги, и хонор, и все числа правдоподобны."""
+        return (bool(stats) and stats.get('kills') is not None and stats.get('honor') is not None
+                and not stats.get('implausible'))
+
+    def _map_parallel(self, func, items, num_threads, stop_event=None):
+        """
+        Выполняет func для каждого элемента в пуле потоков; результаты — в порядке items.
+        При остановке не ждет выполняющиеся задачи: их процессы Tesseract уже прерваны токеном.
+        """
+        if num_threads <= 1:
+            results = []
+            for item in items:
+                if stop_event and stop_event.is_set():
+                    break
+                results.append(func(item))
+            return results
+
+        results = []
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=num_threads)
+        try:
+            futures = [executor.submit(func, item) for item in items]
+            for future in futures:
+                if stop_event and stop_event.is_set():
+                    break
+                results.append(future.result())
+        finally:
+            executor.shutdown(wait=not (stop_event and stop_event.is_set()), cancel_futures=True)
+        return results
+
     def update_stats_between_groups(self, current_stats, prev_stats):
         """
         Обновляет статистику текущей группы на основе предыдущей.
@@ -378,10 +591,11 @@ class StatisticsProcessor:
                     'debug_images_end': None # Скриншота "после" нет
                 }
     
-    def _update_debug_paths_after_move(self, group_stats, folder_path, group_folder, errors_folder, failed_paths):
+    def _relocate_debug_paths(self, group_stats, relocated):
         """
-        Обновляет пути к debug_images после перемещения файлов.
-        Это необходимо для того, чтобы скриншоты "до" были доступны при обработке следующей группы.
+        Заменяет пути к debug_images путями после перемещения файлов группы.
+        Нужно и для комментариев в книге, и для того, чтобы скриншоты "до" были доступны при обработке следующей группы.
+        relocated: {старая папка отладки: новая}, составленный по целевым папкам (без обращений к диску).
         """
         for name, data in group_stats.items():
             for images_key in ['debug_images_start', 'debug_images_end']:
@@ -395,163 +609,193 @@ class StatisticsProcessor:
                         updated_images[field] = None
                         continue
                     
-                    # Определяем новый путь на основе того, куда был перемещён скриншот
-                    filename = os.path.basename(old_path)
-                    # Путь к изображению обычно: folder_path/ScreenShotXXXX/field.jpg
-                    # После перемещения: group_folder/ScreenShotXXXX/field.jpg
-                    parent_dir = os.path.basename(os.path.dirname(old_path))  # ScreenShotXXXX
-                    
-                    # Проверяем, был ли файл в failed_paths (определяем по имени папки debug)
-                    # Имя папки debug = имя скриншота без расширения
-                    screenshot_name = parent_dir  # например "ScreenShot0001"
-                    
-                    # Ищем соответствующий путь скриншота в failed_paths
-                    is_failed = any(screenshot_name in fp for fp in failed_paths)
-                    
-                    if is_failed:
-                        new_path = os.path.join(errors_folder, parent_dir, filename)
+                    # Путь к изображению: <папка скриншота>/ScreenShotXXXX/field.jpg
+                    # После перемещения: <папка группы или errors>/ScreenShotXXXX/field.jpg
+                    new_dir = relocated.get(os.path.dirname(old_path))
+                    if new_dir:
+                        updated_images[field] = os.path.join(new_dir, os.path.basename(old_path))
                     else:
-                        new_path = os.path.join(group_folder, parent_dir, filename)
-                    
-                    if os.path.exists(new_path):
-                        updated_images[field] = new_path
-                    else:
-                        # Если новый путь не существует, оставляем старый (может ещё не перемещён)
-                        updated_images[field] = old_path if os.path.exists(old_path) else None
+                        # Скриншоты "до" из предыдущей группы уже на своем месте
+                        updated_images[field] = old_path
                 data[images_key] = updated_images
 
-    def process_image(self, image_path, names_per_group=None, names_lock=None, stop_event=None):
-        if stop_event and stop_event.is_set():
+    # Альтернативная предобработка чисел для повторного распознавания (по порядку)
+    NUMERIC_RETRY_PREPROCESS = [
+        {"scale_factor": 3, "padding": 5, "use_otsu": True, "invert": True},
+        {"scale_factor": 2, "padding": 8, "use_otsu": True, "invert": True, "otsu_offset": -20},
+    ]
+
+    def _recognize_number(self, crop, stop_event=None):
+        """Распознает число в подготовленной области; None — если цифр нет."""
+        # Используем белый список цифр
+        text, conf = self.ocr.recognize_single_line(crop, lang='eng', config='-c tessedit_char_whitelist=0123456789', cancel_token=stop_event)
+        digits = "".join(filter(str.isdigit, text or ""))
+        return int(digits) if digits else None  # Нет цифр — None вместо 0
+
+    def process_image(self, image_path, stop_event=None):
+        """Полная обработка одного скриншота (имя, затем класс и числовые поля)."""
+        name_info = self.recognize_name(image_path, stop_event=stop_event)
+        if name_info is None:
             return None
+        return self.recognize_fields(image_path, name_info, stop_event=stop_event)
 
-        filename = os.path.basename(image_path)
+    # Специфические параметры предобработки имени для статистики
+    # (инверсия обрабатывается process_name_recognition)
+    NAME_PREPROCESS = {
+        "use_otsu": True,
+        "padding": 3,
+    }
+
+    # Сколько кропов имен распознается одним вызовом Tesseract (полосы обрабатываются параллельно)
+    NAME_BATCH_SIZE = 20
+
+    def recognize_name(self, image_path, stop_event=None):
+        """
+        Первый этап: распознает только имя игрока.
+        Возвращает {'name', 'name_crop', 'crops'} или None, если имя не распознано.
+        """
+        loaded = self.load_crops(image_path, stop_event=stop_event)
+        if loaded is None:
+            return None
+        return self._recognize_name_ladder(image_path, loaded, stop_event)
+
+    def load_crops(self, image_path, stop_event=None):
+        """
+        Декодирует скриншот и копирует области имени и остальных полей (они маленькие),
+        а кадр сразу освобождается, чтобы второй этап не декодировал файл повторно.
+        Область имени берется с запасом в 1 пиксель сверху и снизу — для повторов со сдвигом.
+        Возвращает {'name_img', 'name_rect', 'crops'} или None.
+        """
+        if stop_event and stop_event.is_set():
+            return None
 
-        img = Image.open(image_path)
-        img_np = np.array(img)
-        # Convert to BGR for consistent OCR/OpenCV handling
-        img_bgr = cv2.cvtColor(img_np, cv2.COLOR_RGB2BGR)
+        # Одно декодирование сразу в оттенки серого; области — представления без копирования
+        frame = Frame.load(image_path)
+        if frame is None:
+            return None
         
         start_x = self.config.personal_frame_coords['x']
         start_y = self.config.personal_frame_coords['y']
-        
-        results = {}
-        
-        # Помощник для обрезки
-        def get_crop(field_name):
-            ox, oy, w, h = self.offsets[field_name]
+
+        with frame:
+            ox, oy, w, h = self.offsets['name']
             x = start_x + ox
             y = start_y + oy
-            
-            h_img, w_img = img_bgr.shape[:2]
-            x = max(0, min(x, w_img))
-            y = max(0, min(y, h_img))
-            w = max(1, min(w, w_img - x))
-            h = max(1, min(h, h_img - y))
-            
-            return img_bgr[y:y+h, x:x+w]
+            name_img, name_rect = None, None
+            if 0 <= x and x + w <= frame.width and 0 <= y and y + h <= frame.height:
+                top = max(0, y - 1)
+                bottom = min(frame.height, y + h + 1)
+                name_img = frame.pixels[top:bottom, x:x + w].copy()
+                name_rect = (0, y - top, w, h)
 
-        # 1. Обработка имени
-        ox, oy, w, h = self.offsets['name']
-        x = start_x + ox
-        y = start_y + oy
-        rect = (x, y, w, h)
-        
-        # Специфические параметры предобработки для статистики
-        stats_preprocess = {
-            "use_otsu": True,
-            "padding": 3,
-            # Инверсия обрабатывается process_name_recognition, но мы можем передать её, если захотим кастомную
-        }
+            crops = {}
+            for field in ['class', 'kills', 'honor', 'gear']:
+                ox, oy, w, h = self.offsets[field]
+                crops[field] = frame.region(start_x + ox, start_y + oy, w, h).copy()
+
+        return {'name_img': name_img, 'name_rect': name_rect, 'crops': crops}
 
+    def recognize_names(self, loaded, num_threads, stop_event=None):
+        """
+        Имена для нескольких скриншотов: сначала пакетно (кропы складываются в полосы по NAME_BATCH_SIZE,
+        одна полоса — один вызов Tesseract), затем полная лестница повторов — только для кропов,
+        имя в которых пакетно не распозналось.
+        loaded: {путь: результат load_crops}. Возвращает {путь: результат recognize_name}.
+        """
+        paths = [path for path, info in loaded.items() if info and info['name_img'] is not None]
+        if len(paths) < 2:
+            batched = [None] * len(paths)
+        else:
+            def run_batch(chunk):
+                crops = []
+                for path in chunk:
+                    x, y, w, h = loaded[path]['name_rect']
+                    crops.append(loaded[path]['name_img'][y:y + h, x:x + w])
+                return self.ocr.process_name_batch(
+                    crops, self.matcher, preprocess_params=self.NAME_PREPROCESS,
+                    item_ids=[os.path.basename(path) for path in chunk], cancel_token=stop_event
+                )
+
+            chunks = [paths[i:i + self.NAME_BATCH_SIZE] for i in range(0, len(paths), self.NAME_BATCH_SIZE)]
+            batched = [result for chunk_results in self._map_parallel(run_batch, chunks, num_threads, stop_event)
+                       for result in chunk_results]
+        if stop_event and stop_event.is_set():
+            return {}
+
+        name_infos = {}
+        ladder_paths = [path for path in loaded if path not in paths]
+        for path, result in zip(paths, batched):
+            if result is None:
+                ladder_paths.append(path)
+            else:
+                name_val, score, type_code, name_crop = result
+                name_infos[path] = self._name_result(path, name_val, type_code, name_crop, loaded[path]['crops'])
+
+        def ladder(path):
+            if not loaded[path]:
+                return None
+            try:
+                return self._recognize_name_ladder(path, loaded[path], stop_event)
+            except Exception as e:
+                self.logger.error(f"Не удалось обработать {path}: {e}")
+                return None
+
+        name_infos.update(zip(ladder_paths, self._map_parallel(ladder, ladder_paths, num_threads, stop_event)))
+        return name_infos
+
+    def _recognize_name_ladder(self, image_path, loaded, stop_event=None):
+        """Имя по одному кропу с полной лестницей повторов process_name_recognition."""
         if stop_event and stop_event.is_set():
             return None
 
-        name_val, score, type_code, name_crop = self.ocr.process_name_recognition(
-            img_bgr,
-            rect,
-            self.matcher,
-            ocr_mode=getattr(self.config, 'ocr_mode', 'offline'),
-            preprocess_params=stats_preprocess,
-            online_crop_no_otsu=False,
-            retry_with_shifts=True,
-            item_id=filename
-        )
+        name_val, type_code, name_crop = None, 3, None
+        if loaded['name_img'] is not None:
+            name_val, score, type_code, name_crop = self.ocr.process_name_recognition(
+                loaded['name_img'],
+                loaded['name_rect'],
+                self.matcher,
+                ocr_mode=getattr(self.config, 'ocr_mode', 'offline'),
+                preprocess_params=self.NAME_PREPROCESS,
+                online_crop_no_otsu=False,
+                retry_with_shifts=True,
+                item_id=os.path.basename(image_path),
+                cancel_token=stop_event
+            )
 
+        if stop_event and stop_event.is_set():
+            return None
+        return self._name_result(image_path, name_val, type_code, name_crop, loaded['crops'])
+
+    def _name_result(self, image_path, name_val, type_code, name_crop, crops):
         if not name_val or type_code == 3:
              if self.debug_screens:
-                 text_debug = "Failed" # Упрощенная отладочная информация
+                 filename = os.path.basename(image_path)
                  self.logger.info(f"Пропуск {filename} - имя не совпало")
                  # Сохраняем отладочное изображение для несовпавшего имени
-                 debug_dir = os.path.join(os.path.dirname(image_path), os.path.splitext(filename)[0])
-                 if not os.path.exists(debug_dir):
-                     os.makedirs(debug_dir)
-                     self.history.add_created(debug_dir)
-                 else:
-                    os.makedirs(debug_dir, exist_ok=True)
-                 if name_crop is not None:
-                    Image.fromarray(name_crop).save(os.path.join(debug_dir, "name_failed.jpg"))
+                 debug_dir = os.path.join(os.path.dirname(image_path), screenshot_base_name(filename))
+                 self.debug_sink.write(debug_dir, {'name_failed': name_crop})
              return None
-        
-        # Проверка на дубликат с учетом качества распознавания
-        # Если имя уже есть, но предыдущий скан был без фрагов/хонора, пробуем перезаписать
-        should_skip = False
-        if names_per_group is not None and names_lock is not None:
-            import time as time_module
-            
-            # Ждём, пока другой поток закончит обработку этого имени (если он её начал)
-            max_wait_time = 5.0  # Максимальное время ожидания в секундах
-            wait_interval = 0.05  # Интервал проверки
-            waited_time = 0
-            
-            while True:
-                if stop_event and stop_event.is_set():
-                    return None
-                
-                with names_lock:
-                    if name_val not in names_per_group:
-                        # Первое появление имени — регистрируем и продолжаем
-                        names_per_group[name_val] = {'valid': False, 'processing': True}
-                        break
-                    
-                    prev_info = names_per_group[name_val]
-                    
-                    # Если ранее уже успешно считали (valid=True), то это дубль
-                    if prev_info.get('valid', False):
-                        should_skip = True
-                        break
-                    
-                    # Если другой поток ещё обрабатывает — ждём
-                    if prev_info.get('processing', False):
-                        if waited_time >= max_wait_time:
-                            # Таймаут — пропускаем
-                            self.logger.debug(f"{filename} {name_val} (таймаут ожидания параллельной обработки)")
-                            should_skip = True
-                            break
-                        # Продолжаем ожидание (освобождаем lock и спим)
-                    else:
-                        # Предыдущая обработка завершилась невалидно — пробуем сами
-                        self.logger.info(f"{filename} {name_val} (повтор для уточнения данных)")
-                        prev_info['processing'] = True
-                        break
-                
-                # Если дошли сюда — нужно подождать
-                time_module.sleep(wait_interval)
-                waited_time += wait_interval
-
-        if should_skip:
-            self.logger.info(f"{filename} {name_val} (дубль)")
-            return {'duplicate': True, 'name': name_val}
-             
-        results['name'] = name_val
-        
+
+        return {'name': name_val, 'name_crop': name_crop, 'crops': crops}
+
+    def recognize_fields(self, image_path, name_info, stop_event=None, prior=None):
+        """
+        Второй этап: класс и числовые поля для выбранного скриншота игрока.
+        prior: предыдущие значения игрока — неправдоподобное число распознается повторно
+        с другой предобработкой; если не помогло, поле попадает в results['implausible'].
+        Возвращает словарь результатов или None при остановке.
+        """
         if stop_event and stop_event.is_set():
             return None
 
+        filename = os.path.basename(image_path)
+        crops = name_info['crops']
+        results = {'name': name_info['name']}
+
         # 2. Обработка класса
-        class_crop_raw = get_crop('class')
         # Предобработка: инверсия, бинаризация, паддинг
-        class_crop = self.ocr.preprocess_for_ocr(class_crop_raw, scale_factor=2, padding=5, use_otsu=False, invert=True)
-        text, conf = self.ocr.recognize_single_line(class_crop, lang='rus')
+        class_crop = self.ocr.preprocess_for_ocr(crops['class'], scale_factor=2, padding=5, use_otsu=False, invert=True)
+        text, conf = self.ocr.recognize_single_line(class_crop, lang='rus', cancel_token=stop_event)
         if text:
             # Очистка обратной кавычки и извлечение имени класса перед скобкой
             results['class'] = text.replace('`', '').replace("'", '').split('(')[0].strip()
@@ -561,77 +805,51 @@ class StatisticsProcessor:
         # 3. Числовые поля
         # Для числовых полей храним обработанные изображения для отладки
         numeric_crops = {}
-        has_valid_stats = False # Флаг: считались ли фраги или хонор
+        implausible = []
         
         for field in ['kills', 'honor', 'gear']:
             if stop_event and stop_event.is_set():
                 return None
  
-            crop_raw = get_crop(field)
             # Предобработка для чисел: инверсия, бинаризация, паддинг (без масштабирования)
-            crop = self.ocr.preprocess_for_ocr(crop_raw, scale_factor=2, padding=5, use_otsu=False, invert=True)
+            crop = self.ocr.preprocess_for_ocr(crops[field], scale_factor=2, padding=5, use_otsu=False, invert=True)
+            value = self._recognize_number(crop, stop_event)
+
+            # Повторное распознавание — только если значение неправдоподобно
+            reason = self.plausibility.check(field, value, prior, crops[field])
+            if reason:
+                for params in self.NUMERIC_RETRY_PREPROCESS:
+                    if stop_event and stop_event.is_set():
+                        return None
+                    retry_crop = self.ocr.preprocess_for_ocr(crops[field], **params)
+                    retry_value = self._recognize_number(retry_crop, stop_event)
+                    if retry_value is not None and self.plausibility.check(field, retry_value, prior, crops[field]) is None:
+                        self.logger.info(f"{filename}: {field} {value} неправдоподобно ({reason}), после повтора: {retry_value}")
+                        value, crop, reason = retry_value, retry_crop, None
+                        break
+            if reason:
+                self.logger.warning(f"{filename}: {field} {value} неправдоподобно ({reason})")
+                implausible.append(field)
+
             numeric_crops[field] = crop
-            
-            # Используем белый список цифр
-            text, conf = self.ocr.recognize_single_line(crop, lang='eng', config='-c tessedit_char_whitelist=0123456789')
-            
-            if text:
-                digits = "".join(filter(str.isdigit, text))
-                if digits:
-                    results[field] = int(digits)
-                else:
-                    results[field] = None  # Нет цифр — None вместо 0
-            else:
-                results[field] = None  # Нет текста — None вместо 0
+            results[field] = value
+        
+        if implausible:
+            results['implausible'] = implausible
 
-        # Статы валидны только если распознаны и фраги, и хонор
-        has_valid_stats = results.get('kills') is not None and results.get('honor') is not None
+        # Распознавание могло быть прервано на последнем поле — неполный результат не используем
+        if stop_event and stop_event.is_set():
+            return None
 
-        # Обновляем статус валидности в общем словаре
-        if names_per_group is not None and names_lock is not None:
-            with names_lock:
-                # Если текущий результат валиден (есть статы), обновляем запись
-                if has_valid_stats:
-                    names_per_group[name_val] = {'valid': True, 'processing': False}
-                
-                # Если мы не получили валидных данных, а в базе уже есть валидные (от другого потока),
-                # то считаем текущий результат дублем/мусором, чтобы не перезатереть хорошее.
-                elif names_per_group.get(name_val, {}).get('valid', False):
-                     return {'duplicate': True, 'name': name_val}
-                else:
-                    # Если не удалось получить статы, снимаем флаг обработки, чтобы другие потоки могли попытаться
-                    if name_val in names_per_group:
-                        names_per_group[name_val]['processing'] = False
-                
+        self.logger.info(f"{filename}: {results}")
         
-            self.logger.info(f"{filename}: {results}")
-            
-            # Сохранение отладочных изображений
-            if self.debug_screens:
-                debug_dir = os.path.join(os.path.dirname(image_path), os.path.splitext(filename)[0])
-                if not os.path.exists(debug_dir):
-                    os.makedirs(debug_dir)
-                    self.history.add_created(debug_dir)
-                else:
-                    os.makedirs(debug_dir, exist_ok=True)
-                
-                debug_images = {}
-                try:
-                    name_path = os.path.join(debug_dir, "name.jpg")
-                    Image.fromarray(name_crop).save(name_path)
-                    debug_images['name'] = name_path
-                    
-                    class_path = os.path.join(debug_dir, "class.jpg")
-                    Image.fromarray(class_crop).save(class_path)
-                    debug_images['class'] = class_path
-                    
-                    for field in ['kills', 'honor', 'gear']:
-                         field_path = os.path.join(debug_dir, f"{field}.jpg")
-                         Image.fromarray(numeric_crops[field]).save(field_path)
-                         debug_images[field] = field_path
-                         
-                    results['debug_images'] = debug_images
-                except Exception as e:
-                    self.logger.error(f"Не удалось сохранить отладочные изображения: {e}")
+        # Сохранение отладочных изображений (в фоне, одним спрайтом; в результатах — ссылки на кропы)
+        if self.debug_screens:
+            debug_dir = os.path.join(os.path.dirname(image_path), screenshot_base_name(filename))
+            results['debug_images'] = self.debug_sink.write(debug_dir, {
+                'name': name_info['name_crop'],
+                'class': class_crop,
+                **numeric_crops
+            })
             
         return results
@@ -0,0 +1,276 @@
+import os
+import re
+import json
+import logging
+from datetime import datetime
+from PIL import Image
+
+# Источники времени скриншота в порядке приоритета для режима "auto".
+# manifest — файл MANIFEST_NAME рядом со скриншотами: {"ScreenShot0001.jpg": "2024-05-01 20:15:03" или unix-время}
+# exif — DateTimeOriginal/DateTime из EXIF
+# filename — дата и время в имени файла (например, ScreenShot_2024-05-01_20-15-03.jpg)
+# sequence — порядок по номеру ScreenShotNNNN; в режиме "auto" — только для папок, где время изменения
+#            файлов потеряно (см. _times_collapsed), группы событий тогда разделяются по пропускам в номерах
+# mtime — время изменения файла
+TIMESTAMP_SOURCES = ('manifest', 'exif', 'filename', 'sequence', 'mtime')
+
+MANIFEST_NAME = "raidstat_manifest.json"
+# Кеш найденного времени — рядом с остальным состоянием программы (history_*.json, journal_*.jsonl),
+# а не в папке скриншотов: {папка: {"source", "manifest_mtime", "files"}}
+CACHE_NAME = "timestamps_cache.json"
+
+# Время изменения файлов папки считается потерянным, если все они изменены в пределах этого интервала (секунды)
+# или порядок по времени расходится с порядком номеров у большинства соседних пар
+COLLAPSED_SPAN = 2
+# Шаг времени между соседними номерами — только для порядка, дата и время берутся от самого раннего файла
+SEQUENCE_STEP = 0.001
+
+EXIF_DATETIME_ORIGINAL = 36867
+EXIF_DATETIME = 306
+EXIF_IFD = 0x8769
+
+FILENAME_DATETIME = re.compile(r'(\d{4})[-_.]?(\d{2})[-_.]?(\d{2})[ _T-]?(\d{2})[-_.:]?(\d{2})[-_.:]?(\d{2})')
+SEQUENCE_NUMBER = re.compile(r'(\d+)\D*$')
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_timestamps(records, source="auto"):
+    """
+    Заменяет mtime в FileRecord временем из выбранного источника.
+
+    Нужен, когда время изменения файлов потеряно (копирование с другого ПК или из облака):
+    тогда группировка по max_diff_time и названия колонок используют время из манифеста, EXIF или имени файла,
+    а если его нет — порядок номеров ScreenShotNNNN (группы разделяет split_groups по пропускам в номерах).
+    Найденные значения кешируются в CACHE_NAME (по папке, размеру и mtime файла),
+    поэтому повторный запуск не читает EXIF заново.
+
+    Args:
+        records: Список FileRecord (результат scan_directory).
+        source: "auto" (первый найденный в порядке TIMESTAMP_SOURCES) или одно имя источника
+                (если значения нет — используется mtime).
+
+    Returns:
+        Новый список FileRecord (порядок сохраняется).
+    """
+    if source == "mtime" or not records:
+        return records
+    if source != "auto" and source not in TIMESTAMP_SOURCES:
+        logger.warning(f"Неизвестный источник времени скриншотов: {source}, используется mtime")
+        return records
+
+    by_dir = {}
+    for record in records:
+        by_dir.setdefault(os.path.dirname(record.path), []).append(record)
+
+    cache = _load_json(CACHE_NAME)
+    if not isinstance(cache, dict):
+        cache = {}
+    changed = False
+    resolved = {}
+    for directory, dir_records in by_dir.items():
+        dir_resolved, dir_changed = _resolve_directory(directory, dir_records, source, cache)
+        resolved.update(dir_resolved)
+        changed = changed or dir_changed
+
+    if changed:
+        _save_cache(cache)
+
+    return [
+        record._replace(mtime=resolved[record.path][0], source=resolved[record.path][1])
+        if record.path in resolved else record
+        for record in records
+    ]
+
+
+def split_groups(records, max_diff, sequence_gap):
+    """
+    Делит отсортированные скриншоты на события: новое событие начинается, когда время отошло
+    от первого скриншота события больше чем на max_diff секунд, или — для времени по номерам
+    (source "sequence") — когда номер следующего скриншота больше предыдущего больше чем на sequence_gap.
+    """
+    groups = []
+    for record in records:
+        if groups:
+            first, prev = groups[-1][0], groups[-1][-1]
+            sequence_break = (
+                sequence_gap and record.source == prev.source == "sequence"
+                and sequence_number(record.path) - sequence_number(prev.path) > sequence_gap
+            )
+            if record.mtime - first.mtime <= max_diff and not sequence_break:
+                groups[-1].append(record)
+                continue
+        groups.append([record])
+    return groups
+
+
+def sort_key(record):
+    """Ключ сортировки скриншотов: время, при равном времени — номер ScreenShotNNNN."""
+    return (record.mtime, sequence_number(record.path), record.path)
+
+
+def sequence_number(path):
+    """Последнее число в имени файла (ScreenShot0042.jpg -> 42) или -1."""
+    match = SEQUENCE_NUMBER.search(os.path.splitext(os.path.basename(path))[0])
+    return int(match.group(1)) if match else -1
+
+
+def _resolve_directory(directory, records, source, cache):
+    """Время скриншотов одной папки: ({путь: (время, источник)}, изменился ли кеш)."""
+    manifest_path = os.path.join(directory, MANIFEST_NAME)
+    manifest_mtime = os.path.getmtime(manifest_path) if os.path.exists(manifest_path) else None
+    manifest = _load_manifest(manifest_path) if manifest_mtime is not None and source in ("auto", "manifest") else {}
+
+    # Кеш действителен для той же настройки источника и той же версии манифеста
+    cache_key = os.path.abspath(directory)
+    dir_cache = cache.get(cache_key)
+    cached_files = {}
+    if isinstance(dir_cache, dict) and dir_cache.get("source") == source and dir_cache.get("manifest_mtime") == manifest_mtime:
+        cached_files = dir_cache.get("files") or {}
+
+    # Номера скриншотов не читаются из файлов и не кешируются — см. _sequence_times
+    sources = tuple(s for s in TIMESTAMP_SOURCES if s not in ("sequence", "mtime")) if source == "auto" else (source,)
+    files = {}
+    resolved = {}
+    changed = False
+    for record in records:
+        name = os.path.basename(record.path)
+        entry = cached_files.get(name)
+        if not entry or entry.get("size") != record.size or entry.get("mtime") != record.mtime:
+            entry = {"size": record.size, "mtime": record.mtime, "time": None, "source": "mtime"}
+            for candidate in sources:
+                value = _read_source(candidate, record.path, manifest)
+                if value is not None:
+                    entry["time"], entry["source"] = value, candidate
+                    break
+            changed = True
+        files[name] = entry
+        if entry["time"] is not None:
+            resolved[record.path] = (entry["time"], entry["source"])
+
+    changed = changed or len(files) != len(cached_files)
+    if changed:
+        cache[cache_key] = {"source": source, "manifest_mtime": manifest_mtime, "files": files}
+
+    if source in ("auto", "sequence"):
+        rest = [r for r in records if r.path not in resolved and sequence_number(r.path) >= 0]
+        if source == "sequence" or _times_collapsed(rest):
+            resolved.update(_sequence_times(rest))
+
+    if resolved:
+        logger.info(f"{directory}: время взято не из mtime для {len(resolved)} из {len(records)} скриншотов")
+    return resolved, changed
+
+
+def _times_collapsed(records):
+    """
+    Время изменения потеряно (файлы скопированы): все файлы изменены почти одновременно
+    или порядок по времени расходится с порядком номеров ScreenShotNNNN у большинства соседних пар.
+
+    Отдельные файлы не по порядку (пересохраненный скриншот, сброс счетчика номеров) не отменяют
+    настоящее время остальных — иначе события разных дней слились бы в одно.
+    """
+    if len(records) < 2:
+        return False
+    ordered = sorted(records, key=lambda r: sequence_number(r.path))
+    mtimes = [r.mtime for r in ordered]
+    if max(mtimes) - min(mtimes) <= COLLAPSED_SPAN:
+        return True
+    disordered = [later for earlier, later in zip(ordered, ordered[1:]) if later.mtime < earlier.mtime]
+    if len(disordered) * 2 > len(ordered) - 1:
+        return True
+    if disordered:
+        names = ", ".join(os.path.basename(r.path) for r in disordered[:5])
+        logger.warning(
+            f"{os.path.dirname(ordered[0].path)}: время изменения {len(disordered)} скриншотов не совпадает "
+            f"с порядком номеров ({names}), используется время изменения файлов"
+        )
+    return False
+
+
+def _sequence_times(records):
+    """Время по номерам: от самого раннего времени изменения файлов папки, по порядку номеров."""
+    if not records:
+        return {}
+    base = min(r.mtime for r in records)
+    first = min(sequence_number(r.path) for r in records)
+    return {r.path: (base + (sequence_number(r.path) - first) * SEQUENCE_STEP, "sequence") for r in records}
+
+
+def _save_cache(cache):
+    """
+    Атомарная запись кеша: временный файл этого процесса и os.replace, чтобы второй запущенный режим
+    не прочитал наполовину записанный файл.
+    """
+    tmp_path = f"{CACHE_NAME}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False)
+        os.replace(tmp_path, CACHE_NAME)
+    except OSError as e:
+        logger.warning(f"Не удалось сохранить кеш времени скриншотов {CACHE_NAME}: {e}")
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _read_source(source, path, manifest):
+    if source == "manifest":
+        return _parse_time(manifest.get(os.path.basename(path)))
+    if source == "exif":
+        return _read_exif_time(path)
+    if source == "filename":
+        match = FILENAME_DATETIME.search(os.path.basename(path))
+        if match:
+            try:
+                return datetime(*map(int, match.groups())).timestamp()
+            except ValueError:
+                return None
+    return None
+
+
+def _read_exif_time(path):
+    try:
+        # Читается только заголовок файла, пиксели не декодируются
+        with Image.open(path) as img:
+            exif = img.getexif()
+            value = exif.get_ifd(EXIF_IFD).get(EXIF_DATETIME_ORIGINAL) or exif.get(EXIF_DATETIME)
+    except Exception as e:
+        logger.debug(f"Не удалось прочитать EXIF {path}: {e}")
+        return None
+    return _parse_time(value)
+
+
+def _parse_time(value):
+    """Unix-время или строка вида 2024-05-01 20:15:03 / 2024:05:01 20:15:03 (EXIF) / ISO."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().rstrip('\x00')
+    for fmt in ("%Y:%m:%d %H:%M:%S", "%Y-%m-%d %H:%M:%S", "%Y-%m-%dT%H:%M:%S", "%Y-%m-%d %H:%M"):
+        try:
+            return datetime.strptime(text, fmt).timestamp()
+        except ValueError:
+            continue
+    logger.warning(f"Не удалось разобрать время скриншота: {text}")
+    return None
+
+
+def _load_manifest(path):
+    manifest = _load_json(path)
+    if not isinstance(manifest, dict):
+        logger.warning(f"Манифест {path} должен содержать объект {{имя файла: время}}")
+        return {}
+    return manifest
+
+
+def _load_json(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.warning(f"Не удалось прочитать {path}: {e}")
+        return {}
@@ -1,11 +1,12 @@
 import customtkinter as ctk
 import tkinter as tk
-from tkinter import filedialog
+from tkinter import filedialog, messagebox
 import logging
 import threading
 import sys
 import os
 from ..core.processor import RaidStatProcessor
+from ..core.annotation import open_result
 from .cropper import CropWindow
 import webbrowser
 
@@ -59,6 +60,8 @@ class App(ctk.CTk):
         
         # Инициализация процессора
         self.processor = RaidStatProcessor()
+        # Выполняющиеся режимы: посещаемость и статистику можно обрабатывать одновременно
+        self.running_modes = set()
 
         # Установка иконки
         self._set_icon()
@@ -362,6 +365,32 @@ class App(ctk.CTk):
         )
         btn_revert.pack(fill="x")
 
+        btn_open_result = ctk.CTkButton(
+            btn_frame, 
+            text="🖼️ Открыть результат", 
+            command=self.open_attendance_result,
+            fg_color="transparent",
+            border_width=1,
+            border_color=Theme.ACCENT_BLUE,
+            text_color=Theme.ACCENT_BLUE,
+            hover_color=Theme.BG_CARD,
+            height=35
+        )
+        btn_open_result.pack(fill="x", pady=(10, 0))
+
+        btn_rebuild_summary = ctk.CTkButton(
+            btn_frame, 
+            text="📊 Пересчитать сводку", 
+            command=self.rebuild_attendance_summary_ui,
+            fg_color="transparent",
+            border_width=1,
+            border_color=Theme.ACCENT_BLUE,
+            text_color=Theme.ACCENT_BLUE,
+            hover_color=Theme.BG_CARD,
+            height=35
+        )
+        btn_rebuild_summary.pack(fill="x", pady=(10, 0))
+
     def setup_statistics_view(self, parent):
         parent.grid_columnconfigure(0, weight=1)
         
@@ -494,6 +523,18 @@ class App(ctk.CTk):
         self.entry_api_key.bind("<FocusOut>", lambda e: self.save_settings())
         
         self.toggle_api_key(display_mode)
+
+        ctk.CTkLabel(grid_algo, text="Актуальность \"до\" (мин, 0 — выкл.):", text_color=Theme.TEXT_SECONDARY).grid(row=3, column=0, sticky="w", pady=10)
+        self.var_baseline_age = ctk.StringVar(value=str(self.processor.config.baseline_max_age))
+        entry_baseline = ctk.CTkEntry(grid_algo, textvariable=self.var_baseline_age, width=150)
+        entry_baseline.grid(row=3, column=1, sticky="w", padx=20)
+        entry_baseline.bind("<FocusOut>", lambda e: self.save_settings())
+
+        ctk.CTkLabel(grid_algo, text="Время скриншотов:", text_color=Theme.TEXT_SECONDARY).grid(row=4, column=0, sticky="w", pady=10)
+        self.timestamp_source_map = {"auto": "Авто", "manifest": "Манифест", "exif": "EXIF", "filename": "Имя файла", "sequence": "Номер скриншота", "mtime": "Время изменения"}
+        self.timestamp_source_map_rev = {v: k for k, v in self.timestamp_source_map.items()}
+        self.var_timestamp_source = ctk.StringVar(value=self.timestamp_source_map.get(self.processor.config.timestamp_source, "Авто"))
+        ctk.CTkComboBox(grid_algo, values=list(self.timestamp_source_map.values()), variable=self.var_timestamp_source, command=self.save_settings, width=150).grid(row=4, column=1, sticky="w", padx=20)
         
         # --- Отладка ---
         self.create_section_header(scroll_frame, "ПРОЧЕЕ И ОТЛАДКА")
@@ -502,9 +543,55 @@ class App(ctk.CTk):
         
         self.var_show = ctk.BooleanVar(value=self.processor.config.show_afterscreen)
         ctk.CTkCheckBox(card_debug, text="Открывать результирующие скриншоты", variable=self.var_show, command=self.save_settings).pack(anchor="w", padx=20, pady=(20, 10))
+
+        grid_annotation = ctk.CTkFrame(card_debug, fg_color="transparent")
+        grid_annotation.pack(fill="x", padx=20, pady=10)
+
+        ctk.CTkLabel(grid_annotation, text="Результирующие скриншоты:", text_color=Theme.TEXT_SECONDARY).grid(row=0, column=0, sticky="w", pady=5)
+        self.annotation_mode_map = {"full": "Целиком", "region": "Только рейд", "deferred": "При открытии"}
+        self.annotation_mode_map_rev = {v: k for k, v in self.annotation_mode_map.items()}
+        self.var_annotation_mode = ctk.StringVar(value=self.annotation_mode_map.get(self.processor.config.annotation_mode, "Целиком"))
+        ctk.CTkComboBox(grid_annotation, values=list(self.annotation_mode_map.values()), variable=self.var_annotation_mode, command=self.save_settings, width=150).grid(row=0, column=1, sticky="w", padx=20)
+
+        ctk.CTkLabel(grid_annotation, text="Формат:", text_color=Theme.TEXT_SECONDARY).grid(row=1, column=0, sticky="w", pady=5)
+        self.annotation_format_map = {"auto": "Как исходный", "jpg": "JPEG", "png": "PNG", "webp": "WebP"}
+        self.annotation_format_map_rev = {v: k for k, v in self.annotation_format_map.items()}
+        self.var_annotation_format = ctk.StringVar(value=self.annotation_format_map.get(self.processor.config.annotation_format, "Как исходный"))
+        ctk.CTkComboBox(grid_annotation, values=list(self.annotation_format_map.values()), variable=self.var_annotation_format, command=self.save_settings, width=150).grid(row=1, column=1, sticky="w", padx=20)
+
+        ctk.CTkLabel(grid_annotation, text="Обработанные скриншоты:", text_color=Theme.TEXT_SECONDARY).grid(row=2, column=0, sticky="w", pady=5)
+        self.archive_mode_map = {"full": "Целиком", "roi": "Только области (без отката)"}
+        self.archive_mode_map_rev = {v: k for k, v in self.archive_mode_map.items()}
+        self.var_archive_mode = ctk.StringVar(value=self.archive_mode_map.get(self.processor.config.archive_mode, "Целиком"))
+        ctk.CTkComboBox(grid_annotation, values=list(self.archive_mode_map.values()), variable=self.var_archive_mode, command=self.save_settings, width=150).grid(row=2, column=1, sticky="w", padx=20)
+
+        ctk.CTkLabel(grid_annotation, text="Хранилище:", text_color=Theme.TEXT_SECONDARY).grid(row=3, column=0, sticky="w", pady=5)
+        self.storage_backend_map = {"excel": "Excel", "sqlite": "SQLite"}
+        self.storage_backend_map_rev = {v: k for k, v in self.storage_backend_map.items()}
+        self.var_storage_backend = ctk.StringVar(value=self.storage_backend_map.get(self.processor.config.storage_backend, "Excel"))
+        ctk.CTkComboBox(grid_annotation, values=list(self.storage_backend_map.values()), variable=self.var_storage_backend, command=self.save_settings, width=150).grid(row=3, column=1, sticky="w", padx=20)
+        ctk.CTkButton(grid_annotation, text="Выгрузить в Excel", command=self.export_excel_ui, width=80, fg_color=Theme.ACCENT_BLUE).grid(row=3, column=2)
+
+        ctk.CTkLabel(grid_annotation, text="Выгрузка фактов:", text_color=Theme.TEXT_SECONDARY).grid(row=4, column=0, sticky="w", pady=5)
+        self.facts_export_map = {"off": "Нет", "parquet": "Parquet", "feather": "Feather"}
+        self.facts_export_map_rev = {v: k for k, v in self.facts_export_map.items()}
+        self.var_facts_export = ctk.StringVar(value=self.facts_export_map.get(self.processor.config.facts_export, "Нет"))
+        ctk.CTkComboBox(grid_annotation, values=list(self.facts_export_map.values()), variable=self.var_facts_export, command=self.save_settings, width=150).grid(row=4, column=1, sticky="w", padx=20)
+
+        ctk.CTkLabel(grid_annotation, text="Разбиение книги:", text_color=Theme.TEXT_SECONDARY).grid(row=5, column=0, sticky="w", pady=5)
+        self.excel_partition_map = {"off": "Нет", "month": "По месяцам", "season": "По сезонам"}
+        self.excel_partition_map_rev = {v: k for k, v in self.excel_partition_map.items()}
+        self.var_excel_partition = ctk.StringVar(value=self.excel_partition_map.get(self.processor.config.excel_partition, "Нет"))
+        ctk.CTkComboBox(grid_annotation, values=list(self.excel_partition_map.values()), variable=self.var_excel_partition, command=self.save_settings, width=150).grid(row=5, column=1, sticky="w", padx=20)
         
         self.var_debug_screens = ctk.BooleanVar(value=self.processor.config.get("debug_screens"))
         ctk.CTkCheckBox(card_debug, text="Сохранять отладочные скриншоты", variable=self.var_debug_screens, command=self.save_settings).pack(anchor="w", padx=20, pady=10)
+
+        self.var_skip_processed = ctk.BooleanVar(value=self.processor.config.skip_processed)
+        ctk.CTkCheckBox(card_debug, text="Пропускать уже обработанные скриншоты (по содержимому)", variable=self.var_skip_processed, command=self.save_settings).pack(anchor="w", padx=20, pady=10)
+
+        self.var_excel_com = ctk.BooleanVar(value=self.processor.config.excel_com)
+        ctk.CTkCheckBox(card_debug, text="Оформлять статистику через Excel (COM)", variable=self.var_excel_com, command=self.save_settings).pack(anchor="w", padx=20, pady=10)
         
         self.var_debug = ctk.BooleanVar(value=self.processor.config.debug)
         ctk.CTkCheckBox(card_debug, text="Режим отладки (расширенный лог)", variable=self.var_debug, command=self.save_settings).pack(anchor="w", padx=20, pady=(10, 20))
@@ -663,9 +750,23 @@ class App(ctk.CTk):
                 self.processor.config.set("max_diff_time", int(self.var_max_diff.get()))
             except ValueError:
                  logging.warning("Некорректное значение для таймаута группы.")
+
+            try:
+                self.processor.config.set("baseline_max_age", int(self.var_baseline_age.get()))
+            except ValueError:
+                 logging.warning("Некорректное значение актуальности статистики \"до\".")
             
+            self.processor.config.set("timestamp_source", self.timestamp_source_map_rev.get(self.var_timestamp_source.get(), "auto"))
             self.processor.config.set("show_afterscreen", self.var_show.get())
+            self.processor.config.set("annotation_mode", self.annotation_mode_map_rev.get(self.var_annotation_mode.get(), "full"))
+            self.processor.config.set("annotation_format", self.annotation_format_map_rev.get(self.var_annotation_format.get(), "auto"))
+            self.processor.config.set("archive_mode", self.archive_mode_map_rev.get(self.var_archive_mode.get(), "full"))
+            self.processor.config.set("skip_processed", self.var_skip_processed.get())
             self.processor.config.set("debug_screens", self.var_debug_screens.get())
+            self.processor.config.set("storage_backend", self.storage_backend_map_rev.get(self.var_storage_backend.get(), "excel"))
+            self.processor.config.set("excel_partition", self.excel_partition_map_rev.get(self.var_excel_partition.get(), "off"))
+            self.processor.config.set("facts_export", self.facts_export_map_rev.get(self.var_facts_export.get(), "off"))
+            self.processor.config.set("excel_com", self.var_excel_com.get())
             self.processor.config.set("debug", self.var_debug.get())
             
             logging.getLogger().setLevel(logging.DEBUG if self.var_debug.get() else logging.INFO)
@@ -698,36 +799,58 @@ class App(ctk.CTk):
 
         CropWindow(self, img_path, callback=callback)
 
-    def stop_processing_action(self):
-        self.processor.stop_processing()
+    def ask_resume(self, mode, path):
+        """Предлагает продолжить прерванную обработку папки, если для нее остался журнал запуска."""
+        if not self.processor.has_pending_run(mode, path):
+            return False
+        return messagebox.askyesno(
+            "Незавершенная обработка",
+            "Предыдущая обработка этой папки была прервана.\n"
+            "Продолжить с места остановки (без повторного распознавания)?"
+        )
+
+    def stop_processing_action(self, mode=None):
+        self.processor.stop_processing(mode)
+
+    def open_workbook_after_run(self, mode):
+        # У SQLite-хранилища книги нет — она создается выгрузкой
+        excel_path = getattr(self.processor.storage, "file_path", None)
+        if not excel_path:
+            return
+        if self.running_modes - {mode}:
+            # Открытая в Excel книга заблокирована для записи — не мешаем второму режиму сохраниться
+            logging.info(f"{excel_path} не открывается: обработка другого режима еще идет")
+        elif os.path.exists(excel_path):
+            logging.info(f"Открываю {excel_path}...")
+            os.startfile(excel_path)
+        else:
+            logging.warning(f"Файл Excel не найден: {excel_path}")
 
     def run_attendance(self):
         path = self.att_folder_path.get()
         if not path or path == "Папка не выбрана":
             logging.warning("Выберите папку со скриншотами.")
             return
+
+        resume = self.ask_resume("attendance", path)
             
-        self.btn_att_process.configure(text="🛑 Остановить", fg_color=Theme.ACCENT_RED, hover_color=Theme.BTN_HOVER_RED, command=self.stop_processing_action)
+        self.btn_att_process.configure(text="🛑 Остановить", fg_color=Theme.ACCENT_RED, hover_color=Theme.BTN_HOVER_RED, command=lambda: self.stop_processing_action("attendance"))
+        self.running_modes.add("attendance")
         
         def task():
             try:
-                count = self.processor.process_attendance(path, self.att_recursive.get())
-                if self.processor.stop_event.is_set():
+                count = self.processor.process_attendance(path, self.att_recursive.get(), resume=resume)
+                if self.processor.is_stopped("attendance"):
                     logging.info("Обработка остановлена пользователем.")
                 else:
                     logging.info(f"Обработка посещаемости завершена. Найдено имен: {count}.")
-                    
-                    excel_path = self.processor.storage.file_path
-                    if os.path.exists(excel_path):
-                        logging.info(f"Открываю {excel_path}...")
-                        os.startfile(excel_path)
-                    else:
-                        logging.warning(f"Файл Excel не найден: {excel_path}")
+                    self.open_workbook_after_run("attendance")
             except Exception as e:
                 logging.error(f"Ошибка: {e}")
                 import traceback
                 logging.error(traceback.format_exc())
             finally:
+                self.running_modes.discard("attendance")
                 self.after(0, lambda: self.btn_att_process.configure(
                     text="🚀 Начать обработку", fg_color=Theme.ACCENT_GREEN, hover_color=Theme.BTN_HOVER_GREEN, command=self.run_attendance
                 ))
@@ -739,37 +862,44 @@ class App(ctk.CTk):
         if not path or path == "Папка не выбрана":
             logging.warning("Выберите папку со скриншотами.")
             return
+
+        resume = self.ask_resume("statistics", path)
             
-        self.btn_stat_process.configure(text="🛑 Остановить", fg_color=Theme.ACCENT_RED, hover_color=Theme.BTN_HOVER_RED, command=self.stop_processing_action)
+        self.btn_stat_process.configure(text="🛑 Остановить", fg_color=Theme.ACCENT_RED, hover_color=Theme.BTN_HOVER_RED, command=lambda: self.stop_processing_action("statistics"))
+        self.running_modes.add("statistics")
         
         def task():
             try:
-                count = self.processor.process_statistics(path, recursive=False)
-                if self.processor.stop_event.is_set():
+                count = self.processor.process_statistics(path, recursive=False, resume=resume)
+                if self.processor.is_stopped("statistics"):
                      logging.info("Сбор статистики остановлен пользователем.")
                 else:
                     if count == 0:
                         logging.warning(f"Изображений в папке {path} не найдено.")
                     else:
                         logging.info(f"Сбор статистики завершен. Обработано изображений: {count}.")
-                        
-                        excel_path = self.processor.storage.file_path
-                        if os.path.exists(excel_path):
-                            logging.info(f"Открываю {excel_path}...")
-                            os.startfile(excel_path)
-                        else:
-                            logging.warning(f"Файл Excel не найден: {excel_path}")
+                        self.open_workbook_after_run("statistics")
             except Exception as e:
                 logging.error(f"Ошибка: {e}")
                 import traceback
                 logging.error(traceback.format_exc())
             finally:
+                self.running_modes.discard("statistics")
                 self.after(0, lambda: self.btn_stat_process.configure(
                     text="📊 Собрать статистику", fg_color=Theme.ACCENT_GREEN, hover_color=Theme.BTN_HOVER_GREEN, command=self.run_statistics
                 ))
         
         threading.Thread(target=task).start()
 
+    def open_attendance_result(self):
+        path = filedialog.askopenfilename(filetypes=[("Результаты", "*_res.*")])
+        if not path:
+            return
+        try:
+            open_result(path)
+        except Exception as e:
+            logging.error(f"Не удалось открыть результат {path}: {e}")
+
     def revert_attendance_ui(self):
         def task():
             try:
@@ -779,6 +909,14 @@ class App(ctk.CTk):
                 logging.error(f"Ошибка при возврате скриншотов: {e}")
         threading.Thread(target=task).start()
 
+    def rebuild_attendance_summary_ui(self):
+        def task():
+            try:
+                self.processor.rebuild_attendance_summary()
+            except Exception as e:
+                logging.error(f"Ошибка пересчета сводки: {e}")
+        threading.Thread(target=task).start()
+
     def revert_statistics_ui(self):
         def task():
             try:
@@ -788,6 +926,16 @@ class App(ctk.CTk):
                 logging.error(f"Ошибка при возврате скриншотов: {e}")
         threading.Thread(target=task).start()
 
+    def export_excel_ui(self):
+        def task():
+            try:
+                path = self.processor.export_excel()
+                if path:
+                    logging.info(f"База выгружена в {path}")
+            except Exception as e:
+                logging.error(f"Ошибка выгрузки в Excel: {e}")
+        threading.Thread(target=task).start()
+
 if __name__ == "__main__":
     app = App()
     app.mainloop()
@@ -0,0 +1,146 @@
+from datetime import datetime, timedelta
+
+# Сводка посещаемости: накопительные показатели игроков, которые обновляются
+# при каждой новой колонке посещаемости без пересчета всей истории.
+SUMMARY_SHEET = "Сводка"
+SUMMARY_HEADERS = ["Ник", "Рейдов", "Посещено", "Процент", "Последний рейд", "За 30 дней", "За 90 дней", "Даты за 90 дней"]
+
+# Скользящие окна (дни) — считаются на дату последнего рейда
+WINDOWS = (30, 90)
+DATES_SEPARATOR = ";"
+PERCENT_FORMAT = "0%"
+
+EVENT_DATE_FORMAT = "%Y-%m-%d"
+
+
+def _event_date(date_str):
+    try:
+        return datetime.strptime(str(date_str).strip()[:10], EVENT_DATE_FORMAT).date()
+    except ValueError:
+        return None
+
+
+def _new_state():
+    # [рейдов с первого появления, посещено, последний рейд, даты посещений в окне]
+    return [0, 0, None, []]
+
+
+def apply_event(state, present, date_str):
+    """
+    Учитывает рейд date_str в состоянии сводки {ник: состояние}.
+    Рейд засчитывается всем уже известным игрокам и новым присутствовавшим.
+    """
+    present = {str(name).strip() for name in present} - {""}
+    event_date = _event_date(date_str)
+    for name in present:
+        state.setdefault(name, _new_state())
+
+    for name, player in state.items():
+        player[0] += 1
+        if name in present:
+            player[1] += 1
+            player[2] = str(date_str)
+            if event_date:
+                player[3].append(event_date)
+        if event_date:
+            # Даты старше самого длинного окна больше не нужны
+            cutoff = event_date - timedelta(days=max(WINDOWS))
+            player[3] = [d for d in player[3] if d > cutoff]
+    return event_date
+
+
+def read_state(ws):
+    state = {}
+    for row in ws.iter_rows(min_row=2, max_col=len(SUMMARY_HEADERS), values_only=True):
+        if not row or row[0] is None or not str(row[0]).strip():
+            continue
+        row = list(row) + [None] * (len(SUMMARY_HEADERS) - len(row))
+        dates = [_event_date(d) for d in str(row[7] or "").split(DATES_SEPARATOR) if d]
+        state[str(row[0]).strip()] = [
+            row[1] if isinstance(row[1], int) else 0,
+            row[2] if isinstance(row[2], int) else 0,
+            row[4],
+            [d for d in dates if d]
+        ]
+    return state
+
+
+def summary_rows(state, reference_date):
+    """Строки листа сводки (без заголовка); окна считаются на reference_date (дата последнего рейда)."""
+    for name, (total, attended, last_seen, dates) in state.items():
+        windows = []
+        for days in WINDOWS:
+            if reference_date:
+                cutoff = reference_date - timedelta(days=days)
+                windows.append(sum(1 for d in dates if d > cutoff))
+            else:
+                windows.append(None)
+        yield [
+            name, total, attended, attended / total if total else 0, last_seen, *windows,
+            DATES_SEPARATOR.join(d.strftime(EVENT_DATE_FORMAT) for d in dates)
+        ]
+
+
+def format_sheet(ws, rows_count):
+    """Скрытая колонка дат и автофильтр на rows_count строк данных."""
+    ws.column_dimensions["H"].hidden = True
+    ws.auto_filter.ref = f"A1:G{rows_count + 1}"
+
+
+def write_state(wb, state, reference_date):
+    """Перезаписывает лист сводки."""
+    if SUMMARY_SHEET in wb.sheetnames:
+        index = wb.sheetnames.index(SUMMARY_SHEET)
+        wb.remove(wb[SUMMARY_SHEET])
+        ws = wb.create_sheet(SUMMARY_SHEET, index)
+    else:
+        ws = wb.create_sheet(SUMMARY_SHEET)
+
+    ws.append(SUMMARY_HEADERS)
+    for row in summary_rows(state, reference_date):
+        ws.append(row)
+        ws.cell(row=ws.max_row, column=4).number_format = PERCENT_FORMAT
+    format_sheet(ws, ws.max_row - 1)
+
+
+def latest_date(state):
+    dates = [d for player in state.values() for d in player[3]]
+    return max(dates) if dates else None
+
+
+def attended(state):
+    """Посещения игроков по состоянию сводки: {ник: (посещено рейдов, последний рейд)} — для листа итогов."""
+    return {name: (player[1], player[2]) for name, player in state.items() if player[1]}
+
+
+def update_summary(wb, present, date_str):
+    """Инкрементальное обновление: читается только лист сводки, не колонки истории. Возвращает состояние сводки."""
+    state = read_state(wb[SUMMARY_SHEET]) if SUMMARY_SHEET in wb.sheetnames else {}
+    event_date = apply_event(state, present, date_str)
+    write_state(wb, state, max(filter(None, (event_date, latest_date(state))), default=None))
+    return state
+
+
+def build_state(events):
+    """
+    Состояние сводки по истории посещаемости.
+    events: рейды в хронологическом порядке — (название рейда, {ник: значение 1/0/None})
+    или (название рейда, множество присутствовавших).
+    """
+    state = {}
+    for date_str, values in events:
+        if isinstance(values, dict):
+            # Строка игрока начинается с первого посещения: до него значения пустые
+            for name, value in values.items():
+                if value is not None and value != 1:
+                    state.setdefault(name, _new_state())
+            values = [name for name, value in values.items() if value == 1]
+        apply_event(state, values, date_str)
+    return state
+
+
+def rebuild_summary(wb, columns):
+    """Полный пересчет сводки по колонкам посещаемости (см. build_state). Возвращает состояние сводки."""
+    state = build_state(columns)
+    write_state(wb, state, latest_date(state))
+    return state
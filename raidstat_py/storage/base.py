@@ -2,8 +2,8 @@ from abc import ABC, abstractmethod
 
 class StorageInterface(ABC):
     @abstractmethod
-    def get_roster(self):
-        """Возвращает список известных имен."""
+    def get_roster(self, source="statistics"):
+        """Возвращает список известных имен из указанного источника."""
         pass
 
     @abstractmethod
@@ -0,0 +1,67 @@
+import os
+import re
+import zipfile
+from .comment_images import find_sheet_part
+
+# openpyxl сохраняет формулы без вычисленного значения (<f>...</f><v />), и любой читатель,
+# кроме Excel (pandas, load_workbook(data_only=True)), видит пустые ячейки до пересчета в Excel.
+# После сохранения книги значения, посчитанные в Python, дописываются в <v> формул.
+# Excel при открытии все равно пересчитывает книгу (fullCalcOnLoad), так что значения не расходятся.
+
+FORMULA_CELL_RE = re.compile(r'<c r="([A-Z]+)(\d+)"([^>]*)><f>([^<]*)</f><v\s*/>')
+
+
+def _column_index(letters):
+    index = 0
+    for letter in letters:
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index
+
+
+def add_cached_values(xlsx_path, sheet_name, values):
+    """
+    Дописывает вычисленные значения формул листа sheet_name в сохраненной книге xlsx_path.
+
+    Args:
+        values: {(строка, колонка): значение} (нумерация с 1); "" — пустая строка-результат формулы.
+
+    Returns:
+        Число ячеек, получивших значение.
+    """
+    if not values:
+        return 0
+
+    with zipfile.ZipFile(xlsx_path) as zin:
+        parts = {name: zin.read(name) for name in zin.namelist()}
+    sheet_part = find_sheet_part(parts, sheet_name)
+    if not sheet_part or sheet_part not in parts:
+        return 0
+
+    count = 0
+
+    def replace(match):
+        nonlocal count
+        letters, row, attrs, formula = match.groups()
+        value = values.get((int(row), _column_index(letters)))
+        if value is None:
+            return match.group(0)
+        count += 1
+        if isinstance(value, str):
+            return f'<c r="{letters}{row}"{attrs} t="str"><f>{formula}</f><v>{_escape(value)}</v>'
+        return f'<c r="{letters}{row}"{attrs}><f>{formula}</f><v>{value!r}</v>'
+
+    text = FORMULA_CELL_RE.sub(replace, parts[sheet_part].decode('utf-8'))
+    if not count:
+        return 0
+    parts[sheet_part] = text.encode('utf-8')
+
+    tmp_path = xlsx_path + ".values"
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as zout:
+        for name, data in parts.items():
+            zout.writestr(name, data)
+    os.replace(tmp_path, xlsx_path)
+    return count
+
+
+def _escape(value):
+    return value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
@@ -0,0 +1,144 @@
+import os
+import uuid
+import logging
+from datetime import datetime
+from .excel_impl import event_values
+
+# Форматы выгрузки фактов (нужен pyarrow)
+FACTS_FORMATS = ("parquet", "feather")
+FACTS_EXTENSIONS = {"parquet": ".parquet", "feather": ".feather"}
+
+FACTS_DIR = "Raidstat_facts"
+
+# Названия событий — "2024-05-01 20:15"; по дате строится раздел date=YYYY-MM-DD
+EVENT_TIME_FORMAT = "%Y-%m-%d %H:%M"
+
+STAT_FIELDS = ("honor_start", "honor_end", "kills_start", "kills_end", "gear")
+
+
+class ColumnarExporter:
+    """
+    Выгрузка фактов в длинном формате (строка = игрок x событие) в колоночные файлы.
+
+    Каждый запуск дописывает по одному файлу в раздел своей даты:
+        <base_dir>/<режим>/date=2024-05-01/<запуск>.parquet
+    Такую раскладку (hive-разделы) pyarrow.dataset и pandas.read_parquet читают как одну таблицу
+    и по фильтру на date открывают только нужные папки, не просматривая всю историю.
+    """
+    def __init__(self, base_dir=FACTS_DIR, fmt="parquet"):
+        self.base_dir = base_dir
+        self.fmt = fmt
+        self.logger = logging.getLogger(__name__)
+
+    def wrap(self, session, mode):
+        """Сессия записи, которая дополнительно собирает факты и выгружает их при commit()."""
+        return FactsSession(session, self, mode)
+
+    def write_run(self, mode, rows):
+        """
+        Записывает факты запуска: по файлу на каждую дату.
+        Возвращает список путей (пустой, если фактов нет или pyarrow недоступен).
+        """
+        if not rows:
+            return []
+        try:
+            import pyarrow as pa
+        except ImportError:
+            self.logger.warning("pyarrow не установлен. Выгрузка фактов в Parquet/Feather недоступна.")
+            return []
+
+        schema = _schema(pa, mode)
+        run_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        by_date = {}
+        for row in rows:
+            by_date.setdefault(row["event_time"].strftime("%Y-%m-%d"), []).append(row)
+
+        paths = []
+        for date, date_rows in sorted(by_date.items()):
+            folder = os.path.join(self.base_dir, mode, f"date={date}")
+            os.makedirs(folder, exist_ok=True)
+            path = os.path.join(folder, run_id + FACTS_EXTENSIONS[self.fmt])
+            table = pa.Table.from_pylist(date_rows, schema=schema)
+            self._write_table(table, path + ".tmp")
+            os.replace(path + ".tmp", path)
+            paths.append(path)
+        self.logger.info(f"Факты ({mode}) выгружены: {len(rows)} строк, файлов: {len(paths)}")
+        return paths
+
+    def _write_table(self, table, path):
+        if self.fmt == "feather":
+            import pyarrow.feather as feather
+            feather.write_feather(table, path)
+        else:
+            import pyarrow.parquet as pq
+            pq.write_table(table, path)
+
+
+class FactsSession:
+    """
+    Обертка сессии хранилища: операции передаются дальше без изменений,
+    а их данные копятся строками фактов. Файлы пишутся после сохранения основной книги/базы.
+    """
+    def __init__(self, session, exporter, mode):
+        self.session = session
+        self.exporter = exporter
+        self.mode = mode
+        self.rows = []
+
+    def save_attendance(self, attendance_data, date_str):
+        self.session.save_attendance(attendance_data, date_str)
+        event_time = _event_time(date_str)
+        for name in sorted({str(name).strip() for name in attendance_data} - {""}):
+            self.rows.append({"event": str(date_str), "event_time": event_time, "player": name})
+
+    def save_statistics(self, stats_data, date_str, debug_screens=False):
+        self.session.save_statistics(stats_data, date_str, debug_screens)
+        event_time = _event_time(date_str)
+        for name, data in stats_data.items():
+            row = {"event": str(date_str), "event_time": event_time, "player": str(name).strip(),
+                   "class": data.get('class') or None}
+            for field in STAT_FIELDS:
+                row[field] = _int_or_none(data.get(field))
+            honor, kills, points = event_values(*(data.get(key) for key in STAT_FIELDS[:4]))
+            row.update(honor=_int_or_none(honor), kills=_int_or_none(kills), points=_int_or_none(points))
+            self.rows.append(row)
+
+    def commit(self):
+        committed = self.session.commit()
+        if not committed:
+            # Факты выгружаются только вместе с сохраненными событиями — иначе в выгрузке были бы события,
+            # которых нет в книге/базе
+            if self.rows:
+                self.exporter.logger.warning(f"Основное хранилище не сохранено: факты не выгружены (строк: {len(self.rows)})")
+            self.rows = []
+            return committed
+        try:
+            self.exporter.write_run(self.mode, self.rows)
+        except Exception as e:
+            self.exporter.logger.error(f"Ошибка выгрузки фактов: {e}")
+            import traceback
+            self.exporter.logger.error(traceback.format_exc())
+        self.rows = []
+        return committed
+
+
+def _schema(pa, mode):
+    fields = [("event", pa.string()), ("event_time", pa.timestamp("s")), ("player", pa.string())]
+    if mode == "statistics":
+        fields += [(field, pa.int64()) for field in STAT_FIELDS]
+        fields += [("class", pa.string()), ("honor", pa.int64()), ("kills", pa.int64()), ("points", pa.int64())]
+    return pa.schema(fields)
+
+
+def _event_time(date_str):
+    try:
+        return datetime.strptime(str(date_str), EVENT_TIME_FORMAT)
+    except ValueError:
+        return datetime.now().replace(microsecond=0)
+
+
+def _int_or_none(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
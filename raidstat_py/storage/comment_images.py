@@ -0,0 +1,193 @@
+import os
+import posixpath
+import zipfile
+import logging
+import xml.etree.ElementTree as ET
+
+# Картинка в фоне комментария задается только в VML-разметке комментариев (legacy drawing),
+# которую openpyxl генерирует сам и не позволяет настроить. Поэтому после сохранения книги
+# в VML-фигуры нужных комментариев дописывается заливка рисунком, а рисунки кладутся в xl/media.
+
+MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+REL_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+VML_NS = "urn:schemas-microsoft-com:vml"
+OFFICE_NS = "urn:schemas-microsoft-com:office:office"
+EXCEL_NS = "urn:schemas-microsoft-com:office:excel"
+
+VML_DRAWING_TYPE = REL_NS + "/vmlDrawing"
+IMAGE_TYPE = REL_NS + "/image"
+
+CONTENT_TYPES = {".png": "image/png", ".jpg": "image/jpeg", ".jpeg": "image/jpeg"}
+
+logger = logging.getLogger(__name__)
+
+
+def embed_comment_images(xlsx_path, sheet_name, images):
+    """
+    Делает рисунки фоном комментариев листа sheet_name в сохраненной книге xlsx_path.
+
+    Args:
+        images: {(строка, колонка): путь к PNG/JPEG или (расширение, данные) из read_comment_images}
+                (нумерация с 1). Комментарии в этих ячейках уже должны быть в книге.
+
+    Returns:
+        Число комментариев, получивших рисунок.
+    """
+    if not images:
+        return 0
+
+    with zipfile.ZipFile(xlsx_path) as zin:
+        parts = {name: zin.read(name) for name in zin.namelist()}
+
+    sheet_part = find_sheet_part(parts, sheet_name)
+    vml_part = _related_part(parts, sheet_part, VML_DRAWING_TYPE) if sheet_part else None
+    if not vml_part or vml_part not in parts:
+        logger.warning(f"В листе {sheet_name} нет комментариев для рисунков")
+        return 0
+
+    root = ET.fromstring(parts[vml_part])
+    relationships = []
+    base_name = posixpath.splitext(posixpath.basename(vml_part))[0]
+    extensions = set()
+    count = 0
+
+    for shape in root.iter(f"{{{VML_NS}}}shape"):
+        client_data = shape.find(f"{{{EXCEL_NS}}}ClientData")
+        if client_data is None:
+            continue
+        row = client_data.findtext(f"{{{EXCEL_NS}}}Row")
+        col = client_data.findtext(f"{{{EXCEL_NS}}}Column")
+        if row is None or col is None:
+            continue
+        image = images.get((int(row) + 1, int(col) + 1))
+        ext = (image[0] if isinstance(image, tuple) else os.path.splitext(image or "")[1]).lower()
+        if ext not in CONTENT_TYPES:
+            continue
+
+        count += 1
+        rel_id = f"rIdImg{count}"
+        media_name = f"{base_name}_image{count}{ext}"
+        if isinstance(image, tuple):
+            parts[f"xl/media/{media_name}"] = image[1]
+        else:
+            with open(image, 'rb') as f:
+                parts[f"xl/media/{media_name}"] = f.read()
+        extensions.add(ext)
+        relationships.append(f'<Relationship Id="{rel_id}" Type="{IMAGE_TYPE}" Target="../media/{media_name}"/>')
+
+        fill = shape.find(f"{{{VML_NS}}}fill")
+        if fill is None:
+            fill = ET.SubElement(shape, f"{{{VML_NS}}}fill")
+        fill.attrib.clear()
+        fill.attrib.update({
+            f"{{{OFFICE_NS}}}relid": rel_id,
+            f"{{{OFFICE_NS}}}title": "",
+            "recolor": "t",
+            "rotate": "t",
+            "type": "frame"
+        })
+
+    if not count:
+        return 0
+
+    # Без зарегистрированных префиксов ElementTree пишет ns0:/ns1:, а Excel ищет в VML именно v:, o:, x:
+    ET.register_namespace("v", VML_NS)
+    ET.register_namespace("o", OFFICE_NS)
+    ET.register_namespace("x", EXCEL_NS)
+    parts[vml_part] = ET.tostring(root)
+    parts[_rels_part(vml_part)] = (
+        f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+        f'<Relationships xmlns="{PKG_REL_NS}">{"".join(relationships)}</Relationships>'
+    ).encode('utf-8')
+    parts["[Content_Types].xml"] = _add_defaults(parts["[Content_Types].xml"], extensions)
+
+    tmp_path = xlsx_path + ".images"
+    with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as zout:
+        for name, data in parts.items():
+            zout.writestr(name, data)
+    os.replace(tmp_path, xlsx_path)
+    return count
+
+
+def read_comment_images(xlsx_path, sheet_name):
+    """
+    Рисунки комментариев листа sheet_name сохраненной книги (openpyxl при загрузке их теряет).
+
+    Returns:
+        {(строка, колонка): (расширение, данные)} — для embed_comment_images другой книги.
+    """
+    with zipfile.ZipFile(xlsx_path) as zin:
+        parts = {name: zin.read(name) for name in zin.namelist()}
+
+    sheet_part = find_sheet_part(parts, sheet_name)
+    vml_part = _related_part(parts, sheet_part, VML_DRAWING_TYPE) if sheet_part else None
+    if not vml_part or vml_part not in parts:
+        return {}
+
+    images = {}
+    for shape in ET.fromstring(parts[vml_part]).iter(f"{{{VML_NS}}}shape"):
+        client_data = shape.find(f"{{{EXCEL_NS}}}ClientData")
+        fill = shape.find(f"{{{VML_NS}}}fill")
+        if client_data is None or fill is None or not fill.get(f"{{{OFFICE_NS}}}relid"):
+            continue
+        row = client_data.findtext(f"{{{EXCEL_NS}}}Row")
+        col = client_data.findtext(f"{{{EXCEL_NS}}}Column")
+        media = _target_by_id(parts, vml_part, fill.get(f"{{{OFFICE_NS}}}relid"))
+        if row is None or col is None or media not in parts:
+            continue
+        images[(int(row) + 1, int(col) + 1)] = (posixpath.splitext(media)[1].lower(), parts[media])
+    return images
+
+
+def find_sheet_part(parts, sheet_name):
+    """Имя части (xl/worksheets/sheetN.xml) листа sheet_name; parts — {имя части: содержимое}."""
+    workbook = ET.fromstring(parts["xl/workbook.xml"])
+    for sheet in workbook.iter(f"{{{MAIN_NS}}}sheet"):
+        if sheet.get("name") == sheet_name:
+            return _target_by_id(parts, "xl/workbook.xml", sheet.get(f"{{{REL_NS}}}id"))
+    return None
+
+
+def _related_part(parts, part, rel_type):
+    rels = parts.get(_rels_part(part))
+    if not rels:
+        return None
+    for rel in ET.fromstring(rels):
+        if rel.get("Type") == rel_type:
+            return _resolve(part, rel.get("Target"))
+    return None
+
+
+def _target_by_id(parts, part, rel_id):
+    rels = parts.get(_rels_part(part))
+    if not rels:
+        return None
+    for rel in ET.fromstring(rels):
+        if rel.get("Id") == rel_id:
+            return _resolve(part, rel.get("Target"))
+    return None
+
+
+def _rels_part(part):
+    return posixpath.join(posixpath.dirname(part), "_rels", posixpath.basename(part) + ".rels")
+
+
+def _resolve(part, target):
+    # Цели связей бывают абсолютными (/xl/...) и относительными (от папки части)
+    if target.startswith("/"):
+        return target[1:]
+    return posixpath.normpath(posixpath.join(posixpath.dirname(part), target))
+
+
+def _add_defaults(content_types, extensions):
+    text = content_types.decode('utf-8')
+    existing = {d.get("Extension", "").lower() for d in ET.fromstring(content_types).iter(f"{{{CT_NS}}}Default")}
+    defaults = "".join(
+        f'<Default Extension="{ext[1:]}" ContentType="{CONTENT_TYPES[ext]}"/>'
+        for ext in sorted(extensions) if ext[1:] not in existing
+    )
+    # Типы по расширению вставляются сразу после открывающего тега <Types>
+    insert_at = text.index(">", text.index("<Types")) + 1
+    return (text[:insert_at] + defaults + text[insert_at:]).encode('utf-8')
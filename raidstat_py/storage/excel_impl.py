@@ -1,6 +1,6 @@
 from abc import ABC, abstractmethod
-import pandas as pd
 import os
+import json
 from datetime import datetime
 import logging
 import openpyxl
@@ -8,6 +8,137 @@ from openpyxl.utils.dataframe import dataframe_to_rows
 from openpyxl.comments import Comment
 from openpyxl.drawing.image import Image as XLImage
 import io
+from ..core.debug_sink import debug_image_exists, debug_image_path
+from .comment_images import embed_comment_images, read_comment_images
+from .cached_values import add_cached_values
+from .excel_writer import ExcelWriter
+from . import partitions
+from . import attendance_summary
+from .partitions import PARTITION_MODES, ROSTER_SHEET, SUMMARY_SHEET
+
+# Листы, из которых читается ростер
+ROSTER_SHEETS = {"statistics": "Статистика", "attendance": "Посещаемость"}
+
+FIXED_HEADERS = ["Хонор до", "Хонор после", "Фраги до", "Фраги после", "ГС", "Ник", "Класс"]
+# Первая колонка событий листа и префикс ее заголовка перед названием события
+EVENT_HEADERS = {"Посещаемость": (2, ""), "Статистика": (len(FIXED_HEADERS) + 1, "Хонор ")}
+
+# Масштаб изображений в комментариях (как при вставке через Excel)
+COMMENT_IMAGE_SCALE = 2
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def event_values(honor_start, honor_end, kills_start, kills_end):
+    """Значения колонок события (хонор, фраги, очки) — то же, что считают формулы события."""
+    honor = honor_end - honor_start if _is_number(honor_start) and _is_number(honor_end) else ""
+    kills = kills_end - kills_start if _is_number(kills_start) and _is_number(kills_end) else ""
+    points = kills * 70 + honor if _is_number(kills) and _is_number(honor) else ""
+    return honor, kills, points
+
+def event_formulas(row_idx, start_col):
+    """
+    Формулы колонок события (хонор, фраги, очки) в строке row_idx; колонки события начинаются с start_col.
+    Дельты считаются по колонкам A-D (Хонор до/после, Фраги до/после), очки = фраги * 70 + хонор.
+    IF и ISNUMBER — для корректной обработки пустых ячеек ("").
+    """
+    from openpyxl.utils import get_column_letter
+    col_res_honor = get_column_letter(start_col)
+    col_res_kills = get_column_letter(start_col + 1)
+    r = row_idx
+    return (
+        f'=IF(AND(ISNUMBER(A{r}), ISNUMBER(B{r})), B{r}-A{r}, "")',
+        f'=IF(AND(ISNUMBER(C{r}), ISNUMBER(D{r})), D{r}-C{r}, "")',
+        f'=IF(AND(ISNUMBER({col_res_kills}{r}), ISNUMBER({col_res_honor}{r})), {col_res_kills}{r}*70+{col_res_honor}{r}, "")'
+    )
+
+
+def formula_values(ws):
+    """
+    Значения формул событий листа 'Статистика', посчитанные в Python (как event_values):
+    {(строка, колонка): значение} для add_cached_values.
+    """
+    values = {}
+    first_col = len(FIXED_HEADERS) + 1
+    for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
+        computed = None
+        for col, value in enumerate(row[first_col - 1:], start=first_col):
+            if isinstance(value, str) and value.startswith('='):
+                if computed is None:
+                    computed = event_values(*row[:4])
+                values[(row_idx, col)] = computed[(col - first_col) % 3]
+    return values
+
+
+def write_export(path, source):
+    """
+    Потоковая выгрузка книги в раскладке Raidstat.xlsx (листы "Посещаемость", "Статистика", "Сводка")
+    в режиме openpyxl write_only: строки берутся из источника по одной и сразу пишутся в файл,
+    поэтому память не зависит от длины истории.
+
+    source — источник данных (например, SqliteStorage.export_source):
+        attendance_events()   — названия рейдов по порядку
+        attendance_rows()     — итератор (ник, [1/0/None по рейдам])
+        attendance_presence() — итератор (название рейда, множество присутствовавших) для сводки
+        statistics_events()   — названия событий статистики по порядку
+        statistics_rows()     — итератор ([7 фиксированных колонок], [хонор, фраги, очки по событиям])
+                                в порядке сортировки листа (по очкам последнего события)
+    У последнего события, как в Raidstat.xlsx, вместо значений пишутся формулы от колонок A-D.
+    """
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.utils import get_column_letter
+
+    wb = openpyxl.Workbook(write_only=True)
+
+    ws = wb.create_sheet("Посещаемость")
+    ws.append(["Ник"] + list(source.attendance_events()))
+    for name, values in source.attendance_rows():
+        ws.append([name] + list(values))
+
+    ws = wb.create_sheet("Статистика")
+    events = list(source.statistics_events())
+    last_col = len(FIXED_HEADERS) + 3 * len(events)
+    # Размеры колонок в write_only задаются до строк: скрываем все события, кроме последнего
+    for col in range(len(FIXED_HEADERS) + 1, last_col - 2):
+        ws.column_dimensions[get_column_letter(col)].hidden = True
+    headers = list(FIXED_HEADERS)
+    for title in events:
+        headers += [f"Хонор {title}", f"Фраги {title}", "Очки"]
+    ws.append(headers)
+    row_idx = 1
+    cached = {}
+    for fixed, values in source.statistics_rows():
+        row_idx += 1
+        values = list(values)
+        fixed = [v if v is not None else "" for v in fixed]
+        if events and any(v is not None for v in values[-3:]):
+            values[-3:] = event_formulas(row_idx, last_col - 2)
+            for offset, value in enumerate(event_values(*fixed[:4])):
+                cached[(row_idx, last_col - 2 + offset)] = value
+        ws.append(fixed + values)
+    if row_idx > 1:
+        ws.auto_filter.ref = f"A1:{get_column_letter(last_col)}{row_idx}"
+
+    ws = wb.create_sheet(attendance_summary.SUMMARY_SHEET)
+    state = attendance_summary.build_state(source.attendance_presence())
+    attendance_summary.format_sheet(ws, len(state))
+    ws.append(attendance_summary.SUMMARY_HEADERS)
+    for row in attendance_summary.summary_rows(state, attendance_summary.latest_date(state)):
+        percent = WriteOnlyCell(ws, value=row[3])
+        percent.number_format = attendance_summary.PERCENT_FORMAT
+        ws.append(row[:3] + [percent] + row[4:])
+
+    tmp_path = path + ".tmp"
+    try:
+        wb.save(tmp_path)
+        add_cached_values(tmp_path, "Статистика", cached)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
 
 class StorageInterface(ABC):
     @abstractmethod
@@ -26,9 +157,17 @@ class StorageInterface(ABC):
         pass
 
 class ExcelStorage(StorageInterface):
-    def __init__(self, file_path="Raidstat.xlsx"):
+    def __init__(self, file_path="Raidstat.xlsx", use_com=False, partition="off"):
         self.file_path = file_path
+        # Оформление листа статистики через Excel (COM) вместо openpyxl
+        self.use_com = use_com
+        # Разбиение истории по периодам: off, month, season (см. partitions)
+        self.partition = partition
         self.logger = logging.getLogger(__name__)
+        # Кеш ростера: {source: ((путь, mtime, размер), множество ников)}
+        self._roster_cache = {}
+        # Все изменения книги проходят через одну очередь записи (см. ExcelWriter)
+        self.writer = ExcelWriter(self)
         self._ensure_file_exists()
 
     def _ensure_file_exists(self):
@@ -42,8 +181,7 @@ class ExcelStorage(StorageInterface):
             
             # Лист Статистика
             ws_stat = wb.create_sheet("Статистика")
-            fixed_headers = ["Хонор до", "Хонор после", "Фраги до", "Фраги после", "ГС", "Ник", "Класс"]
-            for i, header in enumerate(fixed_headers, start=1):
+            for i, header in enumerate(FIXED_HEADERS, start=1):
                 ws_stat.cell(row=1, column=i, value=header)
                 
             if "Sheet" in wb.sheetnames:
@@ -52,105 +190,341 @@ class ExcelStorage(StorageInterface):
             self.logger.info(f"Создан новый файл {self.file_path} с заголовками по умолчанию")
 
     def get_roster(self, source="statistics"):
-        names = set()
+        """
+        Список ников из листа "Статистика" (source="statistics") или "Посещаемость" (source="attendance").
+
+        Результат кешируется по пути, времени изменения и размеру файла: пока файл не менялся
+        (или менялся только через этот же ExcelStorage), повторный вызов не читает книгу.
+        """
         try:
             if not os.path.exists(self.file_path):
                 return []
 
-            # Используем ExcelFile для оптимизации проверки листов с контекстным менеджером
-            with pd.ExcelFile(self.file_path) as xls:
-                # 1. Имена из статистики
-                if source == "statistics" and "Статистика" in xls.sheet_names:
-                    df = pd.read_excel(xls, sheet_name="Статистика")
-                    if not df.empty and 'Ник' in df.columns:
-                        # Нормализуем имена: убираем пробелы и приводим к строке
-                        current_names = df['Ник'].dropna().astype(str).str.strip().tolist()
-                        names.update(current_names)
-                
-                # 2. Имена из посещаемости
-                elif source == "attendance" and "Посещаемость" in xls.sheet_names:
-                    df = pd.read_excel(xls, sheet_name="Посещаемость")
-                    if not df.empty:
-                        # Пытаемся найти колонку 'Ник', иначе используем первую
-                        col_name = 'Ник' if 'Ник' in df.columns else df.columns[0]
-                        current_names = df[col_name].dropna().astype(str).str.strip().tolist()
-                        # Отфильтровываем возможные синонимы заголовка или пустые строки, если определение заголовка не удалось
-                        names.update([n for n in current_names if n.lower() != 'ник'])
-
-            # Удаляем пустые строки
-            names.discard("")
+            stamp = self._file_stamp()
+            cached = self._roster_cache.get(source)
+            if cached and cached[0] == stamp:
+                return list(cached[1])
+
+            names = self._read_roster(source)
+            self._roster_cache[source] = (stamp, names)
             return list(names)
 
         except Exception as e:
             self.logger.error(f"Ошибка при чтении ростера: {e}")
             return []
 
-    def save_attendance(self, attendance_data, date_str):
+    def _file_stamp(self):
+        st = os.stat(self.file_path)
+        return (os.path.abspath(self.file_path), st.st_mtime_ns, st.st_size)
+
+    def _read_roster(self, source):
         """
-        attendance_data: Список присутствующих имен.
+        Читает только колонку "Ник" нужного листа в потоковом режиме openpyxl (read_only),
+        не разбирая колонки событий.
         """
+        sheet_name = ROSTER_SHEETS.get(source)
+        names = set()
+        wb = openpyxl.load_workbook(self.file_path, read_only=True)
         try:
-            # Используем openpyxl напрямую для добавления колонок без перезаписи/потери форматирования
-            if not os.path.exists(self.file_path):
-                self._ensure_file_exists()
+            if self.partitioned and ROSTER_SHEET in wb.sheetnames:
+                # Основная книга хранит только текущий период — полный ростер ведется в отдельном листе
+                return partitions.read_roster(wb[ROSTER_SHEET], source)
+            if sheet_name not in wb.sheetnames:
+                return names
+            ws = wb[sheet_name]
 
-            wb = openpyxl.load_workbook(self.file_path)
-            
-            if "Посещаемость" not in wb.sheetnames:
-                ws = wb.create_sheet("Посещаемость")
+            header = next(ws.iter_rows(min_row=1, max_row=1, values_only=True), None) or ()
+            header = [str(value).strip() if value is not None else "" for value in header]
+            if "Ник" in header:
+                col = header.index("Ник") + 1
+            elif source == "attendance" and header:
+                # Нет заголовка 'Ник' — ники в первой колонке
+                col = 1
             else:
-                ws = wb["Посещаемость"]
+                return names
 
-            # Привязываем существующие имена к строкам (колонка 1)
-            name_to_row = {}
-            max_row = ws.max_row
-            
-            # Проверяем, существует ли заголовок "Ник"
-            if ws.cell(row=1, column=1).value != "Ник":
-                ws.cell(row=1, column=1, value="Ник")
-
-            # Собираем существующие имена
-            for row in range(2, max_row + 1):
-                cell_val = ws.cell(row=row, column=1).value
-                if cell_val:
-                    name_to_row[str(cell_val).strip()] = row
-            
-            # Находим следующую свободную колонку
-            # max_column — последняя колонка с данными.
-            next_col = ws.max_column + 1
-            
-            # Записываем заголовок даты
-            ws.cell(row=1, column=next_col, value=str(date_str))
-            
-            # Инициализируем 0 для всех существующих участников
-            for row_idx in name_to_row.values():
-                 ws.cell(row=row_idx, column=next_col, value=0)
-            
-            # Записываем посещаемость
-            for name in attendance_data:
-                name = str(name).strip()
+            for (value,) in ws.iter_rows(min_row=2, min_col=col, max_col=col, values_only=True):
+                if value is None:
+                    continue
+                # Нормализуем имена: убираем пробелы и приводим к строке
+                name = str(value).strip()
+                # Отфильтровываем возможные синонимы заголовка
+                if source == "attendance" and name.lower() == 'ник':
+                    continue
+                names.add(name)
+        finally:
+            wb.close()
+
+        # Удаляем пустые строки
+        names.discard("")
+        return names
+
+    def _update_roster_cache(self, source, names):
+        """
+        Обновляет кеш ростера после записи в книгу: ники листа source заменяются записанными,
+        кеш другого листа (его содержимое не менялось) привязывается к новому времени изменения файла.
+        """
+        try:
+            stamp = self._file_stamp()
+        except OSError:
+            self._roster_cache.clear()
+            return
+        names = {str(name).strip() for name in names}
+        names.discard("")
+        for other, (_, other_names) in list(self._roster_cache.items()):
+            self._roster_cache[other] = (stamp, other_names)
+        self._roster_cache[source] = (stamp, names)
+
+    @property
+    def partitioned(self):
+        return self.partition in PARTITION_MODES
+
+    def partition_path(self, key):
+        """Книга закрытого периода: Raidstat_2024-05.xlsx рядом с основной."""
+        base, ext = os.path.splitext(self.file_path)
+        return f"{base}_{key}{ext}"
+
+    def _prepare_partition(self, wb, sheet_name, date_str):
+        """
+        Перед записью события в режиме разбиения: создает листы итогов и ростера (однократно)
+        и, если событие относится к более позднему периоду, переносит лист в книгу его периода.
+        """
+        if SUMMARY_SHEET not in wb.sheetnames or ROSTER_SHEET not in wb.sheetnames:
+            self._seed_partition_sheets(wb)
+
+        if sheet_name not in wb.sheetnames:
+            return
+        ws = wb[sheet_name]
+        new_key = partitions.partition_key(date_str, self.partition)
+        current_key = partitions.sheet_partition(ws, *EVENT_HEADERS[sheet_name], self.partition)
+        if not new_key or not current_key or new_key <= current_key:
+            # Поздние события прошлых периодов пишутся в текущий
+            return
+
+        if sheet_name == "Статистика":
+            self._freeze_event_formulas(ws)
+        comment_images = None
+        if os.path.exists(self.file_path):
+            try:
+                # Рисунки комментариев есть только в сохраненной книге: openpyxl их не загружает
+                comment_images = read_comment_images(self.file_path, sheet_name)
+            except Exception as e:
+                self.logger.warning(f"Не удалось прочитать рисунки комментариев листа {sheet_name}: {e}")
+        path = self.partition_path(current_key)
+        partitions.archive_sheet(ws, path, comment_images)
+
+        index = wb.sheetnames.index(sheet_name)
+        wb.remove(ws)
+        ws = wb.create_sheet(sheet_name, index)
+        ws.append(FIXED_HEADERS if sheet_name == "Статистика" else ["Ник"])
+        self.logger.info(f"Лист {sheet_name} за период {current_key} перенесен в {path}")
+
+    def _seed_partition_sheets(self, wb):
+        """
+        Итоги и ростер по уже записанной истории — при первом включении разбиения.
+        Посещения в итогах берутся из сводки посещаемости (см. partitions.set_attendance).
+        """
+        attendance_names, statistics_names = set(), set()
+        totals = {}
+
+        if "Посещаемость" in wb.sheetnames:
+            for (name,) in wb["Посещаемость"].iter_rows(min_row=2, max_col=1, values_only=True):
+                name = str(name).strip() if name is not None else ""
+                if not name or name.lower() == 'ник':
+                    continue
+                attendance_names.add(name)
+                totals.setdefault(name, [0, None, 0, 0, 0, 0, None])
+
+        if "Статистика" in wb.sheetnames:
+            ws = wb["Статистика"]
+            headers = [cell.value for cell in ws[1]]
+            first_col = EVENT_HEADERS["Статистика"][0]
+            for row in ws.iter_rows(min_row=2, values_only=True):
+                name = str(row[5]).strip() if len(row) > 5 and row[5] is not None else ""
                 if not name:
                     continue
-                    
-                if name in name_to_row:
-                    row_idx = name_to_row[name]
-                    ws.cell(row=row_idx, column=next_col, value=1)
-                else:
-                    # Добавляем новое имя в конец
-                    new_row = ws.max_row + 1
-                    # Двойная проверка, чтобы не перезаписать (логика max_row обрабатывает это)
-                    ws.cell(row=new_row, column=1, value=name)
-                    ws.cell(row=new_row, column=next_col, value=1)
-                    name_to_row[name] = new_row
-            
-            wb.save(self.file_path)
-            self.logger.info(f"Сохранена колонка посещаемости: {date_str} (Всего участников: {len(attendance_data)})")
+                statistics_names.add(name)
+                total = totals.setdefault(name, [0, None, 0, 0, 0, 0, None])
+                for col in range(first_col - 1, len(row) - 2, 3):
+                    values = row[col:col + 3]
+                    if all(v is None for v in values):
+                        continue
+                    if any(isinstance(v, str) and v.startswith('=') for v in values):
+                        values = event_values(*row[:4])
+                    total[2] += 1
+                    for i, value in enumerate(values):
+                        if _is_number(value):
+                            total[3 + i] += value
+                    header = headers[col] if col < len(headers) else None
+                    total[6] = header[len("Хонор "):] if isinstance(header, str) else None
+
+        if SUMMARY_SHEET not in wb.sheetnames:
+            partitions.seed_summary(wb, totals)
+            if attendance_summary.SUMMARY_SHEET in wb.sheetnames:
+                state = attendance_summary.read_state(wb[attendance_summary.SUMMARY_SHEET])
+            else:
+                state = attendance_summary.rebuild_summary(wb, self._attendance_columns(wb))
+            partitions.set_attendance(wb, attendance_summary.attended(state))
+        if ROSTER_SHEET not in wb.sheetnames:
+            partitions.seed_roster(wb, attendance_names, statistics_names)
+
+    def open_session(self, mode):
+        """Сессия записи на один запуск обработки (см. ExcelSession)."""
+        return ExcelSession(self, mode)
+
+    def load_workbook(self, data_only=False):
+        if not os.path.exists(self.file_path):
+            self._ensure_file_exists()
+        return openpyxl.load_workbook(self.file_path, data_only=data_only)
+
+    def write_workbook(self, wb, comment_images=None):
+        """
+        Атомарная запись книги: сохраняется во временный файл рядом и заменяет исходный (os.replace),
+        поэтому при сбое во время записи Raidstat.xlsx остается целым.
+        comment_images — {(строка, колонка): путь} изображений для комментариев листа 'Статистика'.
+        """
+        tmp_path = self.file_path + ".tmp"
+        try:
+            wb.save(tmp_path)
+            if "Статистика" in wb.sheetnames:
+                # Значения формул рядом с формулами — для читателей без пересчета (pandas, data_only)
+                add_cached_values(tmp_path, "Статистика", formula_values(wb["Статистика"]))
+            if comment_images:
+                try:
+                    count = embed_comment_images(tmp_path, "Статистика", comment_images)
+                    self.logger.info(f"Комментарии с изображениями: {count}")
+                except Exception as e:
+                    self.logger.error(f"Ошибка добавления изображений в комментарии: {e}")
+            os.replace(tmp_path, self.file_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def commit_workbook(self, wb, points_col=None, comment_images=None):
+        """
+        Сохраняет книгу. Если в нее добавлено событие статистики (points_col — колонка "Очки"),
+        лист оформляется: без Excel до сохранения (finish_statistics) или через COM после него (use_com).
+        """
+        if points_col and not self.use_com:
+            self.write_workbook(wb, self.finish_statistics(wb, points_col, comment_images))
+            return
+        self.write_workbook(wb)
+        if points_col:
+            # COM нужен для корректной сортировки по формулам и вставки изображений средствами Excel
+            self._apply_com_operations(comment_images, points_col)
+
+    def save_attendance(self, attendance_data, date_str):
+        """
+        attendance_data: Список присутствующих имен.
+        """
+        try:
+            # Используем openpyxl напрямую для добавления колонок без перезаписи/потери форматирования
+            if self.writer.write([("attendance", [list(attendance_data), date_str])]):
+                self.logger.info(f"Сохранена колонка посещаемости: {date_str} (Всего участников: {len(attendance_data)})")
                 
         except Exception as e:
             self.logger.error(f"Ошибка при сохранении посещаемости: {e}")
             import traceback
             self.logger.error(traceback.format_exc())
 
+    def apply_attendance(self, wb, attendance_data, date_str):
+        """
+        Добавляет колонку посещаемости date_str в загруженную книгу (без сохранения).
+        Возвращает ники листа "Посещаемость" (в режиме разбиения — все ники посещаемости из ростера).
+        """
+        if self.partitioned:
+            self._prepare_partition(wb, "Посещаемость", date_str)
+        if attendance_summary.SUMMARY_SHEET not in wb.sheetnames:
+            # Сводки еще нет (книга старой версии) — однократно строим по истории до нового рейда
+            attendance_summary.rebuild_summary(wb, self._attendance_columns(wb))
+
+        if "Посещаемость" not in wb.sheetnames:
+            ws = wb.create_sheet("Посещаемость")
+        else:
+            ws = wb["Посещаемость"]
+
+        # Привязываем существующие имена к строкам (колонка 1)
+        name_to_row = {}
+        max_row = ws.max_row
+        
+        # Проверяем, существует ли заголовок "Ник"
+        if ws.cell(row=1, column=1).value != "Ник":
+            ws.cell(row=1, column=1, value="Ник")
+
+        # Собираем существующие имена
+        for row in range(2, max_row + 1):
+            cell_val = ws.cell(row=row, column=1).value
+            if cell_val:
+                name_to_row[str(cell_val).strip()] = row
+        
+        # Находим следующую свободную колонку
+        # max_column — последняя колонка с данными.
+        next_col = ws.max_column + 1
+        
+        # Записываем заголовок даты
+        ws.cell(row=1, column=next_col, value=str(date_str))
+        
+        # Инициализируем 0 для всех существующих участников
+        for row_idx in name_to_row.values():
+             ws.cell(row=row_idx, column=next_col, value=0)
+        
+        # Записываем посещаемость
+        for name in attendance_data:
+            name = str(name).strip()
+            if not name:
+                continue
+                
+            if name in name_to_row:
+                row_idx = name_to_row[name]
+                ws.cell(row=row_idx, column=next_col, value=1)
+            else:
+                # Добавляем новое имя в конец
+                new_row = ws.max_row + 1
+                # Двойная проверка, чтобы не перезаписать (логика max_row обрабатывает это)
+                ws.cell(row=new_row, column=1, value=name)
+                ws.cell(row=new_row, column=next_col, value=1)
+                name_to_row[name] = new_row
+
+        state = attendance_summary.update_summary(wb, attendance_data, date_str)
+        if self.partitioned:
+            partitions.set_attendance(wb, attendance_summary.attended(state))
+            return partitions.update_roster(wb, "attendance", attendance_data)
+        return set(name_to_row)
+
+    def rebuild_attendance_summary(self):
+        """
+        Пересчитывает лист "Сводка" по всей истории посещаемости (в режиме разбиения — вместе с книгами
+        закрытых периодов). Нужен для восстановления сводки после ручной правки листа "Посещаемость".
+        """
+        try:
+            if not self.writer.write([("rebuild_summary", [])]):
+                return False
+            self.logger.info("Сводка посещаемости пересчитана")
+            return True
+        except Exception as e:
+            self.logger.error(f"Ошибка пересчета сводки посещаемости: {e}")
+            import traceback
+            self.logger.error(traceback.format_exc())
+            return False
+
+    def rebuild_summary_sheet(self, wb):
+        state = attendance_summary.rebuild_summary(wb, self._attendance_columns(wb))
+        if self.partitioned and SUMMARY_SHEET in wb.sheetnames:
+            # Посещения в итогах — производные сводки
+            partitions.set_attendance(wb, attendance_summary.attended(state))
+
+    def _attendance_columns(self, wb):
+        """Колонки посещаемости по порядку: (название рейда, {ник: 1/0/None})."""
+        for path in partitions.partition_paths(self.file_path) if self.partitioned else []:
+            archive = openpyxl.load_workbook(path, read_only=True)
+            try:
+                if "Посещаемость" in archive.sheetnames:
+                    yield from _sheet_columns(archive["Посещаемость"])
+            finally:
+                archive.close()
+        if "Посещаемость" in wb.sheetnames:
+            yield from _sheet_columns(wb["Посещаемость"])
+
     def save_statistics(self, stats_data, date_str, debug_screens=False):
         """
         stats_data: Словарь {имя: {kills: int, honor: int, gear: int, class: str, ...}}
@@ -161,144 +535,134 @@ class ExcelStorage(StorageInterface):
         Если debug_screens=True, добавляет отладочные изображения как комментарии к ячейкам.
         """
         try:
-            if not os.path.exists(self.file_path):
-                self._ensure_file_exists()
-            
-            # Загружаем с data_only=True, чтобы "заморозить" значения из предыдущих запусков.
-            # Это критично, так как колонки 1-7 (Начало/Конец) общие/перезаписываются для каждого события.
-            # Только НОВОЕ событие должно иметь активные формулы, указывающие на эти общие колонки.
-            # Старые события должны быть заморожены до статических значений для сохранения их истории.
-            wb = openpyxl.load_workbook(self.file_path, data_only=True)
-
-            if "Статистика" not in wb.sheetnames:
-                ws = wb.create_sheet("Статистика")
-            else:
-                ws = wb["Статистика"]
+            # Колонки 1-7 (Начало/Конец) общие и перезаписываются для каждого события, поэтому
+            # только НОВОЕ событие имеет формулы, указывающие на них. Формулы предыдущего события
+            # заменяются значениями при записи (apply_statistics -> _freeze_event_formulas).
+            self.writer.write([("statistics", [stats_data, date_str, debug_screens])])
+
+        except Exception as e:
+            self.logger.error(f"Ошибка при сохранении статистики: {e}")
+            import traceback
+            self.logger.error(traceback.format_exc())
+
+    def apply_statistics(self, wb, stats_data, date_str, debug_screens=False):
+        """
+        Добавляет событие в лист 'Статистика' загруженной книги (без сохранения).
+        Возвращает (номер колонки "Очки" нового события, ники листа; в режиме разбиения — ники из ростера).
+        Изображения для комментариев (debug_screens) собираются при сохранении — см. collect_debug_comments.
+        """
+        if self.partitioned:
+            self._prepare_partition(wb, "Статистика", date_str)
+
+        if "Статистика" not in wb.sheetnames:
+            ws = wb.create_sheet("Статистика")
+        else:
+            ws = wb["Статистика"]
+
+        # Формулы предыдущего события этой же книги ссылаются на колонки 1-4, которые сейчас перезапишутся
+        self._freeze_event_formulas(ws)
 
-            # Удаляем все комментарии в первых 7 колонках, чтобы избавиться от 
-            # "висячих" подсказок с пустыми областями от предыдущих запусков
-            for row in ws.iter_rows(min_col=1, max_col=7):
-                for cell in row:
-                    cell.comment = None
+        # Удаляем все комментарии в первых 7 колонках, чтобы избавиться от 
+        # "висячих" подсказок с пустыми областями от предыдущих запусков
+        for row in ws.iter_rows(min_col=1, max_col=7):
+            for cell in row:
+                cell.comment = None
 
-            # Фиксированные заголовки: Хонор до, Хонор после, Фраги до, Фраги после, ГС, Ник, Класс
-            fixed_headers = ["Хонор до", "Хонор после", "Фраги до", "Фраги после", "ГС", "Ник", "Класс"]
+        # Фиксированные заголовки: Хонор до, Хонор после, Фраги до, Фраги после, ГС, Ник, Класс
+        # Проверяем, есть ли заголовки. Если нет - записываем.
+        first_cell = ws.cell(row=1, column=1).value
+        if not first_cell or first_cell != FIXED_HEADERS[0]:
+            for i, header in enumerate(FIXED_HEADERS, start=1):
+                ws.cell(row=1, column=i, value=header)
+
+        # Определяем начальную колонку для нового события
+        # Она должна быть после последней колонки.
+        start_col = ws.max_column + 1
+        
+        # Добавляем заголовки нового события
+        # "Хонор " + дата, "Фраги " + дата, "Очки"
+        new_headers = [f"Хонор {date_str}", f"Фраги {date_str}", "Очки"]
+        
+        ws.cell(row=1, column=start_col, value=new_headers[0])
+        ws.cell(row=1, column=start_col+1, value=new_headers[1])
+        ws.cell(row=1, column=start_col+2, value=new_headers[2])
+
+        # Мапим имена на номера строк
+        name_to_row = {}
+        for i, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
+            # Ник в колонке 6 (индекс 5)
+            if len(row) > 5:
+                name = row[5]  # Колонка 6 (Ник)
+                if name:
+                    name_to_row[str(name)] = i
+
+        # Обновляем/добавляем данные
+        for name, data in stats_data.items():
+            row_idx = name_to_row.get(name)
             
-            # Проверяем, есть ли заголовки. Если нет - записываем.
-            first_cell = ws.cell(row=1, column=1).value
-            if not first_cell or first_cell != fixed_headers[0]:
-                for i, header in enumerate(fixed_headers, start=1):
-                    ws.cell(row=1, column=i, value=header)
-
-            # Определяем начальную колонку для нового события
-            # Она должна быть после последней колонки.
-            start_col = ws.max_column + 1
+            if not row_idx:
+                # Добавляем новую строку
+                row_idx = ws.max_row + 1
+                ws.cell(row=row_idx, column=6, value=name)  # Ник в колонке 6
             
-            # Добавляем заголовки нового события
-            # "Хонор " + дата, "Фраги " + дата, "Очки"
-            new_headers = [f"Хонор {date_str}", f"Фраги {date_str}", "Очки"]
+            # Обновляем статические колонки (ПЕРЕЗАПИСЫВАЮТСЯ при каждом вызове)
+            # Колонка 1: Хонор до (A)
+            val = data.get('honor_start')
+            ws.cell(row=row_idx, column=1, value=val if val is not None else "")
+            # Колонка 2: Хонор после (B)
+            val = data.get('honor_end')
+            ws.cell(row=row_idx, column=2, value=val if val is not None else "")
+            # Колонка 3: Фраги до (C)
+            val = data.get('kills_start')
+            ws.cell(row=row_idx, column=3, value=val if val is not None else "")
+            # Колонка 4: Фраги после (D)
+            val = data.get('kills_end')
+            ws.cell(row=row_idx, column=4, value=val if val is not None else "")
             
-            ws.cell(row=1, column=start_col, value=new_headers[0])
-            ws.cell(row=1, column=start_col+1, value=new_headers[1])
-            ws.cell(row=1, column=start_col+2, value=new_headers[2])
-
-            # Мапим имена на номера строк
-            name_to_row = {}
-            for i, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
-                # Ник в колонке 6 (индекс 5)
-                if len(row) > 5:
-                    name = row[5]  # Колонка 6 (Ник)
-                    if name:
-                        name_to_row[str(name)] = i
-
-            from openpyxl.utils import get_column_letter
-
-            # Обновляем/добавляем данные
-            for name, data in stats_data.items():
-                row_idx = name_to_row.get(name)
-                
-                if not row_idx:
-                    # Добавляем новую строку
-                    row_idx = ws.max_row + 1
-                    ws.cell(row=row_idx, column=6, value=name)  # Ник в колонке 6
-                
-                # Обновляем статические колонки (ПЕРЕЗАПИСЫВАЮТСЯ при каждом вызове)
-                # Колонка 1: Хонор до (A)
-                val = data.get('honor_start')
-                ws.cell(row=row_idx, column=1, value=val if val is not None else "")
-                # Колонка 2: Хонор после (B)
-                val = data.get('honor_end')
-                ws.cell(row=row_idx, column=2, value=val if val is not None else "")
-                # Колонка 3: Фраги до (C)
-                val = data.get('kills_start')
-                ws.cell(row=row_idx, column=3, value=val if val is not None else "")
-                # Колонка 4: Фраги после (D)
-                val = data.get('kills_end')
-                ws.cell(row=row_idx, column=4, value=val if val is not None else "")
-                
-                # Колонка 5: ГС (E)
-                val = data.get('gear')
-                ws.cell(row=row_idx, column=5, value=val if val is not None else "")
-                # Колонка 6: Ник (F) (уже установлен выше)
-                # Колонка 7: Класс (G)
-                ws.cell(row=row_idx, column=7, value=data.get('class', ''))
-                
-                # Обновляем колонки события (дельты!) - ДОБАВЛЯЮТСЯ В КОНЕЦ
-                # Вместо статических значений пишем формулы для автоматического пересчета
-                
-                # Координаты ячеек для формулы
-                # A=1, B=2, C=3, D=4
-                col_hon_start = "A" # Хонор до
-                col_hon_end = "B"   # Хонор после
-                col_kills_start = "C" # Фраги до
-                col_kills_end = "D"   # Фраги после
-                
-                # Колонки для результата
-                col_res_honor = get_column_letter(start_col)
-                col_res_kills = get_column_letter(start_col+1)
-                # col_res_points = get_column_letter(start_col+2)
-
-                # Формула Хонор Дельта = B - A
-                # Используем IF и ISNUMBER для корректной обработки пустых ячеек ("")
-                formula_honor = f'=IF(AND(ISNUMBER({col_hon_start}{row_idx}), ISNUMBER({col_hon_end}{row_idx})), {col_hon_end}{row_idx}-{col_hon_start}{row_idx}, "")'
-                ws.cell(row=row_idx, column=start_col, value=formula_honor)
-                
-                # Формула Фраги Дельта = D - C
-                formula_kills = f'=IF(AND(ISNUMBER({col_kills_start}{row_idx}), ISNUMBER({col_kills_end}{row_idx})), {col_kills_end}{row_idx}-{col_kills_start}{row_idx}, "")'
-                ws.cell(row=row_idx, column=start_col+1, value=formula_kills)
-                
-                # Формула Очки = Фраги * 70 + Хонор
-                # Ссылаемся на только что созданные ячейки дельт
-                formula_points = f'=IF(AND(ISNUMBER({col_res_kills}{row_idx}), ISNUMBER({col_res_honor}{row_idx})), {col_res_kills}{row_idx}*70+{col_res_honor}{row_idx}, "")'
-                ws.cell(row=row_idx, column=start_col+2, value=formula_points)
-                
-                # Добавляем отладочные изображения как комментарии (если debug_screens=True)
-                if debug_screens:
-                    # Проверяем наличие скриншотов (start или end)
-                    if data.get('debug_images_start') or data.get('debug_images_end'):
-                        self._add_debug_images_comment(ws, row_idx, data, name)
+            # Колонка 5: ГС (E)
+            val = data.get('gear')
+            ws.cell(row=row_idx, column=5, value=val if val is not None else "")
+            # Колонка 6: Ник (F) (уже установлен выше)
+            # Колонка 7: Класс (G)
+            ws.cell(row=row_idx, column=7, value=data.get('class', ''))
+            
+            # Обновляем колонки события (дельты!) - ДОБАВЛЯЮТСЯ В КОНЕЦ
+            # Вместо статических значений пишем формулы для автоматического пересчета
+            for offset, formula in enumerate(event_formulas(row_idx, start_col)):
+                ws.cell(row=row_idx, column=start_col + offset, value=formula)
 
-            # Применяем автофильтр и сортировку
-            self._apply_autofilter_and_sort(ws, start_col + 2)  # Колонка "Очки"
+        # Применяем автофильтр и сортировку
+        self._apply_autofilter_and_sort(ws, start_col + 2)  # Колонка "Очки"
 
-            # Получаем список изображений для комментариев до сохранения
-            comment_images = getattr(wb, '_debug_comment_images', None)
-            
-            wb.save(self.file_path)
-            
-            # После сохранения openpyxl — применяем сортировку и изображения через COM
-            # (COM нужен для корректной сортировки по формулам и вставки изображений)
-            self._apply_com_operations(comment_images, start_col + 2)  # start_col+2 = колонка "Очки"
+        if self.partitioned:
+            partitions.add_statistics(wb, {
+                name: event_values(*(data.get(key) for key in ('honor_start', 'honor_end', 'kills_start', 'kills_end')))
+                for name, data in stats_data.items()
+            }, date_str)
+            return start_col + 2, partitions.update_roster(wb, "statistics", stats_data)
+        return start_col + 2, set(name_to_row) | set(stats_data)
+
+    def _freeze_event_formulas(self, ws):
+        """
+        Заменяет формулы последнего события значениями, вычисленными по текущим колонкам 1-4.
+        Значения считаются в Python, а не берутся из файла: openpyxl без Excel значения формул
+        не вычисляет, и в старых книгах их может не быть вовсе.
+        """
+        points_col = ws.max_column
+        if points_col < 10 or ws.cell(row=1, column=points_col).value != "Очки":
+            return
+
+        for row in ws.iter_rows(min_row=2, max_col=points_col):
+            event_cells = row[points_col - 3:points_col]
+            if not any(isinstance(c.value, str) and c.value.startswith('=') for c in event_cells):
+                continue
+            for cell, value in zip(event_cells, event_values(*(c.value for c in row[:4]))):
+                cell.value = value
 
-        except Exception as e:
-            self.logger.error(f"Ошибка при сохранении статистики: {e}")
-            import traceback
-            self.logger.error(traceback.format_exc())
-    
     def _apply_autofilter_and_sort(self, ws, points_col):
         """
         Применяет автофильтр ко всем колонкам.
-        Сортировка выполняется через COM после сохранения файла.
+        Сортировка выполняется в finish_statistics (или через COM после сохранения файла).
         
         points_col: номер колонки с полем "Очки" (1-indexed) - не используется здесь
         """
@@ -316,19 +680,94 @@ class ExcelStorage(StorageInterface):
         # Устанавливаем автофильтр
         ws.auto_filter.ref = filter_range
     
-    def _add_debug_images_comment(self, ws, row_idx, data, name):
+    def finish_statistics(self, wb, points_col, comment_images):
+        """
+        Оформление листа 'Статистика' средствами openpyxl, без Excel (то же, что _apply_com_operations):
+        1. Скрытие старых колонок статистики
+        2. Сортировка по колонке "Очки": числа по убыванию, пустые внизу; очки считаются в Python,
+           формулы перемещенных строк переводятся на новую строку (Translator)
+        3. Комментарии для изображений (привязка по имени после сортировки)
+
+        Вызывается до сохранения книги. Возвращает {(строка, колонка): путь к изображению}
+        для embed_comment_images после сохранения.
+        """
+        from openpyxl.formula.translate import Translator
+        from openpyxl.utils import get_column_letter
+
+        images = {}
+        try:
+            ws = wb["Статистика"]
+
+            # === 1. СКРЫТИЕ СТАРЫХ КОЛОНОК ===
+            hide_start = 8
+            hide_end = points_col - 3
+            if hide_end >= hide_start:
+                for col in range(hide_start, hide_end + 1):
+                    ws.column_dimensions[get_column_letter(col)].hidden = True
+                self.logger.info(f"Скрыты колонки {get_column_letter(hide_start)}:{get_column_letter(hide_end)}")
+
+            # === 2. СОРТИРОВКА ===
+            last_row = ws.max_row
+            last_col = ws.max_column
+            name_map = {}  # Имя -> новая строка
+            if last_row >= 2:
+                rows = [[cell.value for cell in row] for row in ws.iter_rows(min_row=2, max_row=last_row, max_col=last_col)]
+
+                def sort_key(index):
+                    values = rows[index]
+                    points = values[points_col - 1] if points_col <= len(values) else None
+                    if isinstance(points, str) and points.startswith('='):
+                        points = event_values(*values[:4])[2]
+                    # Группируем: числа (1) выше остального (0), внутри группы — по убыванию
+                    return (1, points) if _is_number(points) else (0, 0)
+
+                order = sorted(range(len(rows)), key=sort_key, reverse=True)
+                for new_index, orig_index in enumerate(order):
+                    new_row, orig_row = new_index + 2, orig_index + 2
+                    values = rows[orig_index]
+                    if values[5]:
+                        name_map[str(values[5])] = new_row
+                    if new_row == orig_row:
+                        continue
+                    for col_idx, value in enumerate(values, start=1):
+                        if isinstance(value, str) and value.startswith('='):
+                            letter = get_column_letter(col_idx)
+                            try:
+                                value = Translator(value, origin=f"{letter}{orig_row}").translate_formula(f"{letter}{new_row}")
+                            except Exception:
+                                pass
+                        ws.cell(row=new_row, column=col_idx, value=value)
+                self.logger.info("Данные отсортированы.")
+
+            # === 3. ИЗОБРАЖЕНИЯ В КОММЕНТАРИЯХ ===
+            for img_info in comment_images or []:
+                row = name_map.get(img_info.get('name'))
+                # Кроп из спрайта отладки извлекается в файл только здесь
+                image_path = debug_image_path(img_info['image_path']) if row else None
+                if not image_path:
+                    continue
+                from PIL import Image as PILImage
+                with PILImage.open(image_path) as img:
+                    width, height = img.size
+                ws.cell(row=row, column=img_info['col']).comment = Comment(
+                    "", "Raidstat", width=width * COMMENT_IMAGE_SCALE, height=height * COMMENT_IMAGE_SCALE
+                )
+                images[(row, img_info['col'])] = image_path
+
+        except Exception as e:
+            self.logger.error(f"Ошибка оформления листа статистики: {e}")
+            import traceback
+            self.logger.error(traceback.format_exc())
+        return images
+
+    def _add_debug_images_comment(self, ws, row_idx, data, name, comment_images):
         """
-        Сохраняет информацию для вставки изображений в комментарии ко всем 7 столбцам:
+        Добавляет в comment_images информацию для вставки изображений в комментарии ко всем 7 столбцам:
         Хонор до, Хонор после, Фраги до, Фраги после, ГС, Ник, Класс
         
         data должен содержать debug_images_start и debug_images_end
         """
         try:
-            wb = ws.parent
-            
-            if not hasattr(wb, '_debug_comment_images'):
-                wb._debug_comment_images = []
-            
             # Получаем скриншоты для "до" и "после"
             images_start = data.get('debug_images_start') or {}
             images_end = data.get('debug_images_end') or {}
@@ -361,17 +800,35 @@ class ExcelStorage(StorageInterface):
                 if not img_path and col in [5, 6, 7]:
                     img_path = images_start.get(image_field) if images_start else None
 
-                wb._debug_comment_images.append({
+                comment_images.append({
                     'sheet': ws.title,
                     'row': row_idx,
                     'name': name, # Store name for mapping after sort
                     'col': col,
-                    'image_path': img_path if img_path and os.path.exists(img_path) else None
+                    'image_path': img_path if debug_image_exists(img_path) else None
                 })
             
         except Exception as e:
             self.logger.warning(f"Ошибка добавления отладочных изображений: {e}")
     
+    def collect_debug_comments(self, wb, stats_data):
+        """
+        Заново собирает изображения для комментариев события stats_data по текущим путям debug_images.
+        Нужно в ExcelSession: книга сохраняется после перемещения скриншотов, и папки отладки уже на новом месте.
+        Возвращает список для finish_statistics / add_images_to_comments.
+        """
+        ws = wb["Статистика"]
+        name_to_row = {}
+        for i, row in enumerate(ws.iter_rows(min_row=2, max_col=6, values_only=True), start=2):
+            if row[5]:
+                name_to_row[str(row[5])] = i
+
+        comment_images = []
+        for name, data in stats_data.items():
+            if data.get('debug_images_start') or data.get('debug_images_end'):
+                self._add_debug_images_comment(ws, name_to_row.get(name), data, name, comment_images)
+        return comment_images
+
     def add_images_to_comments(self, comment_images):
         """
         Добавляет изображения в комментарии Excel через COM-интерфейс (pywin32).
@@ -426,7 +883,9 @@ class ExcelStorage(StorageInterface):
                             cell = ws.Cells(row, col)
                             
                             # Если нет изображения — удаляем комментарий
-                            if not image_path or not os.path.exists(image_path):
+                            # (кроп из спрайта отладки извлекается в файл только здесь)
+                            image_path = debug_image_path(image_path)
+                            if not image_path:
                                 if cell.Comment is not None:
                                     cell.Comment.Delete()
                                     removed_count += 1
@@ -720,7 +1179,9 @@ class ExcelStorage(StorageInterface):
                                 
                                 cell = ws.Cells(row, col)
                                 
-                                if not image_path or not os.path.exists(image_path):
+                                # Кроп из спрайта отладки извлекается в файл только здесь
+                                image_path = debug_image_path(image_path)
+                                if not image_path:
                                     continue
                                 
                                 cell.AddComment("")
@@ -774,3 +1235,143 @@ class ExcelStorage(StorageInterface):
             string = chr(65 + remainder) + string
         return string
 
+
+
+def _sheet_columns(ws):
+    rows = [list(row) for row in ws.iter_rows(values_only=True)]
+    if not rows:
+        return
+    names = [str(row[0]).strip() if row and row[0] is not None else "" for row in rows[1:]]
+    for col in range(1, len(rows[0])):
+        if rows[0][col] is None:
+            continue
+        yield str(rows[0][col]), {
+            name: row[col] if col < len(row) else None
+            for name, row in zip(names, rows[1:]) if name and name.lower() != 'ник'
+        }
+
+
+class ExcelSession:
+    """
+    Сессия записи в Raidstat.xlsx на один запуск обработки.
+
+    Операции всех групп копятся в сессии, а commit() передает их очереди записи (ExcelWriter):
+    книга загружается и сохраняется одной атомарной записью (COM-операции выполняются один раз).
+    Каждая операция дописывается в журнал сессии (session_<mode>.jsonl, со сбросом на диск):
+    если программа завершится до commit(), незаписанные операции применятся при открытии следующей сессии.
+    Сразу после сохранения книги в журнал пишется отметка "saved" — журнал с отметкой просто удаляется,
+    без нее операции применяются заново (даже если книгу с тех пор сохранил Excel или другой режим).
+    """
+    def __init__(self, storage, mode):
+        self.storage = storage
+        self.mode = mode
+        self.filename = f"session_{mode}.jsonl"
+        self.logger = logging.getLogger(__name__)
+        self._file = None
+        self._ops = []
+        self._recover()
+
+    def save_attendance(self, attendance_data, date_str):
+        self._add("attendance", [list(attendance_data), date_str])
+        self.logger.info(f"Колонка посещаемости {date_str} подготовлена к записи (Всего участников: {len(attendance_data)})")
+
+    def save_statistics(self, stats_data, date_str, debug_screens=False):
+        self._add("statistics", [stats_data, date_str, debug_screens])
+
+    def commit(self):
+        """Сохраняет накопленные изменения. Возвращает False, если записать книгу не удалось."""
+        if not self._ops:
+            return True
+        ops = self._ops
+        if not self._file:
+            self._open_journal("a")
+        committed = self.storage.writer.write(
+            [(record["type"], record["args"]) for record in ops],
+            on_saved=lambda stamp: self._write({"type": "saved", "stamp": stamp})
+        )
+        if not committed:
+            self.logger.error(f"Изменения не сохранены в {self.storage.file_path} и будут записаны при следующем запуске")
+            self._rewrite_journal(ops)
+            self._reset(remove_journal=False)
+            return False
+        self._reset(remove_journal=True)
+        return True
+
+    def _add(self, op, args):
+        # Копия в том виде, в каком она попадает в журнал: последующие изменения данных вызывающим кодом
+        # не должны менять запись (и расходиться с повтором из журнала)
+        record = json.loads(json.dumps({"type": op, "args": args}, ensure_ascii=False))
+        if not self._file:
+            self._open_journal("w")
+        self._write(record)
+        self._ops.append(record)
+
+    def _recover(self):
+        """Применяет операции сессии, прерванной до сохранения книги."""
+        if not os.path.exists(self.filename):
+            return
+        records = []
+        try:
+            with open(self.filename, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        records.append(json.loads(line))
+                    except ValueError:
+                        # Недописанная строка при аварийном завершении
+                        continue
+        except Exception as e:
+            self.logger.error(f"Не удалось прочитать журнал сессии записи: {e}")
+            return
+
+        saved = [i for i, r in enumerate(records) if r.get("type") == "saved"]
+        pending = records[saved[-1] + 1:] if saved else records
+        ops = [r for r in pending if r.get("type") in ("attendance", "statistics")]
+        if not ops:
+            # Нечего применять или книга сохранена с этими операциями до удаления журнала
+            self._remove_journal()
+            return
+
+        self.logger.warning(f"Найдена незавершенная запись в {self.storage.file_path}: применяется операций: {len(ops)}")
+        self._ops = ops
+        self._open_journal("a")
+        self.commit()
+
+    def _rewrite_journal(self, ops):
+        # Без отметки о сохранении: неудачная запись применится при следующем открытии
+        self._open_journal("w")
+        for record in ops:
+            self._write(record)
+
+    def _open_journal(self, mode):
+        if self._file:
+            self._file.close()
+        try:
+            self._file = open(self.filename, mode, encoding='utf-8')
+        except Exception as e:
+            self.logger.error(f"Не удалось создать журнал сессии записи: {e}")
+            self._file = None
+
+    def _write(self, record):
+        if not self._file:
+            return
+        try:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        except Exception as e:
+            self.logger.error(f"Не удалось записать в журнал сессии записи: {e}")
+
+    def _reset(self, remove_journal):
+        self._ops = []
+        if self._file:
+            self._file.close()
+            self._file = None
+        if remove_journal:
+            self._remove_journal()
+
+    def _remove_journal(self):
+        if os.path.exists(self.filename):
+            try:
+                os.remove(self.filename)
+            except Exception as e:
+                self.logger.error(f"Не удалось удалить журнал сессии записи: {e}")
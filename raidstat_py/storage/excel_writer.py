@@ -0,0 +1,137 @@
+import queue
+import logging
+import threading
+from .file_lock import FileLock
+
+# Сколько секунд ждать, пока книгу освободит другой процесс
+LOCK_TIMEOUT = 120
+
+
+class WriteJob:
+    def __init__(self, ops, on_saved):
+        self.ops = ops
+        self.on_saved = on_saved
+        self.done = threading.Event()
+        self.result = False
+
+
+class ExcelWriter:
+    """
+    Единственный писатель Raidstat.xlsx.
+
+    Все изменения книги (сессии посещаемости и статистики, одиночные записи, пересчет сводки)
+    ставятся в очередь и выполняются одним фоновым потоком, поэтому параллельные запуски режимов
+    не перезаписывают изменения друг друга. Накопившиеся в очереди записи объединяются:
+    книга загружается и сохраняется один раз на всю пачку. На время записи берется блокировка
+    файла (FileLock) — от второго экземпляра программы.
+    """
+    def __init__(self, storage):
+        self.storage = storage
+        self.logger = logging.getLogger(__name__)
+        self.queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def write(self, ops, on_saved=None):
+        """
+        Записывает операции [(тип, аргументы)] и ждет сохранения книги.
+        Типы: "attendance" — аргументы apply_attendance, "statistics" — apply_statistics,
+        "rebuild_summary" — без аргументов.
+        on_saved(stamp) вызывается под блокировкой файла сразу после сохранения книги с этими операциями
+        (stamp — состояние сохраненного файла, см. ExcelStorage._file_stamp).
+        Возвращает False, если книгу сохранить не удалось или одна из операций упала
+        (тогда в книгу не попадает ни одна операция этой записи).
+        """
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        job = WriteJob(ops, on_saved)
+        self.queue.put(job)
+        job.done.wait()
+        return job.result
+
+    def _run(self):
+        while True:
+            jobs = [self.queue.get()]
+            # Все, что успело накопиться, пишется одним сохранением
+            while True:
+                try:
+                    jobs.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(jobs)
+            except Exception as e:
+                self.logger.error(f"Ошибка при сохранении {self.storage.file_path}: {e}")
+                import traceback
+                self.logger.error(traceback.format_exc())
+            finally:
+                for job in jobs:
+                    job.done.set()
+                    self.queue.task_done()
+
+    def _write_batch(self, jobs):
+        storage = self.storage
+        with FileLock(storage.file_path, timeout=LOCK_TIMEOUT):
+            # Книга загружается с формулами: формулы прошлого события замораживает apply_statistics
+            # (см. _freeze_event_formulas), поэтому не нужны значения, сохраненные Excel
+            wb = storage.load_workbook()
+            applied, roster, points_col, statistics = self._apply_jobs(wb, jobs)
+            while len(applied) < len(jobs) and applied:
+                # Упавшая запись могла частично изменить книгу — остальные применяются к книге заново
+                jobs = applied
+                wb = storage.load_workbook()
+                applied, roster, points_col, statistics = self._apply_jobs(wb, jobs)
+            if not applied:
+                return
+
+            comment_images = None
+            if statistics and len(statistics) > 2 and statistics[2]:
+                # Пути отладочных изображений последнего события — после перемещения скриншотов
+                comment_images = storage.collect_debug_comments(wb, statistics[0])
+            storage.commit_workbook(wb, points_col, comment_images)
+            # Кеш ростера привязывается к файлу, пока блокировка не отпущена: после нее книгу
+            # может сохранить другой процесс, и кеш получил бы его время изменения со старыми никами
+            for source, names in roster.items():
+                storage._update_roster_cache(source, names)
+            stamp = list(storage._file_stamp())
+            for job in applied:
+                if job.on_saved:
+                    job.on_saved(stamp)
+
+        if len(applied) > 1:
+            self.logger.info(f"Сохранен {storage.file_path} (объединено записей: {len(applied)})")
+        else:
+            self.logger.info(f"Сохранен {storage.file_path}")
+        for job in applied:
+            job.result = True
+
+    def _apply_jobs(self, wb, jobs):
+        """
+        Применяет операции записей к книге. Запись, операция которой упала, пропускается целиком
+        (ее результат остается False, журнал сессии сохраняется).
+        Возвращает (примененные записи, ростеры, колонка "Очки", аргументы последней статистики).
+        """
+        storage = self.storage
+        applied = []
+        roster = {}
+        points_col = None
+        statistics = None
+        for job in jobs:
+            try:
+                for op, args in job.ops:
+                    if op == "attendance":
+                        roster["attendance"] = storage.apply_attendance(wb, *args)
+                    elif op == "statistics":
+                        points_col, roster["statistics"] = storage.apply_statistics(wb, *args)
+                        statistics = args
+                    elif op == "rebuild_summary":
+                        storage.rebuild_summary_sheet(wb)
+            except Exception as e:
+                self.logger.error(f"Ошибка при записи ({op}): {e}")
+                import traceback
+                self.logger.error(traceback.format_exc())
+                continue
+            applied.append(job)
+        return applied, roster, points_col, statistics
@@ -0,0 +1,79 @@
+import os
+import time
+import logging
+
+# Межпроцессная блокировка книги: второй экземпляр программы (или второй запуск из консоли)
+# ждет, пока первый закончит запись, вместо того чтобы перезаписать его изменения.
+LOCK_SUFFIX = ".lock"
+
+
+class FileLock:
+    """
+    Эксклюзивная блокировка файла <path>.lock (msvcrt на Windows, fcntl на остальных системах).
+    Блокировка снимается ОС при завершении процесса, поэтому "зависший" файл блокировки не мешает.
+    """
+    def __init__(self, path, timeout=60, poll=0.2):
+        self.path = path + LOCK_SUFFIX
+        self.timeout = timeout
+        self.poll = poll
+        self.logger = logging.getLogger(__name__)
+        self._file = None
+
+    def acquire(self):
+        """Ждет блокировку не дольше timeout секунд. Возвращает False, если дождаться не удалось."""
+        self._file = open(self.path, 'a+')
+        deadline = time.monotonic() + self.timeout
+        waiting = False
+        while True:
+            try:
+                _lock(self._file)
+                return True
+            except OSError:
+                if time.monotonic() >= deadline:
+                    self.logger.error(f"Не удалось дождаться блокировки {self.path}")
+                    self._file.close()
+                    self._file = None
+                    return False
+                if not waiting:
+                    self.logger.info(f"Файл занят другим процессом, ожидание: {self.path}")
+                    waiting = True
+                time.sleep(self.poll)
+
+    def release(self):
+        if not self._file:
+            return
+        try:
+            _unlock(self._file)
+        except OSError as e:
+            self.logger.warning(f"Не удалось снять блокировку {self.path}: {e}")
+        finally:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        if not self.acquire():
+            raise TimeoutError(f"Файл занят другим процессом: {self.path}")
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+
+if os.name == "nt":
+    import msvcrt
+
+    def _lock(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+
+    def _unlock(f):
+        f.seek(0)
+        msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+else:
+    import fcntl
+
+    def _lock(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _unlock(f):
+        fcntl.flock(f.fileno(), fcntl.LOCK_UN)
@@ -0,0 +1,223 @@
+import os
+import re
+import glob
+from copy import copy
+from datetime import datetime
+import openpyxl
+from openpyxl.comments import Comment
+from .comment_images import embed_comment_images, read_comment_images
+
+# Разбиение истории Raidstat.xlsx на книги по периодам:
+# основная книга хранит только текущий период, итоги по игрокам и ростер,
+# а закрытые периоды переносятся в Raidstat_<период>.xlsx.
+PARTITION_MODES = ("month", "season")
+
+SUMMARY_SHEET = "Итоги"
+ROSTER_SHEET = "Ростер"
+
+SUMMARY_HEADERS = ["Ник", "Рейдов", "Последний рейд", "Событий", "Хонор", "Фраги", "Очки", "Последнее событие"]
+ROSTER_HEADERS = ["Ник", "Посещаемость", "Статистика"]
+# Колонка ростера (1-indexed) для каждого источника
+ROSTER_COLUMNS = {"attendance": 2, "statistics": 3}
+
+# Ключ периода в имени книги: 2024-05 (месяц) или 2024-S2 (сезон)
+PARTITION_KEY_RE = re.compile(r"^\d{4}-(\d{2}|S[1-4])$")
+
+
+def partition_key(date_str, mode):
+    """
+    Период события по его названию ("2024-05-01 20:15"): "2024-05" для month,
+    "2024-S2" (сезон — квартал) для season. None, если дату не разобрать.
+    """
+    try:
+        date = datetime.strptime(str(date_str).strip()[:10], "%Y-%m-%d")
+    except ValueError:
+        return None
+    if mode == "season":
+        return f"{date.year}-S{(date.month - 1) // 3 + 1}"
+    return f"{date.year}-{date.month:02d}"
+
+
+def partition_paths(file_path):
+    """Книги закрытых периодов рядом с основной, по порядку периодов."""
+    base, ext = os.path.splitext(file_path)
+    paths = {}
+    for path in glob.glob(f"{glob.escape(base)}_*{ext}"):
+        key = os.path.basename(path)[len(os.path.basename(base)) + 1:-len(ext) or None]
+        if PARTITION_KEY_RE.match(key):
+            paths[key] = path
+    return [paths[key] for key in sorted(paths)]
+
+
+def sheet_partition(ws, first_event_col, prefix, mode):
+    """Период листа — по заголовку его первого события (колонка first_event_col)."""
+    # ws.cell создает пустую ячейку — у листа без событий сдвинулась бы первая колонка
+    if ws.max_column < first_event_col:
+        return None
+    header = ws.cell(row=1, column=first_event_col).value
+    if not isinstance(header, str) or not header.startswith(prefix):
+        return None
+    return partition_key(header[len(prefix):], mode)
+
+
+def archive_sheet(ws, path, comment_images=None):
+    """
+    Копирует лист ws (значения, оформление ячеек, комментарии, размеры и скрытые колонки)
+    в книгу периода path (создается при необходимости).
+    Лист с тем же именем в книге периода заменяется — повторный перенос (например,
+    при восстановлении прерванной записи) не дублирует данные.
+    comment_images — рисунки комментариев листа (см. comment_images.read_comment_images).
+    """
+    # Рисунки комментариев остальных листов книги периода теряются при ее загрузке — переносятся заново
+    images = {ws.title: comment_images}
+    if os.path.exists(path):
+        archive = openpyxl.load_workbook(path)
+        if ws.title in archive.sheetnames:
+            archive.remove(archive[ws.title])
+        for name in archive.sheetnames:
+            images[name] = read_comment_images(path, name)
+    else:
+        archive = openpyxl.Workbook()
+        del archive["Sheet"]
+
+    target = archive.create_sheet(ws.title)
+    for row in ws.iter_rows():
+        for cell in row:
+            if cell.value is None and not cell.has_style and not cell.comment:
+                continue
+            copied = target.cell(row=cell.row, column=cell.column, value=cell.value)
+            if cell.has_style:
+                # Стили книги-источника индексируются ее таблицами — копируются сами объекты
+                copied.font, copied.fill, copied.border = copy(cell.font), copy(cell.fill), copy(cell.border)
+                copied.alignment, copied.protection = copy(cell.alignment), copy(cell.protection)
+                copied.number_format = cell.number_format
+            if cell.comment:
+                copied.comment = Comment(cell.comment.text, cell.comment.author,
+                                         width=cell.comment.width, height=cell.comment.height)
+    for letter, dimension in ws.column_dimensions.items():
+        if dimension.width:
+            target.column_dimensions[letter].width = dimension.width
+        if dimension.hidden:
+            target.column_dimensions[letter].hidden = True
+    for row_idx, dimension in ws.row_dimensions.items():
+        if dimension.height:
+            target.row_dimensions[row_idx].height = dimension.height
+    target.freeze_panes = ws.freeze_panes
+    target.auto_filter.ref = ws.auto_filter.ref
+
+    tmp_path = path + ".tmp"
+    try:
+        archive.save(tmp_path)
+        for name, sheet_images in images.items():
+            if sheet_images:
+                embed_comment_images(tmp_path, name, sheet_images)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def _name_rows(ws):
+    rows = {}
+    for row_idx, (name,) in enumerate(ws.iter_rows(min_row=2, max_col=1, values_only=True), start=2):
+        if name is not None and str(name).strip():
+            rows[str(name).strip()] = row_idx
+    return rows
+
+
+def _row_for(ws, rows, name):
+    row_idx = rows.get(name)
+    if not row_idx:
+        row_idx = ws.max_row + 1
+        ws.cell(row=row_idx, column=1, value=name)
+        rows[name] = row_idx
+    return row_idx
+
+
+def _sheet(wb, name, headers):
+    if name in wb.sheetnames:
+        return wb[name], False
+    ws = wb.create_sheet(name)
+    ws.append(headers)
+    return ws, True
+
+
+def _add(ws, row_idx, col, value):
+    current = ws.cell(row=row_idx, column=col).value
+    ws.cell(row=row_idx, column=col, value=(current if isinstance(current, (int, float)) else 0) + value)
+
+
+def update_roster(wb, source, names):
+    """Отмечает ники источника в листе ростера. Возвращает все ники этого источника."""
+    ws, _ = _sheet(wb, ROSTER_SHEET, ROSTER_HEADERS)
+    rows = _name_rows(ws)
+    col = ROSTER_COLUMNS[source]
+    for name in names:
+        name = str(name).strip()
+        if name:
+            ws.cell(row=_row_for(ws, rows, name), column=col, value=1)
+    return {name for name, row_idx in rows.items() if ws.cell(row=row_idx, column=col).value}
+
+
+def read_roster(ws, source):
+    col = ROSTER_COLUMNS[source]
+    names = set()
+    for row in ws.iter_rows(min_row=2, max_col=col, values_only=True):
+        if len(row) >= col and row[0] is not None and row[col - 1]:
+            names.add(str(row[0]).strip())
+    names.discard("")
+    return names
+
+
+def seed_roster(wb, attendance_names, statistics_names):
+    """Создает лист ростера по уже записанным никам (однократно, при включении разбиения)."""
+    update_roster(wb, "attendance", attendance_names)
+    update_roster(wb, "statistics", statistics_names)
+
+
+def seed_summary(wb, totals):
+    """
+    Создает лист итогов по уже записанной истории (однократно, при включении разбиения).
+    totals: {ник: [рейдов, последний рейд, событий, хонор, фраги, очки, последнее событие]}
+    """
+    ws, _ = _sheet(wb, SUMMARY_SHEET, SUMMARY_HEADERS)
+    for name, values in totals.items():
+        ws.append([name] + list(values))
+
+
+def set_attendance(wb, attended):
+    """
+    Переносит в итоги посещения игроков. Рейды считает только сводка посещаемости
+    (attendance_summary), итоги берут ее значения: attended — {ник: (посещено рейдов, последний рейд)}
+    из attendance_summary.attended.
+    """
+    ws, _ = _sheet(wb, SUMMARY_SHEET, SUMMARY_HEADERS)
+    rows = _name_rows(ws)
+    for name, row_idx in rows.items():
+        # После пересчета сводки у игрока могло не остаться посещений
+        if name not in attended and ws.cell(row=row_idx, column=2).value:
+            ws.cell(row=row_idx, column=2, value=0)
+            ws.cell(row=row_idx, column=3, value=None)
+    for name, (count, last_raid) in attended.items():
+        row_idx = _row_for(ws, rows, name)
+        ws.cell(row=row_idx, column=2, value=count)
+        ws.cell(row=row_idx, column=3, value=last_raid)
+
+
+def add_statistics(wb, event_rows, date_str):
+    """
+    Учитывает событие date_str в итогах игроков.
+    event_rows: {ник: (хонор, фраги, очки)} — значения события (нечисловые пропускаются).
+    """
+    ws, _ = _sheet(wb, SUMMARY_SHEET, SUMMARY_HEADERS)
+    rows = _name_rows(ws)
+    for name, values in event_rows.items():
+        name = str(name).strip()
+        if not name:
+            continue
+        row_idx = _row_for(ws, rows, name)
+        _add(ws, row_idx, 4, 1)
+        for col, value in zip((5, 6, 7), values):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                _add(ws, row_idx, col, value)
+        ws.cell(row=row_idx, column=8, value=str(date_str))
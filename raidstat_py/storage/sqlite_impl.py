@@ -0,0 +1,299 @@
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import closing
+from datetime import datetime
+from itertools import groupby
+from .base import StorageInterface
+from .excel_impl import event_values, write_export
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS players (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS events (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    title TEXT NOT NULL,
+    time REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_kind_time ON events(kind, time);
+CREATE TABLE IF NOT EXISTS attendance (
+    event_id INTEGER NOT NULL REFERENCES events(id),
+    player_id INTEGER NOT NULL REFERENCES players(id),
+    PRIMARY KEY (event_id, player_id)
+);
+CREATE INDEX IF NOT EXISTS idx_attendance_player ON attendance(player_id);
+CREATE TABLE IF NOT EXISTS stat_snapshots (
+    event_id INTEGER NOT NULL REFERENCES events(id),
+    player_id INTEGER NOT NULL REFERENCES players(id),
+    honor_start INTEGER,
+    honor_end INTEGER,
+    kills_start INTEGER,
+    kills_end INTEGER,
+    gear INTEGER,
+    class TEXT,
+    honor INTEGER,
+    kills INTEGER,
+    points INTEGER,
+    PRIMARY KEY (event_id, player_id)
+);
+CREATE INDEX IF NOT EXISTS idx_stat_snapshots_player ON stat_snapshots(player_id);
+"""
+
+# Событие определяется режимом и названием: повторная запись того же события заменяет его факты.
+# Базы прошлых версий могли накопить повторы — перед созданием индекса остается последняя запись
+# (база предварительно копируется в <база>.bak, см. SqliteStorage._migrate_unique_events).
+DUPLICATE_EVENTS = "SELECT id FROM events WHERE id NOT IN (SELECT MAX(id) FROM events GROUP BY kind, title)"
+UNIQUE_EVENTS = f"""
+BEGIN;
+DELETE FROM attendance WHERE event_id IN ({DUPLICATE_EVENTS});
+DELETE FROM stat_snapshots WHERE event_id IN ({DUPLICATE_EVENTS});
+DELETE FROM events WHERE id IN ({DUPLICATE_EVENTS});
+CREATE UNIQUE INDEX idx_events_kind_title ON events(kind, title);
+COMMIT;
+"""
+BACKUP_SUFFIX = ".bak"
+
+# Формат названий событий ("2024-05-01 20:15"); остальные (имена подпапок) получают время записи
+EVENT_TIME_FORMATS = ("%Y-%m-%d %H:%M", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d")
+
+
+class SqliteStorage(StorageInterface):
+    """
+    Хранилище в SQLite: нормализованные таблицы игроков, событий, фактов посещаемости и снимков статистики.
+
+    В отличие от Raidstat.xlsx размер записи не зависит от длины истории: ростер — один запрос по индексу,
+    событие — одна транзакция. Режим WAL позволяет читать базу (например, выгрузкой или внешними
+    инструментами), пока идет запись. Таблица Excel строится по запросу — export_excel().
+    """
+    def __init__(self, db_path="Raidstat.db"):
+        self.db_path = db_path
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            if not conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_events_kind_title'").fetchone():
+                self._migrate_unique_events(conn)
+
+    def _migrate_unique_events(self, conn):
+        """Удаляет повторы событий (с копией базы и отчетом в логе) и создает уникальный индекс."""
+        counts = conn.execute(
+            f"SELECT (SELECT COUNT(*) FROM events WHERE id IN ({DUPLICATE_EVENTS})), "
+            f"(SELECT COUNT(*) FROM attendance WHERE event_id IN ({DUPLICATE_EVENTS})), "
+            f"(SELECT COUNT(*) FROM stat_snapshots WHERE event_id IN ({DUPLICATE_EVENTS}))"
+        ).fetchone()
+        if counts[0]:
+            backup_path = self.db_path + BACKUP_SUFFIX
+            # Копия средствами SQLite — с учетом незаписанных в основной файл страниц WAL
+            with closing(sqlite3.connect(backup_path)) as backup:
+                conn.backup(backup)
+            self.logger.warning(
+                f"{self.db_path}: удаляются повторы событий с одинаковым названием — событий: {counts[0]}, "
+                f"отметок посещаемости: {counts[1]}, снимков статистики: {counts[2]} "
+                f"(остается последняя запись; копия базы до удаления: {backup_path})"
+            )
+        conn.executescript(UNIQUE_EVENTS)
+
+    def _connect(self):
+        # Соединение на операцию: запись идет из потока записи статистики, чтение ростера — из основного
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return closing(conn)
+
+    def open_session(self, mode):
+        """Сессия записи: каждая операция — отдельная транзакция, отложенного сохранения нет."""
+        return SqliteSession(self)
+
+    def get_roster(self, source="statistics"):
+        facts = "stat_snapshots" if source == "statistics" else "attendance"
+        try:
+            with self._connect() as conn:
+                rows = conn.execute(
+                    f"SELECT p.name FROM players p WHERE EXISTS (SELECT 1 FROM {facts} f WHERE f.player_id = p.id)"
+                ).fetchall()
+            return [name for (name,) in rows]
+        except Exception as e:
+            self.logger.error(f"Ошибка при чтении ростера: {e}")
+            return []
+
+    def save_attendance(self, attendance_data, date_str):
+        """Возвращает False, если транзакция не прошла."""
+        names = {str(name).strip() for name in attendance_data} - {""}
+        try:
+            with self._lock, self._connect() as conn:
+                with conn:
+                    event_id = self._add_event(conn, "attendance", date_str)
+                    conn.executemany(
+                        "INSERT OR IGNORE INTO attendance (event_id, player_id) VALUES (?, ?)",
+                        [(event_id, player_id) for player_id in self._player_ids(conn, names).values()]
+                    )
+            self.logger.info(f"Сохранена посещаемость: {date_str} (Всего участников: {len(names)})")
+            return True
+        except Exception as e:
+            self.logger.error(f"Ошибка при сохранении посещаемости: {e}")
+            import traceback
+            self.logger.error(traceback.format_exc())
+            return False
+
+    def save_statistics(self, stats_data, date_str, debug_screens=False):
+        """
+        stats_data: Словарь {имя: {kills_start, kills_end, honor_start, honor_end, gear, class, ...}}
+        Сохраняет снимок каждого игрока и дельты события (хонор, фраги, очки).
+        debug_screens не используется: отладочные изображения остаются в папках скриншотов.
+        Возвращает False, если транзакция не прошла.
+        """
+        try:
+            with self._lock, self._connect() as conn:
+                with conn:
+                    event_id = self._add_event(conn, "statistics", date_str)
+                    player_ids = self._player_ids(conn, stats_data)
+                    rows = []
+                    for name, data in stats_data.items():
+                        values = [data.get(key) for key in ('honor_start', 'honor_end', 'kills_start', 'kills_end')]
+                        honor, kills, points = (v if v != "" else None for v in event_values(*values))
+                        rows.append((event_id, player_ids[name], *values, data.get('gear'), data.get('class', ''), honor, kills, points))
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO stat_snapshots (event_id, player_id, honor_start, honor_end, kills_start, "
+                        "kills_end, gear, class, honor, kills, points) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        rows
+                    )
+            self.logger.info(f"Сохранена статистика: {date_str} (Игроков: {len(stats_data)})")
+            return True
+        except Exception as e:
+            self.logger.error(f"Ошибка при сохранении статистики: {e}")
+            import traceback
+            self.logger.error(traceback.format_exc())
+            return False
+
+    def _add_event(self, conn, kind, title):
+        """Id события (kind, title); факты уже записанного события с тем же названием удаляются."""
+        conn.execute(
+            "INSERT INTO events (kind, title, time) VALUES (?, ?, ?) "
+            "ON CONFLICT(kind, title) DO UPDATE SET time = excluded.time",
+            (kind, str(title), _event_time(title))
+        )
+        event_id = conn.execute("SELECT id FROM events WHERE kind = ? AND title = ?", (kind, str(title))).fetchone()[0]
+        facts = "stat_snapshots" if kind == "statistics" else "attendance"
+        conn.execute(f"DELETE FROM {facts} WHERE event_id = ?", (event_id,))
+        return event_id
+
+    def _player_ids(self, conn, names):
+        conn.executemany("INSERT OR IGNORE INTO players (name) VALUES (?)", [(name,) for name in names])
+        ids = {}
+        for name in names:
+            ids[name] = conn.execute("SELECT id FROM players WHERE name = ?", (name,)).fetchone()[0]
+        return ids
+
+    def export_excel(self, path="Raidstat_export.xlsx"):
+        """
+        Строит книгу в формате Raidstat.xlsx (листы "Посещаемость", "Статистика", "Сводка") из базы.
+        Строки читаются курсором и пишутся потоково (write_export), книга целиком в памяти не собирается.
+        """
+        try:
+            with self._connect() as conn:
+                write_export(path, SqliteExportSource(conn))
+            self.logger.info(f"Выгрузка в Excel: {path}")
+            return path
+        except Exception as e:
+            self.logger.error(f"Ошибка выгрузки в Excel: {e}")
+            import traceback
+            self.logger.error(traceback.format_exc())
+            return None
+
+
+class SqliteExportSource:
+    """Источник строк для write_export: каждая строка листа собирается из одного прохода курсора."""
+    def __init__(self, conn):
+        self.conn = conn
+
+    def _events(self, kind):
+        return self.conn.execute("SELECT id, title FROM events WHERE kind = ? ORDER BY time, id", (kind,)).fetchall()
+
+    def attendance_events(self):
+        return [title for _, title in self._events("attendance")]
+
+    def attendance_rows(self):
+        """Как в Raidstat.xlsx: игроки по первому посещению, с него — 1 или 0, до него пусто."""
+        columns = {event_id: index for index, (event_id, _) in enumerate(self._events("attendance"))}
+        cursor = self.conn.execute(
+            "WITH firsts AS (SELECT a.player_id, MIN(e.time) AS first_time FROM attendance a "
+            "JOIN events e ON e.id = a.event_id GROUP BY a.player_id) "
+            "SELECT p.name, a.event_id FROM firsts f JOIN players p ON p.id = f.player_id "
+            "JOIN attendance a ON a.player_id = f.player_id ORDER BY f.first_time, p.name"
+        )
+        for name, rows in groupby(cursor, key=lambda row: row[0]):
+            present = sorted(columns[event_id] for _, event_id in rows)
+            values = [None] * len(columns)
+            for index in range(present[0], len(columns)):
+                values[index] = 0
+            for index in present:
+                values[index] = 1
+            yield name, values
+
+    def attendance_presence(self):
+        for event_id, title in self._events("attendance"):
+            yield title, {name for (name,) in self.conn.execute(
+                "SELECT p.name FROM attendance a JOIN players p ON p.id = a.player_id WHERE a.event_id = ?", (event_id,)
+            )}
+
+    def statistics_events(self):
+        return [title for _, title in self._events("statistics")]
+
+    def statistics_rows(self):
+        """Строки по убыванию очков последнего события (пустые внизу), колонки 1-7 — последний снимок игрока."""
+        events = self._events("statistics")
+        columns = {event_id: index for index, (event_id, _) in enumerate(events)}
+        last_event = events[-1][0] if events else None
+        cursor = self.conn.execute(
+            "WITH ranked AS (SELECT p.id AS player_id, p.name, "
+            "(SELECT s.points FROM stat_snapshots s WHERE s.player_id = p.id AND s.event_id = ?) AS last_points "
+            "FROM players p WHERE EXISTS (SELECT 1 FROM stat_snapshots s WHERE s.player_id = p.id)) "
+            "SELECT r.name, s.event_id, s.honor_start, s.honor_end, s.kills_start, s.kills_end, s.gear, s.class, "
+            "s.honor, s.kills, s.points FROM ranked r JOIN stat_snapshots s ON s.player_id = r.player_id "
+            "JOIN events e ON e.id = s.event_id "
+            "ORDER BY r.last_points IS NULL, r.last_points DESC, r.player_id, e.time, e.id",
+            (last_event,)
+        )
+        for name, rows in groupby(cursor, key=lambda row: row[0]):
+            values = [None] * (3 * len(columns))
+            fixed = None
+            for _, event_id, *snapshot in rows:
+                fixed = snapshot[:5] + [name, snapshot[5]]
+                index = 3 * columns[event_id]
+                values[index:index + 3] = snapshot[6:9]
+            yield fixed, values
+
+
+class SqliteSession:
+    """
+    Сессия записи SqliteStorage: операции сразу фиксируются транзакциями, commit() ничего не откладывает
+    и возвращает False, если хотя бы одна операция сессии не записалась.
+    """
+    def __init__(self, storage):
+        self.storage = storage
+        self.failed = False
+
+    def save_attendance(self, attendance_data, date_str):
+        if not self.storage.save_attendance(attendance_data, date_str):
+            self.failed = True
+
+    def save_statistics(self, stats_data, date_str, debug_screens=False):
+        if not self.storage.save_statistics(stats_data, date_str, debug_screens):
+            self.failed = True
+
+    def commit(self):
+        return not self.failed
+
+
+def _event_time(title):
+    for fmt in EVENT_TIME_FORMATS:
+        try:
+            return datetime.strptime(str(title), fmt).timestamp()
+        except ValueError:
+            continue
+    return time.time()
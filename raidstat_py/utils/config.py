@@ -8,9 +8,24 @@ class Config:
         "raid_frame_coords": {"x": 1394, "y": 1016},
         "personal_frame_coords": {"x": 1453, "y": 964},
         "max_diff_time": 15,
+        "timestamp_source": "auto",  # Время скриншотов: auto (манифест > EXIF > имя файла > номер, если mtime потеряно > mtime), manifest, exif, filename, sequence, mtime
+        "sequence_gap": 10,  # Время по номерам ScreenShotNNNN: пропуск больше стольких номеров начинает новое событие (0 — не делить)
+        "baseline_max_age": 0,  # Минуты: первая группа считается от сохраненной статистики не старше этого (0 — выключено)
+        "max_honor_delta": 500000,  # Правдоподобный рост хонора за событие (больше — повторное распознавание, 0 — без лимита)
+        "max_kills_delta": 2000,  # Правдоподобный рост фрагов за событие
+        "max_gear_delta": 2000,  # Правдоподобное изменение ГС между событиями
         "screenshots_directory": "",  # Последняя выбранная директория со скриншотами
         "show_afterscreen": False,
+        "annotation_mode": "full",  # Результирующие скриншоты: full — целиком, region — только рейд-фрейм, deferred — при открытии
+        "annotation_format": "auto",  # auto (как исходный файл), jpg, png, webp
+        "annotation_quality": 90,  # Качество JPEG/WebP
+        "archive_mode": "full",  # Обработанные скриншоты: full — перемещаются целиком, roi — только читаемые области
+        "skip_processed": False,  # Пропускать скриншоты, уже обработанные раньше (по хешу содержимого, например скопированные повторно)
         "debug_screens": False,
+        "storage_backend": "excel",  # Хранилище: excel — Raidstat.xlsx, sqlite — Raidstat.db (Excel — выгрузкой по запросу)
+        "excel_partition": "off",  # Разбиение Raidstat.xlsx по периодам: off, month, season (квартал); закрытые — в Raidstat_<период>.xlsx
+        "facts_export": "off",  # Выгрузка фактов запуска для аналитики: off, parquet, feather (нужен pyarrow)
+        "excel_com": False,  # Оформление листа статистики (сортировка, скрытие колонок, изображения) через Excel вместо openpyxl
         "recursive_scan": True,
         "ocr_mode": "offline",
         "ocr_api_key": "",
@@ -60,12 +75,57 @@ class Config:
     @property
     def max_diff_time(self): return int(self.data.get("max_diff_time", 15))
 
+    @property
+    def timestamp_source(self): return self.data.get("timestamp_source", "auto")
+
+    @property
+    def sequence_gap(self): return int(self.data.get("sequence_gap", 10))
+
+    @property
+    def baseline_max_age(self): return int(self.data.get("baseline_max_age", 0))
+
+    @property
+    def max_honor_delta(self): return int(self.data.get("max_honor_delta", 500000))
+
+    @property
+    def max_kills_delta(self): return int(self.data.get("max_kills_delta", 2000))
+
+    @property
+    def max_gear_delta(self): return int(self.data.get("max_gear_delta", 2000))
+
     @property
     def show_afterscreen(self): return bool(self.data.get("show_afterscreen", False))
 
+    @property
+    def archive_mode(self): return self.data.get("archive_mode", "full")
+
+    @property
+    def skip_processed(self): return bool(self.data.get("skip_processed", False))
+
+    @property
+    def annotation_mode(self): return self.data.get("annotation_mode", "full")
+
+    @property
+    def annotation_format(self): return self.data.get("annotation_format", "auto")
+
+    @property
+    def annotation_quality(self): return int(self.data.get("annotation_quality", 90))
+
     @property
     def debug_screens(self): return bool(self.data.get("debug_screens", False))
 
+    @property
+    def storage_backend(self): return self.data.get("storage_backend", "excel")
+
+    @property
+    def excel_partition(self): return self.data.get("excel_partition", "off")
+
+    @property
+    def facts_export(self): return self.data.get("facts_export", "off")
+
+    @property
+    def excel_com(self): return bool(self.data.get("excel_com", False))
+
     @property
     def recursive_scan(self): return bool(self.data.get("recursive_scan", False))
 
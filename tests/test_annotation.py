@@ -0,0 +1,56 @@
+"""
+Тест фоновой записи аннотированных скриншотов посещаемости.
+"""
+import sys
+import os
+
+from PIL import Image
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from raidstat_py.core.annotation import AnnotationWriter, render_sidecar
+from raidstat_py.core.history import HistoryManager
+
+
+class TestAnnotationWriter:
+    """Тесты записи результатов посещаемости."""
+
+    def _make_source(self, tmp_path):
+        source = tmp_path / "ScreenShot0001.png"
+        Image.new("RGB", (200, 100), (10, 10, 10)).save(source)
+        return str(source)
+
+    def test_region_mode_crops_raid_frame(self, tmp_path, monkeypatch):
+        """В режиме region сохраняется только область рейд-фрейма в выбранном формате."""
+        monkeypatch.chdir(tmp_path)
+        source = self._make_source(tmp_path)
+        history = HistoryManager("attendance")
+        done = []
+        writer = AnnotationWriter(history, mode="region", fmt="jpg", quality=80)
+        writer.submit(source, [("Lulnor", 20, 30, (255, 255, 255))], 12, region=(10, 20, 110, 70), on_done=done.append)
+        writer.drain()
+
+        output = str(tmp_path / "ScreenShot0001_res.jpg")
+        assert done == [output]
+        assert history.created == [output]
+        with Image.open(output) as img:
+            assert img.size == (100, 50)
+
+    def test_deferred_mode_renders_on_open(self, tmp_path, monkeypatch):
+        """В отложенном режиме пишется только описание; изображение рисуется при открытии."""
+        monkeypatch.chdir(tmp_path)
+        source = self._make_source(tmp_path)
+        writer = AnnotationWriter(HistoryManager("attendance"), mode="deferred")
+        writer.submit(source, [("Йоныч", 20, 30, (187, 20, 20))], 12)
+        writer.drain()
+
+        sidecar = str(tmp_path / "ScreenShot0001_res.json")
+        assert os.path.exists(sidecar)
+        assert not os.path.exists(tmp_path / "ScreenShot0001_res.png")
+
+        output = render_sidecar(sidecar)
+        assert output == str(tmp_path / "ScreenShot0001_res.png")
+        with Image.open(output) as img:
+            assert img.size == (200, 100)
@@ -55,6 +55,12 @@ def teardown_module():
     pass
 
 
+@pytest.fixture(autouse=True)
+def work_in_tmp(tmp_path, monkeypatch):
+    """Книга, конфиг, история и кеши программы создаются в рабочей папке — в тестах это tmp_path, а не корень проекта."""
+    monkeypatch.chdir(tmp_path)
+
+
 class TestAttendanceProcessor:
     """Тесты обработчика посещаемости."""
 
@@ -116,7 +122,7 @@ class TestAttendanceProcessor:
         assert count > 0, "Должны быть найдены участники"
         
         # Проверяем создания Excel файла
-        excel_path = os.path.join(PROJECT_ROOT, "Raidstat.xlsx")
+        excel_path = os.path.abspath("Raidstat.xlsx")
         assert os.path.exists(excel_path), "Файл Raidstat.xlsx должен быть создан"
         
         # Проверяем содержимое Excel
@@ -224,13 +230,16 @@ class TestAttendanceProcessor:
         # Вызываем внутренний метод обработки ячейки
         # Теперь передаем полный img_bgr, так как _process_single_cell сам делает кроп
         # Но для совместимости с тем что img_bgr уже загружен, передаем координаты
+        debug_crops = {}
         name, score, type_code, out_x, out_y = processor.attendance_processor._process_single_cell(
-            img_bgr, block_idx, row_idx, col_idx, x, y, w, h, debug_dir
+            img_bgr, block_idx, row_idx, col_idx, x, y, w, h, debug_crops
         )
         
         print(f"Результат распознавания: name='{name}', score={score}, type_code={type_code}")
         
-        # Проверяем файлы в debug_dir
+        # Сохраняем кропы ячейки в спрайт и проверяем файлы в debug_dir
+        processor.attendance_processor.debug_sink.write(debug_dir, debug_crops)
+        processor.attendance_processor.debug_sink.drain()
         debug_files = os.listdir(debug_dir)
         print(f"Файлы в папке отладки: {debug_files}")
 
@@ -0,0 +1,56 @@
+"""
+Тест сводки посещаемости.
+"""
+import sys
+import os
+import openpyxl
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from raidstat_py.storage.excel_impl import ExcelStorage
+
+
+def _summary(path):
+    wb = openpyxl.load_workbook(path)
+    return {row[0]: list(row[1:7]) for row in wb["Сводка"].iter_rows(min_row=2, values_only=True)}
+
+
+class TestAttendanceSummary:
+    """Тесты листа "Сводка"."""
+
+    def test_incremental_matches_rebuild(self, tmp_path):
+        """Сводка, обновляемая при каждой колонке, совпадает с полным пересчетом."""
+        path = str(tmp_path / "Raidstat.xlsx")
+        storage = ExcelStorage(path)
+        storage.save_attendance(["Alpha", "Beta"], "2024-01-10 20:00")
+        storage.save_attendance(["Alpha"], "2024-03-20 20:00")
+        storage.save_attendance(["Alpha", "Gamma"], "2024-04-15 20:00")
+
+        summary = _summary(path)
+        assert summary == {
+            "Alpha": [3, 3, 1.0, "2024-04-15 20:00", 2, 2],
+            "Beta": [3, 1, 1 / 3, "2024-01-10 20:00", 0, 0],
+            "Gamma": [1, 1, 1.0, "2024-04-15 20:00", 1, 1],
+        }
+
+        wb = openpyxl.load_workbook(path)
+        del wb["Сводка"]
+        wb.save(path)
+        assert storage.rebuild_attendance_summary()
+        assert _summary(path) == summary
+
+    def test_summary_created_for_old_workbook(self, tmp_path):
+        """В книге без сводки она строится по истории перед записью нового рейда."""
+        path = str(tmp_path / "Raidstat.xlsx")
+        storage = ExcelStorage(path)
+        wb = openpyxl.load_workbook(path)
+        ws = wb["Посещаемость"]
+        ws.append(["Alpha", 1, 0])
+        ws.cell(row=1, column=2, value="2024-05-01 20:00")
+        ws.cell(row=1, column=3, value="2024-05-02 20:00")
+        wb.save(path)
+
+        storage.save_attendance(["Alpha"], "2024-05-03 20:00")
+        assert _summary(path)["Alpha"] == [3, 2, 2 / 3, "2024-05-03 20:00", 2, 2]
@@ -0,0 +1,34 @@
+"""
+Тест сохраненной статистики игроков ("до" для первой группы нового запуска).
+"""
+import sys
+import os
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from raidstat_py.core.baseline import BaselineStore
+
+
+class TestBaselineStore:
+    """Тесты базовой статистики."""
+
+    def test_prev_stats_filtered_by_names_and_age(self, tmp_path, monkeypatch):
+        """В prev_stats попадают только игроки текущей группы со свежим состоянием."""
+        monkeypatch.chdir(tmp_path)
+        store = BaselineStore()
+        store.update({
+            'Lulnor': {'honor_end': 100, 'kills_end': 10, 'gear': 26277, 'class': 'Судья'},
+            'Nadsod': {'honor_end': 200, 'kills_end': 20, 'gear': 22909, 'class': 'Гладиатор'},
+            'Глэчик': {'honor_end': 1, 'kills_end': None, 'gear': None, 'class': None},
+        }, timestamp=1000)
+        store.update({'Sarinn': {'honor_end': 300, 'kills_end': 30, 'gear': 25538, 'class': 'Судья'}}, timestamp=-10000)
+
+        prev = store.get_prev_stats({'Lulnor', 'Sarinn', 'Глэчик'}, before_time=1000 + 60 * 30, max_age_minutes=60)
+        assert set(prev) == {'Lulnor'}
+        assert prev['Lulnor']['honor_end'] == 100
+
+        # Окно выключено или состояние записано позже начала группы (повторный запуск тех же скриншотов)
+        assert store.get_prev_stats({'Lulnor'}, before_time=1000 + 60, max_age_minutes=0) == {}
+        assert store.get_prev_stats({'Lulnor'}, before_time=900, max_age_minutes=60) == {}
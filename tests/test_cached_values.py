@@ -0,0 +1,44 @@
+"""
+Тест значений формул, сохраняемых вместе с формулами.
+"""
+import sys
+import os
+import openpyxl
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from raidstat_py.storage.excel_impl import ExcelStorage
+
+
+def _stats(honor_start, honor_end, kills_start, kills_end):
+    return {"honor_start": honor_start, "honor_end": honor_end, "kills_start": kills_start, "kills_end": kills_end}
+
+
+class TestCachedValues:
+    """Тесты add_cached_values при записи Raidstat.xlsx."""
+
+    def test_formulas_keep_values(self, tmp_path):
+        """Формулы события остаются, а data_only-чтение видит посчитанные значения."""
+        path = str(tmp_path / "Raidstat.xlsx")
+        storage = ExcelStorage(path)
+        storage.save_statistics({"Alpha": _stats(100, 300, 1, 3), "Beta": _stats(0, "", 0, 2)}, "2024-05-01 21:00")
+
+        formulas = openpyxl.load_workbook(path)["Статистика"]
+        assert formulas.cell(row=2, column=10).value.startswith("=IF")
+
+        values = {row[5]: row[7:] for row in openpyxl.load_workbook(path, data_only=True)["Статистика"].iter_rows(min_row=2, values_only=True)}
+        assert values["Alpha"] == (200, 2, 340)
+        assert values["Beta"][1] == 2
+
+    def test_previous_event_frozen_without_excel(self, tmp_path):
+        """Следующее событие замораживает предыдущее в числа, даже если файл не открывали в Excel."""
+        path = str(tmp_path / "Raidstat.xlsx")
+        storage = ExcelStorage(path)
+        storage.save_statistics({"Alpha": _stats(0, 100, 0, 1)}, "2024-05-01 21:00")
+        storage.save_attendance(["Alpha"], "2024-05-02 20:00")
+        storage.save_statistics({"Alpha": _stats(100, 150, 1, 1)}, "2024-05-02 21:00")
+
+        row = list(openpyxl.load_workbook(path)["Статистика"].iter_rows(min_row=2, max_row=2, values_only=True))[0]
+        assert row[7:10] == (100, 1, 170)
@@ -0,0 +1,104 @@
+"""
+Тест токена остановки (прерывание выполняющихся операций).
+"""
+import sys
+import os
+import time
+import threading
+
+import pytest
+import pytesseract
+from PIL import Image
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from raidstat_py.core.cancel import CancelToken, is_cancelled
+from raidstat_py.core.ocr import OCRHandler
+
+# Подставной tesseract: пишет <выход>.tsv, как настоящий с tessedit_create_tsv=1
+FAKE_TESSERACT = """#!{python}
+import sys, time
+time.sleep({delay})
+header = "level\\tpage_num\\tblock_num\\tpar_num\\tline_num\\tword_num\\tleft\\ttop\\twidth\\theight\\tconf\\ttext"
+word = "5\\t1\\t1\\t1\\t1\\t1\\t0\\t0\\t10\\t10\\t91\\tLulnor"
+with open(sys.argv[2] + ".tsv", "w", encoding="utf-8") as f:
+    f.write(header + "\\n" + word + "\\n")
+"""
+
+
+def _fake_tesseract(tmp_path, monkeypatch, delay):
+    path = tmp_path / "tesseract"
+    path.write_text(FAKE_TESSERACT.format(python=sys.executable, delay=delay), encoding="utf-8")
+    path.chmod(0o755)
+    monkeypatch.setattr(pytesseract.pytesseract, "tesseract_cmd", str(path))
+
+
+class TestCancelToken:
+    """Тесты токена остановки."""
+
+    def test_set_calls_registered_callbacks(self):
+        """При остановке вызываются зарегистрированные функции, кроме снятых с регистрации."""
+        token = CancelToken()
+        called = []
+        token.register(lambda: called.append("tesseract"))
+        handle = token.register(lambda: called.append("http"))
+        token.unregister(handle)
+
+        assert not is_cancelled(token)
+        token.set()
+
+        assert is_cancelled(token)
+        assert called == ["tesseract"]
+        assert token.latency() is not None
+
+    def test_register_after_set_calls_immediately(self):
+        """Операция, начатая после остановки, прерывается сразу; clear() сбрасывает состояние."""
+        token = CancelToken()
+        token.set()
+        called = []
+        assert token.register(lambda: called.append(1)) is None
+        assert called == [1]
+
+        token.clear()
+        assert token.latency() is None
+        assert not is_cancelled(None)
+
+    def test_flag_set_before_callbacks_taken(self):
+        """Список функций снимается, когда флаг уже поднят: register() после этого вызывает функцию сам."""
+        token = CancelToken()
+        flags = []
+
+        class Callbacks(dict):
+            def values(self):
+                flags.append(token.is_set())
+                return super().values()
+
+        token._callbacks = Callbacks()
+        token.set()
+        assert flags == [True]
+
+
+@pytest.mark.skipif(sys.platform.startswith("win"), reason="подставной tesseract — скрипт с shebang")
+class TestRunTesseractData:
+    """_run_tesseract_data с подставным исполняемым файлом tesseract."""
+
+    def test_reads_tsv_like_image_to_data(self, tmp_path, monkeypatch):
+        """Результат разбирается в словарь того же вида, что pytesseract.image_to_data(output_type=DICT)."""
+        ocr = OCRHandler()
+        _fake_tesseract(tmp_path, monkeypatch, delay=0)
+        data = ocr._run_tesseract_data(Image.new("RGB", (20, 10)), "rus", "--psm 7", CancelToken())
+        assert data["text"] == ["Lulnor"]
+        assert int(data["conf"][0]) == 91
+
+    def test_stop_kills_running_process(self, tmp_path, monkeypatch):
+        """Остановка завершает выполняющийся процесс, не дожидаясь распознавания."""
+        ocr = OCRHandler()
+        _fake_tesseract(tmp_path, monkeypatch, delay=30)
+        token = CancelToken()
+        threading.Timer(0.3, token.set).start()
+
+        started = time.monotonic()
+        assert ocr._run_tesseract_data(Image.new("RGB", (20, 10)), "rus", "--psm 7", token) is None
+        assert time.monotonic() - started < 10
@@ -0,0 +1,83 @@
+"""
+Тест выгрузки фактов в колоночные файлы.
+"""
+import sys
+import os
+import pytest
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from raidstat_py.storage.columnar_export import ColumnarExporter
+
+
+class RecordingSession:
+    """Сессия хранилища, запоминающая операции."""
+    def __init__(self):
+        self.ops = []
+
+    def save_attendance(self, attendance_data, date_str):
+        self.ops.append(("attendance", date_str))
+
+    def save_statistics(self, stats_data, date_str, debug_screens=False):
+        self.ops.append(("statistics", date_str))
+
+    def commit(self):
+        return True
+
+
+def _stats():
+    return {
+        "Alpha": {"honor_start": 100, "honor_end": 250, "kills_start": 1, "kills_end": 2, "gear": 15000, "class": "Маг"},
+        "Beta": {"honor_start": 0, "honor_end": "", "kills_start": 0, "kills_end": 4, "gear": ""},
+    }
+
+
+class TestColumnarExport:
+    """Тесты ColumnarExporter и FactsSession."""
+
+    def test_session_collects_long_rows(self, tmp_path):
+        """Операции уходят в основную сессию, факты — строки игрок x событие с дельтами."""
+        inner = RecordingSession()
+        exporter = ColumnarExporter(str(tmp_path / "facts"))
+        session = exporter.wrap(inner, "statistics")
+        session.save_statistics(_stats(), "2024-05-01 20:00")
+
+        assert inner.ops == [("statistics", "2024-05-01 20:00")]
+        rows = {row["player"]: row for row in session.rows}
+        assert (rows["Alpha"]["honor"], rows["Alpha"]["kills"], rows["Alpha"]["points"]) == (150, 1, 220)
+        assert (rows["Beta"]["honor"], rows["Beta"]["kills"], rows["Beta"]["points"]) == (None, 4, None)
+        assert rows["Beta"]["gear"] is None and rows["Beta"]["class"] is None
+
+    @pytest.mark.parametrize("fmt", ["parquet", "feather"])
+    def test_one_file_per_run_and_date(self, tmp_path, fmt):
+        """Запуск пишет по файлу в раздел каждой даты; разделы читаются как одна таблица."""
+        pa_dataset = pytest.importorskip("pyarrow.dataset")
+        base = tmp_path / "facts"
+        exporter = ColumnarExporter(str(base), fmt=fmt)
+        session = exporter.wrap(RecordingSession(), "attendance")
+        session.save_attendance(["Alpha", " Beta "], "2024-05-01 20:00")
+        session.save_attendance(["Alpha"], "2024-05-02 20:00")
+        assert session.commit()
+
+        dates = sorted(os.listdir(base / "attendance"))
+        assert dates == ["date=2024-05-01", "date=2024-05-02"]
+        assert all(len(os.listdir(base / "attendance" / d)) == 1 for d in dates)
+
+        dataset = pa_dataset.dataset(str(base / "attendance"), format=fmt, partitioning="hive")
+        table = dataset.to_table(filter=pa_dataset.field("date") == "2024-05-02")
+        assert table.column("player").to_pylist() == ["Alpha"]
+
+    def test_failed_commit_skips_export(self, tmp_path, monkeypatch):
+        """Если основная сессия не сохранена, факты не выгружаются."""
+        inner = RecordingSession()
+        monkeypatch.setattr(inner, "commit", lambda: False)
+        exporter = ColumnarExporter(str(tmp_path / "facts"))
+        written = []
+        monkeypatch.setattr(exporter, "write_run", lambda mode, rows: written.append(rows))
+        session = exporter.wrap(inner, "attendance")
+        session.save_attendance(["Alpha"], "2024-05-01 20:00")
+
+        assert not session.commit()
+        assert written == [] and session.rows == []
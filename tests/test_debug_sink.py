@@ -0,0 +1,41 @@
+"""
+Тест фоновой записи отладочных кропов в спрайт.
+"""
+import sys
+import os
+
+import numpy as np
+from PIL import Image
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from raidstat_py.core.debug_sink import DebugSink, debug_image_exists, debug_image_path, SPRITE_NAME, INDEX_NAME
+from raidstat_py.core.history import HistoryManager
+
+
+class TestDebugSink:
+    """Тесты DebugSink."""
+
+    def test_sprite_and_lazy_extraction(self, tmp_path, monkeypatch):
+        """Кропы скриншота пишутся одним спрайтом; кроп извлекается по ссылке при обращении."""
+        monkeypatch.chdir(tmp_path)
+        history = HistoryManager("statistics")
+        sink = DebugSink(history)
+        debug_dir = str(tmp_path / "ScreenShot0001")
+
+        kills = np.zeros((20, 60, 3), np.uint8)
+        refs = sink.write(debug_dir, {'name': np.full((15, 80), 255, np.uint8), 'kills': kills, 'gear': None})
+        sink.drain()
+
+        assert set(refs) == {'name', 'kills'}
+        assert sorted(os.listdir(debug_dir)) == sorted([SPRITE_NAME, INDEX_NAME])
+        assert history.created == [debug_dir]
+
+        path = debug_image_path(refs['kills'])
+        with Image.open(path) as img:
+            assert img.size == (60, 20)
+            assert img.getextrema() == (0, 0)
+        assert debug_image_exists(refs['name'])
+        assert not debug_image_exists(os.path.join(str(tmp_path), "missing", SPRITE_NAME + "#name"))
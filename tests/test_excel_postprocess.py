@@ -0,0 +1,92 @@
+"""
+Тест оформления листа статистики без Excel (openpyxl).
+"""
+import sys
+import os
+import zipfile
+import openpyxl
+from PIL import Image
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from raidstat_py.storage.excel_impl import ExcelStorage
+
+
+def _player(honor_start, honor_end, kills_start, kills_end, image=None):
+    data = {"honor_start": honor_start, "honor_end": honor_end, "kills_start": kills_start,
+            "kills_end": kills_end, "gear": 10, "class": ""}
+    if image:
+        data["debug_images_end"] = {"name": image}
+    return data
+
+
+class TestFinishStatistics:
+    """Тесты finish_statistics и изображений в комментариях."""
+
+    def test_sort_hide_and_comment_images(self, tmp_path, monkeypatch):
+        """Строки отсортированы по очкам (пустые внизу), старые колонки скрыты, изображение в фоне комментария."""
+        monkeypatch.chdir(tmp_path)
+        image = str(tmp_path / "name.png")
+        Image.new("L", (40, 10), 128).save(image)
+
+        storage = ExcelStorage()
+        session = storage.open_session("statistics")
+        session.save_statistics({"Alpha": _player(0, 10, 0, 0)}, "2024-05-01 20:00")
+        session.save_statistics({
+            "Alpha": _player(10, 20, 0, 1),
+            "Beta": _player(None, 5, 0, 0),
+            "Gamma": _player(0, 500, 0, 0, image=image),
+        }, "2024-05-01 21:00", debug_screens=True)
+        assert session.commit()
+
+        ws = openpyxl.load_workbook("Raidstat.xlsx")["Статистика"]
+        assert [ws.cell(row=r, column=6).value for r in range(2, 5)] == ["Gamma", "Alpha", "Beta"]
+        # Формулы перенесенных строк ссылаются на свою строку
+        assert ws.cell(row=2, column=11).value.endswith("B2-A2, \"\")")
+        assert ws.cell(row=3, column=13).value.startswith("=IF(AND(ISNUMBER(L3), ISNUMBER(K3))")
+        assert ws.column_dimensions["H"].hidden and ws.column_dimensions["J"].hidden
+        assert not ws.column_dimensions["K"].hidden
+        assert ws.cell(row=2, column=6).comment is not None
+
+        with zipfile.ZipFile("Raidstat.xlsx") as z:
+            names = z.namelist()
+            vml = z.read("xl/drawings/commentsDrawing1.vml").decode("utf-8")
+            content_types = z.read("[Content_Types].xml").decode("utf-8")
+        assert any(n.startswith("xl/media/") for n in names)
+        assert "xl/drawings/_rels/commentsDrawing1.vml.rels" in names
+        assert 'type="frame"' in vml
+        assert "<v:shape" in vml and "<x:ClientData" in vml and "o:relid=" in vml
+        assert "ns0:" not in vml
+        assert 'Extension="png"' in content_types
+
+    def test_collect_debug_comments_returns_list(self, tmp_path, monkeypatch):
+        """Изображения для комментариев возвращаются списком, книга не хранит их у себя."""
+        monkeypatch.chdir(tmp_path)
+        image = str(tmp_path / "name.png")
+        Image.new("L", (40, 10), 128).save(image)
+        stats = {"Alpha": _player(0, 10, 0, 0), "Gamma": _player(0, 500, 0, 0, image=image)}
+
+        storage = ExcelStorage()
+        wb = storage.load_workbook()
+        storage.apply_statistics(wb, stats, "2024-05-01 20:00", True)
+        comment_images = storage.collect_debug_comments(wb, stats)
+
+        assert len(comment_images) == 7
+        assert {img["name"] for img in comment_images} == {"Gamma"}
+        assert [img["image_path"] for img in comment_images if img["col"] == 6] == [image]
+        assert not hasattr(wb, "_debug_comment_images")
+
+    def test_previous_event_kept_without_cached_values(self, tmp_path, monkeypatch):
+        """Книга с формулами без сохраненных значений не теряет предыдущее событие."""
+        monkeypatch.chdir(tmp_path)
+        storage = ExcelStorage()
+        wb = storage.load_workbook()
+        storage.apply_statistics(wb, {"Alpha": _player(0, 100, 0, 1)}, "2024-05-01 21:00")
+        # Сохранение openpyxl без значений формул
+        wb.save("Raidstat.xlsx")
+        storage.save_statistics({"Alpha": _player(100, 150, 1, 1)}, "2024-05-02 21:00")
+
+        row = list(openpyxl.load_workbook("Raidstat.xlsx")["Статистика"].iter_rows(min_row=2, max_row=2, values_only=True))[0]
+        assert row[7:10] == (100, 1, 170)
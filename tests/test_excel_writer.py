@@ -0,0 +1,97 @@
+"""
+Тест очереди записи ExcelWriter и блокировки файла.
+"""
+import sys
+import os
+import threading
+import openpyxl
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from raidstat_py.storage.excel_impl import ExcelStorage
+from raidstat_py.storage.excel_writer import WriteJob
+from raidstat_py.storage.file_lock import FileLock
+
+
+def _stats(honor_start, honor_end):
+    return {"Alpha": {"honor_start": honor_start, "honor_end": honor_end, "kills_start": 1, "kills_end": 3, "gear": 10, "class": ""}}
+
+
+class TestExcelWriter:
+    """Тесты ExcelWriter."""
+
+    def test_parallel_sessions_keep_both_modes(self, tmp_path, monkeypatch):
+        """Сессии посещаемости и статистики, сохраняемые одновременно, не теряют изменений друг друга."""
+        monkeypatch.chdir(tmp_path)
+        storage = ExcelStorage()
+        attendance = storage.open_session("attendance")
+        statistics = storage.open_session("statistics")
+        attendance.save_attendance(["Alpha", "Beta"], "2024-05-01 20:00")
+        statistics.save_statistics(_stats(100, 150), "2024-05-01 21:00")
+
+        results = []
+        threads = [threading.Thread(target=lambda s=s: results.append(s.commit())) for s in (attendance, statistics)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert results == [True, True]
+        assert not os.path.exists("session_attendance.jsonl") and not os.path.exists("session_statistics.jsonl")
+        wb = openpyxl.load_workbook("Raidstat.xlsx")
+        assert [c.value for c in wb["Посещаемость"][1]] == ["Ник", "2024-05-01 20:00"]
+        assert wb["Статистика"].cell(row=2, column=6).value == "Alpha"
+        assert sorted(storage.get_roster(source="attendance")) == ["Alpha", "Beta"]
+
+    def test_failed_write_keeps_journal(self, tmp_path, monkeypatch):
+        """Если книгу записать не удалось, журнал остается и применяется при следующем открытии."""
+        monkeypatch.chdir(tmp_path)
+        storage = ExcelStorage()
+        write_workbook = storage.write_workbook
+
+        def fail(wb, *args):
+            raise OSError("файл открыт в Excel")
+
+        monkeypatch.setattr(storage, "write_workbook", fail)
+        session = storage.open_session("attendance")
+        session.save_attendance(["Alpha"], "2024-05-01 20:00")
+        assert not session.commit()
+        assert os.path.exists("session_attendance.jsonl")
+
+        monkeypatch.setattr(storage, "write_workbook", write_workbook)
+        storage.open_session("attendance")
+        assert not os.path.exists("session_attendance.jsonl")
+        assert openpyxl.load_workbook("Raidstat.xlsx")["Посещаемость"].max_column == 2
+
+    def test_failed_operation_keeps_journal(self, tmp_path, monkeypatch):
+        """Если упала операция записи, ее сессия не считается сохраненной, а остальные записи пачки сохраняются."""
+        monkeypatch.chdir(tmp_path)
+        storage = ExcelStorage()
+
+        def fail(wb, *args):
+            wb["Посещаемость"].cell(row=1, column=5, value="частичная запись")
+            raise ValueError("ошибка записи статистики")
+
+        monkeypatch.setattr(storage, "apply_statistics", fail)
+        session = storage.open_session("statistics")
+        session.save_statistics(_stats(100, 150), "2024-05-01 21:00")
+        assert not session.commit()
+        assert os.path.exists("session_statistics.jsonl")
+
+        attendance = WriteJob([("attendance", [["Alpha"], "2024-05-01 20:00"])], None)
+        statistics = WriteJob([("statistics", [_stats(100, 150), "2024-05-01 21:00"])], None)
+        storage.writer._write_batch([statistics, attendance])
+        assert attendance.result and not statistics.result
+        ws = openpyxl.load_workbook("Raidstat.xlsx")["Посещаемость"]
+        assert [c.value for c in ws[1]] == ["Ник", "2024-05-01 20:00"]
+
+    def test_file_lock_is_exclusive(self, tmp_path):
+        """Пока блокировка занята, второй захват ждет и завершается по таймауту."""
+        path = str(tmp_path / "Raidstat.xlsx")
+        with FileLock(path):
+            assert not FileLock(path, timeout=0.3, poll=0.05).acquire()
+        lock = FileLock(path, timeout=0.3)
+        assert lock.acquire()
+        lock.release()
@@ -0,0 +1,47 @@
+"""
+Тест кадра скриншота (однократное декодирование, представления без копирования).
+"""
+import sys
+import os
+
+import numpy as np
+import pytest
+from PIL import Image
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from raidstat_py.core.frame import Frame
+
+
+class TestFrame:
+    """Тесты кадра."""
+
+    def test_region_is_readonly_view(self, tmp_path):
+        """Кадр декодируется в оттенки серого, область — представление только для чтения, обрезанное по границам."""
+        path = tmp_path / "Скриншот.png"
+        Image.new("RGB", (40, 20), (200, 200, 200)).save(path)
+
+        frame = Frame.load(str(path))
+        assert frame.shape == (20, 40)
+
+        crop = frame.region(30, 10, 20, 20)
+        assert crop.shape == (10, 10)
+        assert np.shares_memory(crop, frame.pixels)
+        with pytest.raises(ValueError):
+            crop[0, 0] = 0
+
+    def test_pixels_released_after_last_stage(self, tmp_path):
+        """Пиксели освобождаются только после release() последнего этапа."""
+        path = tmp_path / "shot.png"
+        Image.new("RGB", (8, 8)).save(path)
+
+        frame = Frame.load(str(path)).retain()
+        frame.release()
+        assert not frame.released
+        frame.release()
+        assert frame.released
+        with pytest.raises(ValueError):
+            frame.pixels
+        assert Frame.load(str(tmp_path / "missing.png")) is None
@@ -0,0 +1,113 @@
+"""
+Тест журнала запуска (возобновление после сбоя).
+"""
+import sys
+import os
+
+import pytest
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from raidstat_py.core.journal import RunJournal
+from raidstat_py.core.attendance import AttendanceProcessor
+from raidstat_py.utils.config import Config
+
+
+class TestRunJournal:
+    """Тесты журнала запуска."""
+
+    def test_records_survive_reload(self, tmp_path, monkeypatch):
+        """Записи журнала читаются после закрытия без finish (как после сбоя)."""
+        monkeypatch.chdir(tmp_path)
+        journal = RunJournal("statistics")
+        groups = [{"key": "g0", "paths": ["a.jpg", "b.jpg"]}, {"key": "g1", "paths": ["c.jpg"]}]
+        journal.start(str(tmp_path), groups)
+        journal.record_image("g0", "a.jpg", {"name": "Lulnor", "kills": 1, "honor": 2})
+        journal.record_image("g0", "b.jpg", None)
+        journal.record_move("a.jpg", "2026-01-01/a.jpg")
+        journal.record_group("g0", "done", {"processed": 2})
+        journal.close()
+
+        state = RunJournal("statistics").load()
+        assert state["folder"] == os.path.abspath(str(tmp_path))
+        assert state["groups"] == groups
+        assert state["images"]["a.jpg"]["name"] == "Lulnor"
+        assert "b.jpg" in state["images"] and state["images"]["b.jpg"] is None
+        assert state["moves"]["a.jpg"] == "2026-01-01/a.jpg"
+        assert state["group_states"]["g0"]["state"] == "done"
+
+    def test_truncated_line_is_ignored(self, tmp_path, monkeypatch):
+        """Недописанная последняя строка не ломает чтение журнала."""
+        monkeypatch.chdir(tmp_path)
+        journal = RunJournal("attendance")
+        journal.start(str(tmp_path), [{"key": "g0", "paths": ["a.jpg"]}])
+        journal.record_image("g0", "a.jpg", ["Йоныч"])
+        journal.close()
+        with open(journal.filename, 'a', encoding='utf-8') as f:
+            f.write('{"type": "image", "path": "b.j')
+
+        state = journal.load()
+        assert state["images"] == {"a.jpg": ["Йоныч"]}
+
+    def test_finish_removes_journal(self, tmp_path, monkeypatch):
+        """После успешного завершения журнал удаляется."""
+        monkeypatch.chdir(tmp_path)
+        journal = RunJournal("attendance")
+        journal.start(str(tmp_path), [])
+        assert journal.pending_folder() == os.path.abspath(str(tmp_path))
+        journal.finish()
+        assert journal.load() is None
+        assert journal.pending_folder() is None
+
+    def test_attendance_result_recorded_before_move(self, tmp_path, monkeypatch):
+        """Результат скриншота посещаемости записывается, пока оригинал еще на месте."""
+        import numpy as np
+        import cv2
+        monkeypatch.chdir(tmp_path)
+        path = str(tmp_path / "ScreenShot0001.jpg")
+        cv2.imwrite(path, np.zeros((1080, 1920, 3), dtype=np.uint8))
+
+        processor = AttendanceProcessor(Config(), None, None, None)
+        monkeypatch.setattr(processor, "_process_single_cell", lambda *args: ("Alpha", 100, 0, args[4], args[5]))
+        seen = []
+        names = processor.process_image(path, on_recognized=lambda found: seen.append((os.path.exists(path), found)))
+        processor.annotation_writer.drain()
+
+        assert seen and seen[0][0] and "Alpha" in seen[0][1]
+        assert "Alpha" in names
+        assert not os.path.exists(path)
+
+    def test_statistics_saved_with_moved_debug_paths(self, tmp_path, monkeypatch):
+        """Журналы и сессия записи получают пути отладочных изображений после перемещения скриншотов."""
+        import json
+        from raidstat_py.core.statistics import StatisticsProcessor
+        from raidstat_py.core.scanner import scan_directory
+        from raidstat_py.storage.excel_impl import ExcelStorage
+        monkeypatch.chdir(tmp_path)
+        root = tmp_path / "shots"
+        root.mkdir()
+        (root / "ScreenShot0001.jpg").write_bytes(b"img")
+        (root / "ScreenShot0001").mkdir()
+        (root / "ScreenShot0001" / "honor.png").write_bytes(b"png")
+        old_path = str(root / "ScreenShot0001" / "honor.png")
+
+        storage = ExcelStorage()
+        processor = StatisticsProcessor(Config(), None, None, storage, debug_screens=True)
+        processor.session = storage.open_session("statistics")
+        processor.journal.start(str(root), [])
+        records = scan_directory(str(root))
+        stats = {"Alpha": {"honor_start": 100, "honor_end": 150, "kills_start": 1, "kills_end": 3, "gear": 10, "class": "",
+                           "debug_images_end": {"honor": old_path}}}
+        chain = {"prev_group_stats": {"Alpha": dict(stats["Alpha"], debug_images_end={})}, "first_group": False, "processed": 0}
+        processor._persist_group(str(root), "g0", records, stats, [], None, chain)
+        processor.journal.close()
+
+        moved = stats["Alpha"]["debug_images_end"]["honor"]
+        assert moved != old_path and os.path.exists(moved)
+        with open("session_statistics.jsonl", encoding='utf-8') as f:
+            session_ops = [json.loads(line) for line in f]
+        assert session_ops[0]["args"][0]["Alpha"]["debug_images_end"]["honor"] == moved
+        saved = RunJournal("statistics").load()["group_states"]["g0"]
+        assert saved["data"]["stats"]["Alpha"]["debug_images_end"]["honor"] == moved
@@ -0,0 +1,41 @@
+"""
+Тест пакетного распознавания строк (кропы имен в одной полосе).
+"""
+import sys
+import os
+
+import numpy as np
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from raidstat_py.core.ocr import OCRHandler
+
+
+class TestRecognizeLinesBatch:
+    """Тесты recognize_lines_batch."""
+
+    def test_words_mapped_back_by_bbox(self, monkeypatch):
+        """Слова возвращаются к своим кропам по вертикальному положению, внутри строки — слева направо."""
+        ocr = OCRHandler.__new__(OCRHandler)
+        seen = {}
+
+        def fake_run(pil_img, lang, config, cancel_token=None):
+            seen['size'] = pil_img.size
+            seen['config'] = config
+            # Полоса: промежуток 20, кропы высотой 30 — строки начинаются с y=20, 70, 120
+            return {
+                'text': ['Nadsod', 'Lul', 'nor', '', 'мусор'],
+                'conf': [90, 80, 85, -1, 10],
+                'left': [20, 60, 20, 0, 20],
+                'top': [72, 22, 24, 0, 300],
+                'height': [20, 20, 20, 0, 20],
+            }
+
+        monkeypatch.setattr(ocr, '_run_tesseract_data', fake_run)
+        crops = [np.full((30, 100, 3), 255, np.uint8), np.full((30, 80), 255, np.uint8), np.full((30, 90, 3), 255, np.uint8)]
+
+        assert ocr.recognize_lines_batch(crops) == ['nor Lul', 'Nadsod', '']
+        assert seen['size'] == (140, 170)
+        assert '--psm 6' in seen['config']
@@ -0,0 +1,114 @@
+"""
+Тест разбиения Raidstat.xlsx по периодам.
+"""
+import sys
+import os
+import openpyxl
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from raidstat_py.storage.excel_impl import ExcelStorage
+from raidstat_py.storage.partitions import partition_key
+
+
+def _rows(path, sheet):
+    wb = openpyxl.load_workbook(path)
+    return [list(row) for row in wb[sheet].iter_rows(values_only=True)]
+
+
+class TestPartitions:
+    """Тесты ExcelStorage с partition="month"."""
+
+    def test_partition_key(self):
+        """Период события: месяц или сезон (квартал)."""
+        assert partition_key("2024-05-01 20:15", "month") == "2024-05"
+        assert partition_key("2024-05-01 20:15", "season") == "2024-S2"
+        assert partition_key("Рейд", "month") is None
+
+    def test_attendance_rolls_into_month_workbook(self, tmp_path):
+        """Новый месяц переносит лист в Raidstat_<месяц>.xlsx; итоги и ростер остаются в основной книге."""
+        path = str(tmp_path / "Raidstat.xlsx")
+        storage = ExcelStorage(path, partition="month")
+        session = storage.open_session("attendance")
+        session.save_attendance(["Alpha", "Beta"], "2024-04-29 20:00")
+        session.save_attendance(["Alpha"], "2024-04-30 20:00")
+        session.save_attendance(["Gamma"], "2024-05-01 20:00")
+        assert session.commit()
+
+        assert _rows(str(tmp_path / "Raidstat_2024-04.xlsx"), "Посещаемость") == [
+            ["Ник", "2024-04-29 20:00", "2024-04-30 20:00"], ["Alpha", 1, 1], ["Beta", 1, 0]
+        ]
+        assert _rows(path, "Посещаемость") == [["Ник", "2024-05-01 20:00"], ["Gamma", 1]]
+        summary = {row[0]: row[1:3] for row in _rows(path, "Итоги")[1:]}
+        assert summary == {"Alpha": [2, "2024-04-30 20:00"], "Beta": [1, "2024-04-29 20:00"], "Gamma": [1, "2024-05-01 20:00"]}
+
+        reopened = ExcelStorage(path, partition="month")
+        assert sorted(reopened.get_roster(source="attendance")) == ["Alpha", "Beta", "Gamma"]
+
+    def test_statistics_summary_accumulates(self, tmp_path):
+        """Итоги статистики копятся по событиям, в том числе перенесенным в книгу прошлого периода."""
+        path = str(tmp_path / "Raidstat.xlsx")
+        storage = ExcelStorage(path, partition="month")
+        session = storage.open_session("statistics")
+        session.save_statistics({"Alpha": {"honor_start": 0, "honor_end": 100, "kills_start": 0, "kills_end": 1}}, "2024-04-30 21:00")
+        session.save_statistics({"Alpha": {"honor_start": 100, "honor_end": 150, "kills_start": 1, "kills_end": 1}}, "2024-05-01 21:00")
+        assert session.commit()
+
+        archived = _rows(str(tmp_path / "Raidstat_2024-04.xlsx"), "Статистика")
+        assert archived[1][7:] == [100, 1, 170]
+        assert _rows(path, "Статистика")[0][7] == "Хонор 2024-05-01 21:00"
+        assert _rows(path, "Итоги")[1] == ["Alpha", None, None, 2, 150, 1, 220, "2024-05-01 21:00"]
+
+    def test_archived_sheet_keeps_styles_and_comments(self, tmp_path):
+        """Лист закрытого периода переносится с оформлением, комментариями и их рисунками."""
+        from openpyxl.comments import Comment
+        from openpyxl.styles import Font
+        from PIL import Image
+        from raidstat_py.storage.comment_images import embed_comment_images, read_comment_images
+        path = str(tmp_path / "Raidstat.xlsx")
+        storage = ExcelStorage(path, partition="month")
+        session = storage.open_session("statistics")
+        session.save_statistics({"Alpha": {"honor_start": 0, "honor_end": 100, "kills_start": 0, "kills_end": 1}}, "2024-04-30 21:00")
+        assert session.commit()
+
+        image_path = str(tmp_path / "name.png")
+        Image.new("RGB", (20, 10), (200, 10, 10)).save(image_path)
+        wb = openpyxl.load_workbook(path)
+        cell = wb["Статистика"].cell(row=2, column=6)
+        cell.font = Font(bold=True)
+        cell.comment = Comment("", "Raidstat", width=40, height=20)
+        wb.save(path)
+        assert embed_comment_images(path, "Статистика", {(2, 6): image_path}) == 1
+
+        session = storage.open_session("statistics")
+        session.save_statistics({"Alpha": {"honor_start": 100, "honor_end": 150, "kills_start": 1, "kills_end": 1}}, "2024-05-01 21:00")
+        assert session.commit()
+
+        archive_path = str(tmp_path / "Raidstat_2024-04.xlsx")
+        archived = openpyxl.load_workbook(archive_path)["Статистика"].cell(row=2, column=6)
+        assert archived.value == "Alpha" and archived.font.bold
+        assert archived.comment is not None
+        with open(image_path, 'rb') as f:
+            assert read_comment_images(archive_path, "Статистика") == {(2, 6): (".png", f.read())}
+
+    def test_summary_attendance_follows_rebuilt_summary(self, tmp_path):
+        """Посещения в итогах — значения сводки посещаемости, в том числе после ее пересчета."""
+        path = str(tmp_path / "Raidstat.xlsx")
+        storage = ExcelStorage(path, partition="month")
+        session = storage.open_session("attendance")
+        session.save_attendance(["Alpha", "Beta"], "2024-05-01 20:00")
+        session.save_attendance(["Alpha"], "2024-05-02 20:00")
+        assert session.commit()
+
+        # Ручная правка: Alpha не было на втором рейде
+        wb = openpyxl.load_workbook(path)
+        wb["Посещаемость"].cell(row=2, column=3, value=0)
+        wb.save(path)
+        assert storage.rebuild_attendance_summary()
+
+        summary = {row[0]: row[1:3] for row in _rows(path, "Итоги")[1:]}
+        assert summary == {"Alpha": [1, "2024-05-01 20:00"], "Beta": [1, "2024-05-01 20:00"]}
+        attendance = {row[0]: row[2] for row in _rows(path, "Сводка")[1:]}
+        assert attendance == {"Alpha": 1, "Beta": 1}
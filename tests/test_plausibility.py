@@ -0,0 +1,71 @@
+"""
+Тест проверки правдоподобия чисел статистики.
+"""
+import sys
+import os
+
+import cv2
+import pytest
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from raidstat_py.core.plausibility import PlausibilityCheck
+
+SET1 = os.path.join(PROJECT_ROOT, "tests", "fixtures", "screens", "set1")
+# Области полей при масштабе 120% (StatisticsProcessor._get_offsets) и начало окна для set1
+OFFSETS_120 = {'honor': (225, 113, 80, 15), 'kills': (195, 133, 70, 15), 'gear': (167, 72, 58, 15)}
+FRAME_SET1 = (1453, 964)
+
+
+def _crop(filename, field):
+    img = cv2.imread(os.path.join(SET1, filename), cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        pytest.skip(f"Скриншот {filename} не найден")
+    ox, oy, w, h = OFFSETS_120[field]
+    return img[FRAME_SET1[1] + oy:FRAME_SET1[1] + oy + h, FRAME_SET1[0] + ox:FRAME_SET1[0] + ox + w]
+
+
+class TestPlausibilityCheck:
+    """Тесты проверки правдоподобия."""
+
+    def test_length_and_prior(self):
+        """Лишняя цифра, уменьшение хонора/фрагов и скачок ГС — неправдоподобны."""
+        check = PlausibilityCheck({'kills': 52, 'honor': 62, 'gear': 48}, 100, {'kills': 2000, 'honor': 500000, 'gear': 2000})
+        prior = {'kills': 1200, 'honor': 150000, 'gear': 26277}
+
+        assert check.check('kills', 1234, prior) is None
+        assert check.check('kills', 12834, prior) is not None   # рост больше лимита
+        assert check.check('honor', 149000, prior) is not None  # хонор не уменьшается
+        assert check.check('gear', 262777, prior) is not None
+        assert check.check('gear', 123456789) is not None       # не помещается в поле
+        assert check.check('honor', 149000) is None             # без предыдущих значений
+        assert check.check('kills', None, prior) is None
+
+    def test_digit_limit_grows_with_scale(self):
+        """При большем масштабе в то же поле помещается не меньше цифр."""
+        small = PlausibilityCheck({'gear': 48}, 100, {})
+        large = PlausibilityCheck({'gear': 63}, 130, {})
+        assert large.max_digits['gear'] >= small.max_digits['gear'] >= 5
+
+    def test_extra_digit_without_prior(self):
+        """Лишняя цифра отклоняется по самой области поля, без предыдущих значений."""
+        check = PlausibilityCheck({field: rect[2] for field, rect in OFFSETS_120.items()}, 120, {})
+        kills = _crop("ScreenShot0067.jpg", 'kills')  # на скриншоте 16133
+
+        assert check.check('kills', 16133, crop=kills) is None
+        assert check.check('kills', 161383, crop=kills) is not None
+        # По одной ширине области (7 цифр при 120%) лишнюю цифру не отличить
+        assert check.check('kills', 161383) is None
+
+    @pytest.mark.parametrize("filename, values", [
+        ("ScreenShot0067.jpg", {'kills': 16133, 'honor': 411243, 'gear': 24187}),
+        ("ScreenShot0071.jpg", {'kills': 104348, 'honor': 2311900, 'gear': 27183}),
+        ("ScreenShot0060.jpg", {'kills': 48887, 'honor': 1259345, 'gear': 23407}),
+    ])
+    def test_digits_shown_matches_screenshots(self, filename, values):
+        """Число видимых цифр совпадает с длиной значений на скриншотах."""
+        check = PlausibilityCheck({}, 120, {})
+        for field, value in values.items():
+            assert check.digits_shown(field, _crop(filename, field)) == len(str(value))
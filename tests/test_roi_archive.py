@@ -0,0 +1,61 @@
+"""
+Тест архива областей обработанных скриншотов.
+"""
+import sys
+import os
+
+import numpy as np
+from PIL import Image
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from raidstat_py.core.roi_archive import store_processed, strip_path
+from raidstat_py.core.frame import Frame
+from raidstat_py.core.history import HistoryManager
+from raidstat_py.core.scanner import scan_directory
+
+
+class TestRoiArchive:
+    """Тесты архива областей."""
+
+    def test_archive_replay_and_revert(self, tmp_path, monkeypatch):
+        """Архив читается как скриншот, сканируется вместо полосы и откатывается в PNG исходного размера без потерь."""
+        monkeypatch.chdir(tmp_path)
+        source = str(tmp_path / "ScreenShot0001.jpg")
+        pixels = np.zeros((100, 200, 3), np.uint8)
+        pixels[10:20, 30:60] = 200
+        pixels[12, 35] = 17
+        Image.fromarray(pixels).save(source, quality=100)
+        with Image.open(source) as img:
+            stored = np.array(img)
+        os.utime(source, (1000, 1000))
+        archive_dir = tmp_path / "2024-05-01"
+        archive_dir.mkdir()
+
+        manifest, moves = store_processed(source, str(archive_dir), regions=[(30, 10, 30, 10)])
+        history = HistoryManager("statistics")
+        for src, dest, kind in moves:
+            history.add_move(src, dest, kind)
+        history.save()
+
+        assert not os.path.exists(source)
+        assert os.path.getmtime(manifest) == 1000
+        assert [os.path.basename(r.path) for r in scan_directory(str(archive_dir))] == ["ScreenShot0001.roi.json"]
+
+        frame = Frame.load(manifest)
+        assert frame.shape == (100, 200)
+        assert frame.pixels[15, 45] == 200 and frame.pixels[90, 190] == 0
+
+        history.revert()
+        assert not os.path.exists(manifest) and not os.path.exists(strip_path(manifest))
+        restored = str(tmp_path / "ScreenShot0001.png")
+        assert not os.path.exists(source)
+        with Image.open(restored) as img:
+            assert img.size == (200, 100)
+            restored_pixels = np.array(img)
+        # Области восстановлены точно, остальное — черное
+        assert np.array_equal(restored_pixels[10:20, 30:60], stored[10:20, 30:60])
+        assert restored_pixels[90, 190].tolist() == [0, 0, 0]
+        assert os.path.getmtime(restored) == 1000
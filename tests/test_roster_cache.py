@@ -0,0 +1,63 @@
+"""
+Тест кеша ростера ExcelStorage.
+"""
+import sys
+import os
+import openpyxl
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from raidstat_py.storage.excel_impl import ExcelStorage
+
+
+class TestRosterCache:
+    """Тесты get_roster с кешем."""
+
+    def test_writes_update_cache_without_reparse(self, tmp_path, monkeypatch):
+        """После save_attendance ростер берется из кеша, книга не перечитывается."""
+        storage = ExcelStorage(str(tmp_path / "Raidstat.xlsx"))
+        storage.save_attendance(["Alpha", " Beta "], "01.05.2024 20:00")
+        storage.get_roster(source="statistics")
+
+        def fail(source):
+            raise AssertionError("книга не должна перечитываться")
+        monkeypatch.setattr(storage, "_read_roster", fail)
+
+        assert sorted(storage.get_roster(source="attendance")) == ["Alpha", "Beta"]
+        assert storage.get_roster(source="statistics") == []
+
+    def test_external_change_invalidates(self, tmp_path):
+        """Изменение файла другим приложением сбрасывает кеш; читается только колонка 'Ник'."""
+        path = str(tmp_path / "Raidstat.xlsx")
+        storage = ExcelStorage(path)
+        assert storage.get_roster(source="statistics") == []
+
+        wb = openpyxl.load_workbook(path)
+        ws = wb["Статистика"]
+        ws.cell(row=2, column=6, value="  Gamma ")
+        ws.cell(row=2, column=8, value="Не ник")
+        ws.cell(row=3, column=6, value=12345)
+        wb.save(path)
+        os.utime(path, (1, 1))
+
+        assert sorted(storage.get_roster(source="statistics")) == ["12345", "Gamma"]
+
+    def test_save_after_lock_release_invalidates(self, tmp_path, monkeypatch):
+        """Книга, сохраненная другим процессом сразу после снятия блокировки, не попадает в кеш со старыми никами."""
+        from raidstat_py.storage import excel_writer
+        path = str(tmp_path / "Raidstat.xlsx")
+        storage = ExcelStorage(path)
+
+        class ExternalSaveLock(excel_writer.FileLock):
+            def __exit__(self, *args):
+                super().__exit__(*args)
+                wb = openpyxl.load_workbook(path)
+                wb["Посещаемость"].cell(row=10, column=1, value="Gamma")
+                wb.save(path)
+                os.utime(path, (1, 1))
+
+        monkeypatch.setattr(excel_writer, "FileLock", ExternalSaveLock)
+        storage.save_attendance(["Alpha"], "01.05.2024 20:00")
+        assert sorted(storage.get_roster(source="attendance")) == ["Alpha", "Gamma"]
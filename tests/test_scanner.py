@@ -0,0 +1,77 @@
+"""
+Тест сканирования папки со скриншотами.
+"""
+import sys
+import os
+
+import pytest
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from raidstat_py.core.scanner import scan_directory, file_hash
+from raidstat_py.core.history import HistoryManager
+
+
+def _touch(path, content=b"img", mtime=None):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+class TestScanDirectory:
+    """Тесты scan_directory."""
+
+    def test_depth_and_filters(self, tmp_path):
+        """Учитывается глубина, расширения и папка errors."""
+        root = str(tmp_path)
+        _touch(os.path.join(root, "a.jpg"), mtime=1000)
+        _touch(os.path.join(root, "notes.txt"))
+        _touch(os.path.join(root, "raid", "b.PNG"), mtime=2000)
+        _touch(os.path.join(root, "raid", "deep", "c.jpg"))
+        _touch(os.path.join(root, "errors", "d.jpg"))
+
+        flat = scan_directory(root)
+        assert [os.path.basename(r.path) for r in flat] == ["a.jpg"]
+        assert flat[0].depth == 0 and flat[0].mtime == 1000 and flat[0].size == 3
+
+        one_level = scan_directory(root, max_depth=1)
+        assert sorted(os.path.basename(r.path) for r in one_level) == ["a.jpg", "b.PNG"]
+
+        unlimited = scan_directory(root, max_depth=None)
+        assert sorted(os.path.basename(r.path) for r in unlimited) == ["a.jpg", "b.PNG", "c.jpg"]
+        assert {os.path.basename(r.path): r.depth for r in unlimited}["c.jpg"] == 2
+
+    def test_exclude_hashes(self, tmp_path):
+        """Уже обработанные файлы отфильтровываются по хешу содержимого."""
+        root = str(tmp_path)
+        _touch(os.path.join(root, "old.jpg"), content=b"processed")
+        _touch(os.path.join(root, "new.jpg"), content=b"fresh")
+
+        records = scan_directory(root, exclude_hashes={file_hash(os.path.join(root, "old.jpg"))})
+        assert [os.path.basename(r.path) for r in records] == ["new.jpg"]
+
+    def test_processed_hashes_from_history(self, tmp_path, monkeypatch):
+        """Хеши перемещенных скриншотов сохраняются в истории, откат запуска их забывает."""
+        monkeypatch.chdir(tmp_path)
+        root = str(tmp_path / "shots")
+        src = os.path.join(root, "a.jpg")
+        dest = os.path.join(root, "2024-05-01", "a.jpg")
+        _touch(src, content=b"processed")
+        content_hash = file_hash(src)
+        os.makedirs(os.path.dirname(dest))
+        os.replace(src, dest)
+
+        history = HistoryManager("attendance")
+        history.add_move(src, dest, content_hash=content_hash)
+        history.save()
+
+        # Тот же скриншот, скопированный в папку повторно
+        _touch(os.path.join(root, "copy.jpg"), content=b"processed")
+        assert scan_directory(root, exclude_hashes=HistoryManager("attendance").processed_hashes()) == []
+
+        HistoryManager("attendance").revert()
+        assert HistoryManager("attendance").processed_hashes() == set()
@@ -0,0 +1,108 @@
+"""
+Тест хранилища SQLite и выгрузки в Excel.
+"""
+import sys
+import os
+import sqlite3
+import openpyxl
+from contextlib import closing
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from raidstat_py.storage.sqlite_impl import SqliteStorage
+
+
+def _stats(honor_start, honor_end, kills_start, kills_end):
+    return {"honor_start": honor_start, "honor_end": honor_end, "kills_start": kills_start,
+            "kills_end": kills_end, "gear": 15000, "class": "Маг"}
+
+
+class TestSqliteStorage:
+    """Тесты SqliteStorage."""
+
+    def test_roster_by_source(self, tmp_path):
+        """Ростер каждого режима — игроки, у которых есть факты этого режима."""
+        storage = SqliteStorage(str(tmp_path / "Raidstat.db"))
+        session = storage.open_session("attendance")
+        session.save_attendance(["Alpha", " Beta ", ""], "2024-05-01 20:00")
+        assert session.commit()
+        storage.save_statistics({"Gamma": _stats(100, 300, 1, 3)}, "2024-05-01 21:00")
+
+        assert sorted(storage.get_roster(source="attendance")) == ["Alpha", "Beta"]
+        assert storage.get_roster(source="statistics") == ["Gamma"]
+
+    def test_export_excel(self, tmp_path):
+        """Выгрузка повторяет раскладку Raidstat.xlsx: дельты события, сортировка по очкам, 1/0 посещаемости."""
+        storage = SqliteStorage(str(tmp_path / "Raidstat.db"))
+        storage.save_attendance(["Alpha"], "2024-05-01 20:00")
+        storage.save_attendance(["Beta"], "2024-05-02 20:00")
+        storage.save_statistics({"Alpha": _stats(100, 200, 0, 0)}, "2024-05-01 21:00")
+        storage.save_statistics({"Alpha": _stats(200, 250, 0, 1), "Beta": _stats(0, "", 0, 5)}, "2024-05-02 21:00")
+
+        path = storage.export_excel(str(tmp_path / "export.xlsx"))
+        wb = openpyxl.load_workbook(path)
+
+        att = [list(row) for row in wb["Посещаемость"].iter_rows(values_only=True)]
+        assert att == [["Ник", "2024-05-01 20:00", "2024-05-02 20:00"], ["Alpha", 1, 0], ["Beta", None, 1]]
+
+        ws = wb["Статистика"]
+        rows = [list(row) for row in ws.iter_rows(min_row=2, values_only=True)]
+        assert [row[5] for row in rows] == ["Alpha", "Beta"]
+        assert rows[0][7:10] == [100, 0, 100]
+        # Последнее событие — формулами от колонок A-D, как в Raidstat.xlsx
+        assert rows[0][10:] == ['=IF(AND(ISNUMBER(A2), ISNUMBER(B2)), B2-A2, "")',
+                                '=IF(AND(ISNUMBER(C2), ISNUMBER(D2)), D2-C2, "")',
+                                '=IF(AND(ISNUMBER(L2), ISNUMBER(K2)), L2*70+K2, "")']
+        assert rows[1][:4] == [0, None, 0, 5] and rows[1][7:10] == [None, None, None]
+        assert ws.column_dimensions["H"].hidden
+        assert not ws.column_dimensions["K"].hidden
+        assert [row[:3] for row in wb["Сводка"].iter_rows(min_row=2, values_only=True)] == [("Alpha", 2, 1), ("Beta", 1, 1)]
+
+    def test_resave_replaces_event(self, tmp_path):
+        """Повторная запись события с тем же названием заменяет его факты, а не добавляет второе событие."""
+        storage = SqliteStorage(str(tmp_path / "Raidstat.db"))
+        storage.save_attendance(["Alpha", "Beta"], "2024-05-01 20:00")
+        storage.save_attendance(["Alpha"], "2024-05-01 20:00")
+
+        with storage._connect() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 1
+        assert storage.get_roster(source="attendance") == ["Alpha"]
+
+    def test_existing_duplicates_removed(self, tmp_path):
+        """В базе прошлой версии повторы событий схлопываются до последнего, затем появляется уникальный индекс."""
+        path = str(tmp_path / "Raidstat.db")
+        storage = SqliteStorage(path)
+        with storage._connect() as conn:
+            with conn:
+                conn.execute("DROP INDEX idx_events_kind_title")
+        for names in (["Alpha"], ["Beta"]):
+            with storage._connect() as conn:
+                with conn:
+                    conn.execute("INSERT INTO events (kind, title, time) VALUES ('attendance', '2024-05-01 20:00', 0)")
+                    event_id = conn.execute("SELECT MAX(id) FROM events").fetchone()[0]
+                    player_id = storage._player_ids(conn, names)[names[0]]
+                    conn.execute("INSERT INTO attendance (event_id, player_id) VALUES (?, ?)", (event_id, player_id))
+
+        storage = SqliteStorage(path)
+        with storage._connect() as conn:
+            assert conn.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 1
+        assert storage.get_roster(source="attendance") == ["Beta"]
+        # Копия базы до удаления повторов
+        with closing(sqlite3.connect(path + ".bak")) as backup:
+            assert backup.execute("SELECT COUNT(*) FROM events").fetchone()[0] == 2
+            assert backup.execute("SELECT COUNT(*) FROM attendance").fetchone()[0] == 2
+
+    def test_failed_save_fails_commit(self, tmp_path, monkeypatch):
+        """Если транзакция не прошла, commit() сессии возвращает False."""
+        storage = SqliteStorage(str(tmp_path / "Raidstat.db"))
+
+        def fail(*args):
+            raise RuntimeError("база заблокирована")
+
+        monkeypatch.setattr(storage, "_add_event", fail)
+        session = storage.open_session("statistics")
+        session.save_statistics({"Alpha": _stats(100, 300, 1, 3)}, "2024-05-01 21:00")
+        assert not session.commit()
+        assert storage.get_roster(source="statistics") == []
@@ -77,6 +77,12 @@ def teardown_module():
     pass
 
 
+@pytest.fixture(autouse=True)
+def work_in_tmp(tmp_path, monkeypatch):
+    """Книга, конфиг, история и кеши программы создаются в рабочей папке — в тестах это tmp_path, а не корень проекта."""
+    monkeypatch.chdir(tmp_path)
+
+
 def prepare_work_dir(set_name):
     """Подготовка рабочей директории для конкретного набора."""
     src_dir = os.path.join(FIXTURES_ROOT, set_name)
@@ -156,8 +162,8 @@ def check_processor_results(processor, work_dir, count, start_time):
     assert total_groups > 0, "Должна быть создана хотя бы одна группа"
     
     # Проверяем создание Excel файла
-    # В текущей реализации файл создается в корне проекта
-    excel_path = os.path.join(PROJECT_ROOT, "Raidstat.xlsx")
+    # Файл создается в текущей рабочей папке (в тестах — tmp_path)
+    excel_path = os.path.abspath("Raidstat.xlsx")
     assert os.path.exists(excel_path), "Файл Raidstat.xlsx должен быть создан"
     print(f"\n✓ Raidstat.xlsx создан успешно.")
     
@@ -198,10 +204,11 @@ class TestStatisticsProcessor:
         
         print(f"\nЗапуск обработки статистики (Set 1)...")
         
+        # Числа распознаются только на самом позднем скриншоте игрока, остальные — дубли
         expected_logs = [
             # Group 1
             "ScreenShot0067.jpg: {'name': 'Мятныйкотик', 'class': 'Траппер', 'kills': 16133, 'honor': 411243, 'gear': 24187}",
-            "ScreenShot0065.jpg: {'name': 'Бишамоныч', 'class': 'Ведьмак', 'kills': 7419, 'honor': 159457, 'gear': 22943}",
+            "ScreenShot0065.jpg Бишамоныч (дубль)",
             # Глэчик (ScreenShot0062 и ScreenShot0106 могут меняться местами)
             "ScreenShot0062.jpg",
             "ScreenShot0106.jpg",
@@ -209,44 +216,44 @@ class TestStatisticsProcessor:
             "{'name': 'Глэчик', 'class': 'Де ——————————= =', 'kills': None, 'honor': 1, 'gear': None}",
             "ScreenShot0060.jpg: {'name': 'Madzxc', 'class': 'Судья', 'kills': 48887, 'honor': 1259345, 'gear': 23407}",
             "ScreenShot0059.jpg: {'name': 'Lulnor', 'class': 'Судья', 'kills': 40825, 'honor': 1119032, 'gear': 26277}",
-            "ScreenShot0064.jpg: {'name': 'Nadsod', 'class': 'Гладиатор', 'kills': 89181, 'honor': 2400098, 'gear': 22909}",
+            "ScreenShot0064.jpg Nadsod (дубль)",
             "ScreenShot0061.jpg: {'name': 'Испепеление', 'class': 'Атаман', 'kills': 28257, 'honor': 810150, 'gear': 21550}",
             "ScreenShot0071.jpg: {'name': 'Посолите', 'class': 'Сказитель', 'kills': 104348, 'honor': 2311900, 'gear': 27183}",
             "ScreenShot0056.jpg: {'name': 'Lycosidae', 'class': 'Чародей', 'kills': 76386, 'honor': 1825329, 'gear': 26241}",
             "ScreenShot0063.jpg: {'name': 'Sarinn', 'class': 'Судья', 'kills': 57096, 'honor': 1409743, 'gear': 25538}",
-            "ScreenShot0066.jpg: {'name': 'Дураканин', 'class': 'Сказитель', 'kills': 66794, 'honor': 1420995, 'gear': 28614}",
-            "ScreenShot0070.jpg: {'name': 'Могильшик', 'class': 'Похититель', 'kills': 18519, 'honor': 387514, 'gear': 23804}",
+            "ScreenShot0066.jpg Дураканин (дубль)",
+            "ScreenShot0070.jpg Могильшик (дубль)",
             "ScreenShot0068.jpg: {'name': 'Takakotoriymura', 'class': 'Флибустьер', 'kills': 10067, 'honor': 250330, 'gear': 24291}",
             "ScreenShot0058.jpg: {'name': 'Электроникк', 'class': 'Флибустьер', 'kills': 51830, 'honor': 1419759, 'gear': 28841}",
-            "ScreenShot0069.jpg: {'name': 'Сырнаяполюци', 'class': 'Траппер', 'kills': 19721, 'honor': 465978, 'gear': 24311}",
-            "ScreenShot0073.jpg Бишамоныч (дубль)",
-            "ScreenShot0075.jpg Дураканин (дубль)",
-            "ScreenShot0074.jpg Nadsod (дубль)",
-            "ScreenShot0078.jpg Могильшик (дубль)",
-            "ScreenShot0077.jpg Сырнаяполюци (дубль)",
+            "ScreenShot0069.jpg Сырнаяполюци (дубль)",
+            "ScreenShot0073.jpg: {'name': 'Бишамоныч'",
+            "ScreenShot0075.jpg: {'name': 'Дураканин'",
+            "ScreenShot0074.jpg: {'name': 'Nadsod'",
+            "ScreenShot0078.jpg: {'name': 'Могильшик'",
+            "ScreenShot0077.jpg: {'name': 'Сырнаяполюци'",
             "ScreenShot0072.jpg: {'name': 'Kennzie', 'class': 'Летописец', 'kills': 33081, 'honor': 566328, 'gear': 25750}",
             "ScreenShot0076.jpg: {'name': 'Ggbst', 'class': 'Флибустьер', 'kills': 84141, 'honor': 2021210, 'gear': 27716}",
             "ScreenShot0079.jpg: {'name': 'Reykoow', 'class': 'Флибустьер', 'kills': 26373, 'honor': 692891, 'gear': 22137}",
             # Group 2
-            "ScreenShot0088.jpg: {'name': 'Nadsod', 'class': 'Гладиатор', 'kills': 89214, 'honor': 2401042, 'gear': 22909}",
-            "ScreenShot0084.jpg: {'name': 'Madzxc', 'class': 'Судья', 'kills': 48907, 'honor': 1259872, 'gear': 23407}",
+            "ScreenShot0088.jpg Nadsod (дубль)",
+            "ScreenShot0084.jpg Madzxc (дубль)",
             "ScreenShot0091.jpg: {'name': 'Reykoow', 'class': 'Флибустьер', 'kills': 26451, 'honor': 694604, 'gear': 22137}",
             "ScreenShot0083.jpg: {'name': 'Электроникк', 'class': 'Сказитель', 'kills': 51922, 'honor': 1421655, 'gear': 28742}",
             "ScreenShot0085.jpg: {'name': 'Lulnor', 'class': 'Судья', 'kills': 40915, 'honor': 1120935, 'gear': 26277}",
-            "ScreenShot0089.jpg: {'name': 'Бишамоныч', 'class': 'Дервиш', 'kills': 7450, 'honor': 160058, 'gear': 22943}",
+            "ScreenShot0089.jpg Бишамоныч (дубль)",
             "ScreenShot0092.jpg: {'name': 'Мятныйкотик', 'class': 'Траппер', 'kills': 16234, 'honor': 413587, 'gear': 24187}",
             "ScreenShot0098.jpg: {'name': 'Могильшик', 'class': 'Траппер', 'kills': 18544, 'honor': 387947, 'gear': 25064}",
             "ScreenShot0090.jpg: {'name': 'Посолите', 'class': 'Сказитель', 'kills': 104430, 'honor': 2314057, 'gear': 27183}",
             "ScreenShot0093.jpg: {'name': 'Takakotortymura', 'class': 'Флибустьер', 'kills': 10127, 'honor': 251700, 'gear': 24291}",
-            "ScreenShot0100.jpg Бишамоныч (дубль)",
+            "ScreenShot0100.jpg: {'name': 'Бишамоныч'",
             "ScreenShot0094.jpg: {'name': 'Ggbst', 'class': 'Флибустьер', 'kills': 84207, 'honor': 2022682, 'gear': 27716}",
-            "ScreenShot0101.jpg Nadsod (дубль)",
+            "ScreenShot0101.jpg: {'name': 'Nadsod'",
             "ScreenShot0099.jpg: {'name': 'Kennzie', 'class': 'Летописец', 'kills': 33107, 'honor': 566717, 'gear': 25750}",
-            "ScreenShot0096.jpg: {'name': 'Цебобрик', 'class': 'Флибустьер', 'kills': 5232, 'honor': 133100, 'gear': 22636}",
+            "ScreenShot0096.jpg Цебобрик (дубль)",
             "ScreenShot0095.jpg: {'name': 'Сырнаяполюци', 'class': 'Траппер', 'kills': 19766, 'honor': 467051, 'gear': 24311}",
             "ScreenShot0082.jpg: {'name': 'Lycosidae', 'class': 'Чародей', 'kills': 76413, 'honor': 1825937, 'gear': 26241}",
-            "ScreenShot0104.jpg Цебобрик (дубль)",
-            "ScreenShot0105.jpg Madzxc (дубль)",
+            "ScreenShot0104.jpg: {'name': 'Цебобрик'",
+            "ScreenShot0105.jpg: {'name': 'Madzxc'",
             "ScreenShot0103.jpg: {'name': 'Applemanzv', 'class': 'Наемник', 'kills': 18682, 'honor': 513640, 'gear': 25713}",
             "ScreenShot0102.jpg: {'name': 'Sarinn', 'class': 'Судья', 'kills': 57135, 'honor': 1410361, 'gear': 25525}",
             
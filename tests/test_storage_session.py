@@ -0,0 +1,107 @@
+"""
+Тест сессии записи ExcelSession.
+"""
+import sys
+import os
+import openpyxl
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from raidstat_py.storage.excel_impl import ExcelStorage
+
+
+def _stats(honor_start, honor_end):
+    return {"Alpha": {"honor_start": honor_start, "honor_end": honor_end, "kills_start": 1, "kills_end": 3, "gear": 10, "class": ""}}
+
+
+class TestExcelSession:
+    """Тесты ExcelSession."""
+
+    def test_single_save_freezes_previous_event(self, tmp_path, monkeypatch):
+        """Несколько событий — одно сохранение; предыдущее событие заморожено значениями."""
+        monkeypatch.chdir(tmp_path)
+        storage = ExcelStorage()
+        saves = []
+        write_workbook = storage.write_workbook
+        monkeypatch.setattr(storage, "write_workbook", lambda wb, *args: saves.append(1) or write_workbook(wb, *args))
+
+        session = storage.open_session("statistics")
+        session.save_statistics(_stats(100, 150), "2024-05-01 20:00")
+        session.save_statistics(_stats(150, 400), "2024-05-01 21:00")
+        assert saves == []
+        assert os.path.exists("session_statistics.jsonl")
+
+        assert session.commit()
+        assert len(saves) == 1
+        assert not os.path.exists("session_statistics.jsonl")
+
+        row = [c.value for c in openpyxl.load_workbook("Raidstat.xlsx")["Статистика"][2]]
+        assert row[7:10] == [50, 2, 190]
+        assert str(row[12]).startswith("=IF(")
+        assert storage.get_roster() == ["Alpha"]
+
+    def test_recovers_uncommitted_operations(self, tmp_path, monkeypatch):
+        """Операции сессии, прерванной до commit, записываются при открытии следующей сессии."""
+        monkeypatch.chdir(tmp_path)
+        storage = ExcelStorage()
+        session = storage.open_session("attendance")
+        session.save_attendance(["Alpha"], "2024-05-01 20:00")
+        session.save_attendance(["Beta"], "2024-05-02 20:00")
+        # Сбой: книга не сохранена
+        session._file.close()
+
+        assert openpyxl.load_workbook("Raidstat.xlsx")["Посещаемость"].max_column == 1
+        storage.open_session("attendance")
+        assert not os.path.exists("session_attendance.jsonl")
+
+        rows = list(openpyxl.load_workbook("Raidstat.xlsx")["Посещаемость"].iter_rows(values_only=True))
+        assert rows[0] == ("Ник", "2024-05-01 20:00", "2024-05-02 20:00")
+        assert sorted(r[0] for r in rows[1:]) == ["Alpha", "Beta"]
+
+        # Повторное открытие ничего не дописывает
+        storage.open_session("attendance")
+        assert openpyxl.load_workbook("Raidstat.xlsx")["Посещаемость"].max_column == 3
+
+    def test_recovers_after_workbook_saved_elsewhere(self, tmp_path, monkeypatch):
+        """Книга, сохраненная другим режимом после сбоя, не считается сохраненной с операциями сессии."""
+        monkeypatch.chdir(tmp_path)
+        storage = ExcelStorage()
+        session = storage.open_session("attendance")
+        session.save_attendance(["Alpha"], "2024-05-01 20:00")
+
+        # Сбой во время сохранения: журнал остается в том виде, в каком был в момент записи книги
+        def crash(*args):
+            raise OSError("процесс завершен")
+
+        with monkeypatch.context() as m:
+            m.setattr(storage, "commit_workbook", crash)
+            m.setattr(session, "_rewrite_journal", lambda ops: None)
+            m.setattr(session, "_reset", lambda remove_journal: None)
+            assert not session.commit()
+        session._file.close()
+
+        # Книгу сохраняет запись другого режима — время и размер файла меняются
+        storage.writer.write([("statistics", [_stats(100, 150), "2024-05-01 21:00"])])
+        assert os.path.exists("session_attendance.jsonl")
+
+        storage.open_session("attendance")
+        assert not os.path.exists("session_attendance.jsonl")
+        ws = openpyxl.load_workbook("Raidstat.xlsx")["Посещаемость"]
+        assert [c.value for c in ws[1]] == ["Ник", "2024-05-01 20:00"]
+
+    def test_saved_journal_not_replayed(self, tmp_path, monkeypatch):
+        """Журнал с отметкой о сохранении (сбой до его удаления) удаляется без повторной записи."""
+        monkeypatch.chdir(tmp_path)
+        storage = ExcelStorage()
+        session = storage.open_session("attendance")
+        session.save_attendance(["Alpha"], "2024-05-01 20:00")
+        monkeypatch.setattr(session, "_reset", lambda remove_journal: None)
+        assert session.commit()
+        session._file.close()
+        assert os.path.exists("session_attendance.jsonl")
+
+        storage.open_session("attendance")
+        assert not os.path.exists("session_attendance.jsonl")
+        assert openpyxl.load_workbook("Raidstat.xlsx")["Посещаемость"].max_column == 2
@@ -0,0 +1,106 @@
+"""
+Тест источников времени скриншотов.
+"""
+import sys
+import os
+import json
+from datetime import datetime
+
+# Добавляем корень проекта в путь
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, PROJECT_ROOT)
+
+from raidstat_py.core.scanner import scan_directory
+from raidstat_py.core import timestamps
+from raidstat_py.core.timestamps import resolve_timestamps, sort_key, split_groups, MANIFEST_NAME, CACHE_NAME
+
+
+def _touch(path, mtime):
+    with open(path, 'wb') as f:
+        f.write(b"img")
+    os.utime(path, (mtime, mtime))
+
+
+class TestResolveTimestamps:
+    """Тесты resolve_timestamps."""
+
+    def test_manifest_filename_and_sequence(self, tmp_path, monkeypatch):
+        """Манифест важнее имени файла; при одинаковом mtime порядок — по номеру скриншота."""
+        monkeypatch.chdir(tmp_path)
+        root = str(tmp_path)
+        # Все файлы скопированы одновременно — mtime совпадает
+        for name in ["ScreenShot0010.jpg", "ScreenShot0009.jpg", "ScreenShot_2024-05-01_20-15-03.jpg"]:
+            _touch(os.path.join(root, name), 5000)
+        with open(os.path.join(root, MANIFEST_NAME), 'w', encoding='utf-8') as f:
+            json.dump({"ScreenShot0010.jpg": "2024-05-01 21:00:00"}, f)
+
+        records = {os.path.basename(r.path): r for r in resolve_timestamps(scan_directory(root))}
+        assert records["ScreenShot0010.jpg"].mtime == datetime(2024, 5, 1, 21, 0, 0).timestamp()
+        assert records["ScreenShot_2024-05-01_20-15-03.jpg"].mtime == datetime(2024, 5, 1, 20, 15, 3).timestamp()
+        assert records["ScreenShot0009.jpg"].mtime == 5000
+        assert records["ScreenShot0010.jpg"].source == "manifest"
+
+        plain = sorted(resolve_timestamps(scan_directory(root), "mtime"), key=sort_key)
+        assert [os.path.basename(r.path) for r in plain][:2] == ["ScreenShot_2024-05-01_20-15-03.jpg", "ScreenShot0009.jpg"]
+
+    def test_cache_skips_exif(self, tmp_path, monkeypatch):
+        """Повторный запуск берет время из кеша программы и не читает файлы заново; в папку скриншотов кеш не пишется."""
+        app_dir = tmp_path / "app"
+        app_dir.mkdir()
+        monkeypatch.chdir(app_dir)
+        root = str(tmp_path / "shots")
+        os.makedirs(root)
+        _touch(os.path.join(root, "ScreenShot0001.jpg"), 5000)
+        calls = []
+        monkeypatch.setattr(timestamps, "_read_exif_time", lambda path: calls.append(path) or 7000.0)
+
+        first = resolve_timestamps(scan_directory(root), "exif")
+        second = resolve_timestamps(scan_directory(root), "exif")
+        assert first[0].mtime == second[0].mtime == 7000.0
+        assert len(calls) == 1
+        assert os.path.exists(app_dir / CACHE_NAME)
+        assert os.listdir(root) == ["ScreenShot0001.jpg"]
+
+    def test_copied_folder_grouped_by_sequence(self, tmp_path, monkeypatch):
+        """Скопированная папка (mtime совпадает, манифеста нет): события разделяются пропусками в номерах."""
+        monkeypatch.chdir(tmp_path)
+        root = str(tmp_path / "shots")
+        os.makedirs(root)
+        numbers = [56, 57, 59, 60, 61, 140, 141, 143, 300]
+        for number in reversed(numbers):
+            _touch(os.path.join(root, f"ScreenShot{number:04d}.jpg"), 5000)
+
+        records = sorted(resolve_timestamps(scan_directory(root)), key=sort_key)
+        assert {r.source for r in records} == {"sequence"}
+        # Дата событий — от времени файлов, порядок — по номерам
+        assert all(5000 <= r.mtime < 5001 for r in records)
+
+        groups = split_groups(records, 15 * 60, 10)
+        assert [[int(os.path.basename(r.path)[10:14]) for r in group] for group in groups] == [
+            [56, 57, 59, 60, 61], [140, 141, 143], [300]
+        ]
+
+    def test_original_times_keep_time_grouping(self, tmp_path, monkeypatch):
+        """С настоящим временем изменения номера не используются: группы — по max_diff."""
+        monkeypatch.chdir(tmp_path)
+        root = str(tmp_path)
+        for number, mtime in [(1, 1000), (50, 1100), (51, 5000)]:
+            _touch(os.path.join(root, f"ScreenShot{number:04d}.jpg"), mtime)
+
+        records = sorted(resolve_timestamps(scan_directory(root)), key=sort_key)
+        assert [r.source for r in records] == [None, None, None]
+        assert [len(group) for group in split_groups(records, 15 * 60, 10)] == [2, 1]
+
+    def test_single_resaved_file_keeps_real_times(self, tmp_path, monkeypatch):
+        """Один пересохраненный скриншот не переводит папку на время по номерам: рейды разных дней не сливаются."""
+        monkeypatch.chdir(tmp_path)
+        root = str(tmp_path)
+        day = 24 * 3600
+        # Рейд первого дня (номера 1-3) и рейд следующего дня (4-6); скриншот 2 пересохранен позже всех
+        for number, mtime in [(1, 1000), (2, 3 * day), (3, 1060), (4, day + 1000), (5, day + 1060), (6, day + 1120)]:
+            _touch(os.path.join(root, f"ScreenShot{number:04d}.jpg"), mtime)
+
+        records = sorted(resolve_timestamps(scan_directory(root)), key=sort_key)
+        assert {r.source for r in records} == {None}
+        groups = split_groups(records, 15 * 60, 10)
+        assert [[int(os.path.basename(r.path)[10:14]) for r in group] for group in groups] == [[1, 3], [4, 5, 6], [2]]